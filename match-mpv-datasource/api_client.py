@@ -0,0 +1,104 @@
+import os
+from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+import response_archive
+import response_cache
+
+try:
+    import brotli  # noqa: F401  urllib3 only decodes "br" when brotli is installed
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  httpx.Client(http2=True) raises ImportError without it
+except ImportError:
+    h2 = None
+
+# Load environment variables
+load_dotenv()
+api_key = os.getenv("RAPIDAPI_KEY")
+host = os.getenv("HOST_URL")
+base_url = os.getenv("API_BASE_URL")
+
+POOL_SIZE = int(os.getenv("API_POOL_SIZE", os.getenv("API_MAX_CONCURRENCY", "10")))
+CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))
+# HTTP/2 needs httpx with the h2 extra installed (pip install "httpx[http2]")
+HTTP2 = os.getenv("API_HTTP2", "false").lower() == "true"
+
+# Errors raised by either transport for network failures and timeouts.
+TRANSPORT_ERRORS = (requests.exceptions.RequestException,) + (
+    (httpx.HTTPError,) if httpx else ())
+
+
+class ApiClient:
+    """
+    One keep-alive connection pool to the RapidAPI host, shared by every datasource stage.
+    Uses requests by default, or httpx when HTTP/2 is requested and available.
+    With use_cache the fetch engine serves responses from an on-disk response_cache first.
+    With an `archive` (default: the one API_RECORD_ARCHIVE/API_REPLAY_ARCHIVE names) every
+    response is recorded, or, when it is replaying, served from it instead of the API.
+    """
+
+    def __init__(self, base_url=base_url, api_key=api_key, host=host, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, http2=HTTP2,
+                 use_cache=True, archive=None):
+        self.base_url = base_url.rstrip("/") if base_url else base_url
+        self.archive = archive if archive is not None else response_archive.from_env()
+        replaying = self.archive is not None and self.archive.replaying
+        self.cache = response_cache.ResponseCache() if use_cache and not replaying else None
+        headers = {
+            "x-rapidapi-key": api_key,
+            "x-rapidapi-host": host,
+            "Accept-Encoding": ACCEPT_ENCODING,
+        }
+
+        if http2 and (httpx is None or h2 is None):
+            print("⚠️ API_HTTP2 is set but httpx or h2 is not installed "
+                  "(pip install \"httpx[http2]\"). Falling back to HTTP/1.1.")
+            http2 = False
+        if http2:
+            self.http2 = True
+            self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+            self._session = httpx.Client(
+                http2=True,
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=pool_size,
+                                    max_keepalive_connections=pool_size),
+            )
+        else:
+            self.http2 = False
+            self.timeout = (connect_timeout, read_timeout)
+            self._session = requests.Session()
+            self._session.headers.update(headers)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+    def get(self, endpoint, params=None, headers=None):
+        """GET `endpoint` relative to the API base URL and return the raw response."""
+        response = self._session.get(
+            f"{self.base_url}/{endpoint}", params=params, headers=headers, timeout=self.timeout)
+        if self.archive is not None:
+            self.archive.record(endpoint, params, response)
+        return response
+
+    def close(self):
+        self._session.close()
+        if self.archive is not None:
+            print(self.archive.summary())
+            self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
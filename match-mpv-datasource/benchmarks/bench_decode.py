@@ -0,0 +1,146 @@
+"""
+Decode throughput per endpoint: raw response bytes -> stage rows.
+
+Each endpoint gets a synthetic response body. The report times the JSON decode (stdlib
+json and schemas.loads, which uses orjson when installed) and the mapping to rows by the
+stage's compiled schema decoder, called directly where the stage's parser prints a line
+per row. For /standings the pre-schema parser (a chain of .get calls per column) is
+timed as well.
+
+With --archive the bodies come from a response archive recorded by a real run
+(main.py --record) instead, every recorded response of each endpoint.
+
+    python benchmarks/bench_decode.py [rows per endpoint]
+    python benchmarks/bench_decode.py --archive .state/archive.sqlite3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import countries  # noqa: E402
+import leagues  # noqa: E402
+import managers  # noqa: E402
+import players  # noqa: E402
+import response_archive  # noqa: E402
+import schemas  # noqa: E402
+import squads  # noqa: E402
+import standings  # noqa: E402
+import teams  # noqa: E402
+from bench_rows import parse_as_dicts, synthetic_response  # noqa: E402
+
+REPEAT = 3
+
+
+def payloads(rows):
+    """(endpoint, response body, bytes -> rows) for every endpoint the datasource reads."""
+    coverage = {"fixtures": {"events": True, "lineups": True, "statistics_fixtures": True,
+                             "statistics_players": True},
+                "standings": True, "players": True, "top_scorers": True,
+                "top_assists": True, "top_cards": True, "injuries": True,
+                "predictions": True, "odds": False}
+    birth = {"date": "1990-01-01", "place": "London", "country": "England"}
+    team = {"id": 33, "name": "Manchester United"}
+    return [
+        ("countries",
+         {"response": [{"name": f"Country {i}", "code": "GB", "flag": "https://flag.svg"}
+                       for i in range(rows)]},
+         lambda decoded: [countries.decode_country(result)
+                       for result in decoded['response']]),
+        ("leagues",
+         {"response": [{"league": {"id": i, "name": "Premier League", "type": "League",
+                                   "logo": "https://logo.png"},
+                        "country": {"name": "England", "code": "GB", "flag": "https://flag.svg"},
+                        "seasons": [{"year": 2025, "start": "2025-08-15", "end": "2026-05-24",
+                                     "current": True, "coverage": coverage}]}
+                       for i in range(rows)]},
+         lambda decoded: [leagues.decode_league_season(result, season, api_source=None)
+                       for result in decoded['response']
+                       for season in result['seasons']]),
+        ("teams",
+         {"response": [{"team": {**team, "id": i, "code": "MUN", "country": "England",
+                                 "founded": 1878, "national": False, "logo": "https://logo.png"},
+                        "venue": {"id": 556, "name": "Old Trafford", "address": "Sir Matt Busby Way",
+                                  "city": "Manchester", "capacity": 76212, "surface": "grass",
+                                  "image": "https://venue.png"}}
+                       for i in range(rows)]},
+         lambda decoded: [teams.decode_team(result, api_league_id=39, season=2025, api_source=None)
+                       for result in decoded['response']]),
+        ("players/profiles",
+         {"response": [{"player": {"id": i, "name": "M. Rashford", "firstname": "Marcus",
+                                   "lastname": "Rashford", "age": 27, "birth": birth,
+                                   "nationality": "England", "height": "180 cm",
+                                   "weight": "70 kg", "number": 10, "position": "Attacker",
+                                   "photo": "https://photo.png"}}
+                       for i in range(rows)]},
+         lambda decoded: players.extract_players_data(decoded)),
+        ("players/squads",
+         {"response": [{"team": team,
+                        "players": [{"id": i, "name": "M. Rashford", "age": 27, "number": 10,
+                                     "position": "Attacker", "photo": "https://photo.png"}
+                                    for i in range(rows)]}]},
+         lambda decoded: [squads.decode_squad_player(player, api_team_id=33, api_source=None)
+                       for result in decoded['response']
+                       for player in result['players']]),
+        ("coachs",
+         {"response": [{"id": i, "name": "E. ten Hag", "firstname": "Erik", "lastname": "ten Hag",
+                        "age": 55, "birth": birth, "nationality": "Netherlands",
+                        "height": "180 cm", "weight": "80 kg", "photo": "https://photo.png",
+                        "team": team,
+                        "career": [{"team": team, "start": "2022-07-01", "end": None}]}
+                       for i in range(rows)]},
+         lambda decoded: [managers.decode_manager(result, career, api_source=None)
+                       for result in decoded['response']
+                       for career in result['career']]),
+        ("standings",
+         {"response": synthetic_response(rows)},
+         lambda decoded: standings.parse_standings_data(decoded['response'])),
+    ]
+
+
+def best_of(work):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = work()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decode throughput per endpoint.")
+    parser.add_argument("rows", type=int, nargs="?", default=20_000,
+                        help="Rows per synthetic response.")
+    parser.add_argument("--archive", help="Use the bodies recorded in this response archive.")
+    args = parser.parse_args(argv)
+
+    archive = response_archive.ResponseArchive(args.archive, replaying=True) if args.archive else None
+    source = f"bodies from {args.archive}" if archive else f"{args.rows} rows per endpoint"
+    print(f"📏 {source}, JSON decoder: {'orjson' if schemas.orjson is not None else 'json'}")
+    print(f"{'endpoint':<24} {'json.loads':>11} {'loads':>9} {'map':>9} {'rows/s':>12} {'MB/s':>7}")
+
+    for endpoint, payload, to_rows in payloads(args.rows):
+        bodies = archive.bodies(endpoint) if archive else [json.dumps(payload).encode()]
+        if not bodies:
+            print(f"{endpoint:<24} not in the archive")
+            continue
+        size = sum(len(body) for body in bodies)
+        stdlib_seconds, _ = best_of(lambda: [json.loads(body) for body in bodies])
+        loads_seconds, decoded = best_of(lambda: [schemas.loads(body) for body in bodies])
+        map_seconds, parsed = best_of(
+            lambda: [row for results in decoded for row in to_rows(results)])
+        total = loads_seconds + map_seconds
+        print(f"{endpoint:<24} {stdlib_seconds * 1000:8.1f} ms {loads_seconds * 1000:6.1f} ms "
+              f"{map_seconds * 1000:6.1f} ms {len(parsed) / total:12,.0f} "
+              f"{size / total / 1e6:7.1f}")
+
+        if endpoint == "standings":
+            map_seconds, parsed = best_of(
+                lambda: [row for results in decoded for row in parse_as_dicts(results['response'])])
+            print(f"{'  pre-schema parser':<24} {'':>11} {'':>9} {map_seconds * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
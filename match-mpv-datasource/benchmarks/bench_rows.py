@@ -0,0 +1,107 @@
+"""
+Compare per-row dicts (the old parser output) with the stage row tuples.
+
+Builds N standings rows both ways from a synthetic /standings response and reports
+build time, memory held by the rows, and the time to turn them into driver parameters.
+
+    python benchmarks/bench_rows.py [rows]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import standings  # noqa: E402
+
+
+def synthetic_response(rows):
+    record = {"played": 38, "win": 20, "draw": 10, "lose": 8,
+              "goals": {"for": 61, "against": 40}}
+    table = [{
+        "rank": i + 1, "team": {"id": 1000 + i}, "points": 70, "goalsDiff": 21,
+        "group": "Premier League", "form": "WWDLW", "description": "Promotion",
+        "all": record, "home": record, "away": record,
+    } for i in range(rows)]
+    return [{"league": {"id": 39, "season": 2025, "country": "England",
+                        "standings": [table]}}]
+
+
+def parse_as_dicts(api_response):
+    """The parser as it was before the row tuples: one 29-key dict per row."""
+    rows = []
+    for result in api_response:
+        league = result.get('league', {})
+        for group in league.get('standings', [[]]):
+            for standing in group:
+                rows.append({
+                    'api_league_id': league.get('id', ''),
+                    'season': league.get('season', ''),
+                    'country': league.get('country', ''),
+                    'api_team_id': standing.get('team', {}).get('id', ''),
+                    'position': standing.get('rank', ''),
+                    'points': standing.get('points', ''),
+                    'goals_difference': standing.get('goalsDiff', ''),
+                    'group_name': standing.get('group', ''),
+                    'form': standing.get('form', ''),
+                    'description': standing.get('description', ''),
+                    'matches_played': standing.get('all', {}).get('played', ''),
+                    'matches_won': standing.get('all', {}).get('win', ''),
+                    'matches_drawn': standing.get('all', {}).get('draw', ''),
+                    'matches_lost': standing.get('all', {}).get('lose', ''),
+                    'goals_scored': standing.get('all', {}).get('goals', {}).get('for', ''),
+                    'goals_conceded': standing.get('all', {}).get('goals', {}).get('against', ''),
+                    'home_matches_played': standing.get('home', {}).get('played', ''),
+                    'home_matches_won': standing.get('home', {}).get('win', ''),
+                    'home_matches_drawn': standing.get('home', {}).get('draw', ''),
+                    'home_matches_lost': standing.get('home', {}).get('lose', ''),
+                    'home_goals_scored': standing.get('home', {}).get('goals', {}).get('for', ''),
+                    'home_goals_conceded': standing.get('home', {}).get('goals', {}).get('against', ''),
+                    'away_matches_played': standing.get('away', {}).get('played', ''),
+                    'away_matches_won': standing.get('away', {}).get('win', ''),
+                    'away_matches_drawn': standing.get('away', {}).get('draw', ''),
+                    'away_matches_lost': standing.get('away', {}).get('lose', ''),
+                    'away_goals_scored': standing.get('away', {}).get('goals', {}).get('for', ''),
+                    'away_goals_conceded': standing.get('away', {}).get('goals', {}).get('against', ''),
+                    'api_source': standings.api_source,
+                })
+    return rows
+
+
+def measure(label, build, to_params):
+    started = time.perf_counter()
+    rows = build()
+    built = time.perf_counter() - started
+
+    started = time.perf_counter()
+    to_params(rows)
+    converted = time.perf_counter() - started
+    del rows
+
+    # Memory is measured on a separate build: tracemalloc slows allocation down.
+    tracemalloc.start()
+    rows = build()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8} build {built * 1000:8.1f} ms  "
+          f"params {converted * 1000:7.1f} ms  "
+          f"held {held / len(rows):6.0f} B/row")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    rows = int(argv[0]) if argv else 100_000
+    api_response = synthetic_response(rows)
+    print(f"📏 {rows} standings rows")
+
+    measure("dicts",
+            lambda: parse_as_dicts(api_response),
+            lambda rows: [[row[column] for column in standings.STANDINGS_COLUMNS]
+                          for row in rows])
+    measure("tuples",
+            lambda: standings.parse_standings_data(api_response),
+            lambda rows: list(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Local stand-in for the RapidAPI football endpoints the datasource reads.
+
+Serves synthetic but consistent /countries, /leagues, /teams, /players/profiles,
+/players/squads, /coachs and /standings responses: the teams of a league are the ones
+in its standings, every team has a squad and a coach, and so on. Volumes grow with
+`scale`, every request waits `latency` seconds, and a `rate_limited` fraction of
+requests is answered with a 429. GET /__stats returns the request counts per endpoint.
+
+    python benchmarks/mock_api.py --scale 10 --latency 0.05 --rate-limited 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TEAMS_PER_LEAGUE = 20
+COUNTRIES = 150
+PROFILE_PAGES = 10
+PLAYERS_PER_PAGE = 250
+SQUAD_SIZE = 25
+
+BIRTH = {"date": "1995-04-12", "place": "Manchester", "country": "England"}
+
+
+class MockApi:
+    """A mock API server running on a background thread."""
+
+    def __init__(self, scale=1, latency=0.0, rate_limited=0.0, port=0, seed=0):
+        self.scale = scale
+        self.latency = latency
+        self.rate_limited = rate_limited
+        self.requests = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = {}
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path.strip("/")
+                if endpoint == "__stats":
+                    with api._lock:
+                        return self._reply(200, {"requests": dict(api.requests)})
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+                with api._lock:
+                    api.requests[endpoint] = api.requests.get(endpoint, 0) + 1
+                    limited = api._random.random() < api.rate_limited
+                if api.latency:
+                    time.sleep(api.latency)
+                if limited:
+                    return self._reply(429, {"message": "Too many requests"},
+                                       {"Retry-After": "1"})
+
+                build = RESPONSES.get(endpoint)
+                if build is None:
+                    return self._reply(404, {"message": f"Unknown endpoint {endpoint}"})
+                response, paging = build(api.scale, params)
+                return self._reply(200, {
+                    "get": endpoint, "parameters": params, "errors": [],
+                    "results": len(response), "paging": paging or {"current": 1, "total": 1},
+                    "response": response,
+                })
+
+            def _reply(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _teams_of(league_id, scale):
+    return [int(league_id) * 10000 + i for i in range(1, TEAMS_PER_LEAGUE * scale + 1)]
+
+
+def _team(team_id):
+    return {"id": team_id, "name": f"Team {team_id}", "logo": f"https://media/teams/{team_id}.png"}
+
+
+def _countries(scale, params):
+    return [{"name": f"Country {i}", "code": f"C{i}", "flag": f"https://media/flags/{i}.svg"}
+            for i in range(COUNTRIES * scale)], None
+
+
+def _leagues(scale, params):
+    league_id = int(params["id"])
+    coverage = {"fixtures": {"events": True, "lineups": True, "statistics_fixtures": True,
+                             "statistics_players": True},
+                "standings": True, "players": True, "top_scorers": True, "top_assists": True,
+                "top_cards": True, "injuries": True, "predictions": True, "odds": False}
+    return [{
+        "league": {"id": league_id, "name": f"League {league_id}", "type": "League",
+                   "logo": f"https://media/leagues/{league_id}.png"},
+        "country": {"name": "England", "code": "GB", "flag": "https://media/flags/gb.svg"},
+        "seasons": [{"year": 2025, "start": "2025-08-15", "end": "2026-05-24",
+                     "current": True, "coverage": coverage}],
+    }], None
+
+
+def _teams(scale, params):
+    return [{
+        "team": {**_team(team_id), "code": "TMS", "country": "England", "founded": 1900,
+                 "national": False},
+        "venue": {"id": team_id, "name": f"Stadium {team_id}", "address": "1 Ground Road",
+                  "city": "Manchester", "capacity": 40000, "surface": "grass",
+                  "image": f"https://media/venues/{team_id}.png"},
+    } for team_id in _teams_of(params["league"], scale)], None
+
+
+def _player(player_id):
+    return {"id": player_id, "name": f"P. Player{player_id}", "firstname": "Pat",
+            "lastname": f"Player{player_id}", "age": 27, "birth": BIRTH,
+            "nationality": "England", "height": "180 cm", "weight": "75 kg", "number": 10,
+            "position": "Midfielder", "photo": f"https://media/players/{player_id}.png"}
+
+
+def _profiles(scale, params):
+    total = PROFILE_PAGES * scale
+    page = int(params.get("page", 1))
+    if page > total:
+        return [], {"current": page, "total": total}
+    first = (page - 1) * PLAYERS_PER_PAGE + 1
+    return ([{"player": _player(player_id)}
+             for player_id in range(first, first + PLAYERS_PER_PAGE)],
+            {"current": page, "total": total})
+
+
+def _squads(scale, params):
+    team_id = int(params["team"])
+    return [{"team": _team(team_id), "players": [
+        {"id": team_id * 100 + number, "name": f"P. Player{team_id * 100 + number}",
+         "age": 27, "number": number, "position": "Midfielder",
+         "photo": "https://media/players/0.png"}
+        for number in range(1, SQUAD_SIZE + 1)]}], None
+
+
+def _coachs(scale, params):
+    team_id = int(params["team"])
+    return [{"id": team_id, "name": f"C. Coach{team_id}", "firstname": "Chris",
+             "lastname": f"Coach{team_id}", "age": 50, "birth": BIRTH,
+             "nationality": "England", "height": "182 cm", "weight": "80 kg",
+             "photo": f"https://media/coachs/{team_id}.png", "team": _team(team_id),
+             "career": [{"team": _team(team_id), "start": "2023-07-01", "end": None},
+                        {"team": _team(team_id + 1), "start": "2019-07-01",
+                         "end": "2023-06-30"}]}], None
+
+
+def _standings(scale, params):
+    league_id = int(params["league"])
+    record = {"played": 10, "win": 5, "draw": 3, "lose": 2, "goals": {"for": 15, "against": 9}}
+    table = [{"rank": rank, "team": _team(team_id), "points": 18, "goalsDiff": 6,
+              "group": f"League {league_id}", "form": "WWDLW", "status": "same",
+              "description": None, "all": record, "home": record, "away": record}
+             for rank, team_id in enumerate(_teams_of(league_id, scale), start=1)]
+    return [{"league": {"id": league_id, "name": f"League {league_id}", "country": "England",
+                        "season": int(params["season"]), "standings": [table]}}], None
+
+
+RESPONSES = {
+    "countries": _countries,
+    "leagues": _leagues,
+    "teams": _teams,
+    "players/profiles": _profiles,
+    "players/squads": _squads,
+    "coachs": _coachs,
+    "standings": _standings,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a mock football API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--scale", type=int, default=1, help="Data volume multiplier.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request.")
+    parser.add_argument("--rate-limited", type=float, default=0.0,
+                        help="Fraction of requests answered with a 429.")
+    args = parser.parse_args(argv)
+
+    api = MockApi(args.scale, args.latency, args.rate_limited, args.port).start()
+    print(f"🧪 Mock API at {api.url} (scale {args.scale}x). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
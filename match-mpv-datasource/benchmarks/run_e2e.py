@@ -0,0 +1,213 @@
+"""
+End-to-end benchmark of main.main() against the mock API and a throwaway Postgres.
+
+For every scale it resets the database to benchmarks/stub_schema.sql, points a fresh
+datasource process at a mock API serving that much data, and reports per stage:
+wall time, API requests and requests/s, rows upserted and rows/s, plus the run's peak RSS.
+
+    python benchmarks/run_e2e.py --scales 1 10 100 --latency 0.05 --rate-limited 0.01
+
+By default a temporary cluster is created with initdb/pg_ctl (PostgreSQL binaries on PATH).
+--use-env-db runs against the DB_HOST/DB_PORT/DB_NAME/DB_USER/DB_PASSWORD database instead; its
+public schema is DROPPED, so only point it at a scratch database.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from contextlib import contextmanager
+
+import psycopg2
+
+from mock_api import MockApi
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATASOURCE_DIR = os.path.dirname(HERE)
+
+# Which API endpoint each stage calls
+STAGE_ENDPOINTS = {
+    "countries": "countries",
+    "leagues": "leagues",
+    "teams": "teams",
+    "players": "players/profiles",
+    "squads": "players/squads",
+    "managers": "coachs",
+    "standings": "standings",
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def throwaway_postgres():
+    """Start a temporary Postgres cluster; yields its DB_* settings and removes it afterwards."""
+    if not shutil.which("initdb") or not shutil.which("pg_ctl"):
+        sys.exit("❌ initdb/pg_ctl not found on PATH. Install PostgreSQL or use --use-env-db.")
+    data_dir = tempfile.mkdtemp(prefix="datasource-bench-pg-")
+    port = _free_port()
+    subprocess.run(["initdb", "-D", data_dir, "-U", "bench", "--auth=trust"],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run(["pg_ctl", "-D", data_dir, "-w", "-l", os.path.join(data_dir, "server.log"),
+                    "-o", f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1 -c fsync=off",
+                    "start"], check=True, stdout=subprocess.DEVNULL)
+    try:
+        conn = psycopg2.connect(host="127.0.0.1", port=port, user="bench", dbname="postgres")
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("CREATE DATABASE bench")
+        conn.close()
+        yield {"DB_HOST": "127.0.0.1", "DB_PORT": str(port), "DB_NAME": "bench",
+               "DB_USER": "bench", "DB_PASSWORD": ""}
+    finally:
+        subprocess.run(["pg_ctl", "-D", data_dir, "-m", "fast", "stop"],
+                       stdout=subprocess.DEVNULL)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@contextmanager
+def env_postgres():
+    yield {name: os.getenv(name, "")
+           for name in ("DB_HOST", "DB_PORT", "DB_NAME", "DB_USER", "DB_PASSWORD")}
+
+
+def _connect(db_env):
+    return psycopg2.connect(host=db_env["DB_HOST"], port=db_env["DB_PORT"] or None,
+                            dbname=db_env["DB_NAME"], user=db_env["DB_USER"],
+                            password=db_env["DB_PASSWORD"])
+
+
+def reset_schema(db_env):
+    with open(os.path.join(HERE, "stub_schema.sql")) as schema:
+        stub_schema = schema.read()
+    conn = _connect(db_env)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute("DROP SCHEMA IF EXISTS public CASCADE")
+            cursor.execute("CREATE SCHEMA public")
+            cursor.execute(stub_schema)
+    finally:
+        conn.close()
+
+
+def rows_upserted(db_env):
+    conn = _connect(db_env)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute("SELECT stage, SUM(writes) FROM upserted GROUP BY stage")
+            return {stage: int(writes) for stage, writes in cursor.fetchall()}
+    finally:
+        conn.close()
+
+
+def run_datasource(api, db_env, rpm, report_path):
+    """Run main.main() in a fresh process (settings are read at import) with clean run state."""
+    state_dir = tempfile.mkdtemp(prefix="datasource-bench-state-")
+    env = dict(os.environ, **db_env,
+               API_BASE_URL=api.url, RAPIDAPI_KEY="bench", HOST_URL="localhost",
+               API_SOURCE="bench", DATASOURCE_STATE_DIR=state_dir,
+               API_REQUESTS_PER_MINUTE=str(rpm), API_BURST=str(max(rpm // 600, 10)))
+    try:
+        started = time.monotonic()
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--child", report_path],
+                       cwd=DATASOURCE_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        wall = time.monotonic() - started
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+    with open(report_path) as report:
+        return wall, json.load(report)
+
+
+def child(report_path):
+    """Entry point of the benchmarked process."""
+    sys.path.insert(0, DATASOURCE_DIR)
+    import main  # noqa: E402  Imported here so the benchmark's env is in place first
+
+    stages = main.main(["--no-cache"])
+    with open(report_path, "w") as report:
+        json.dump({
+            "stages": [{"name": stage.name, "status": stage.status, "seconds": stage.duration}
+                       for stage in stages],
+            # Linux reports kilobytes, macOS bytes
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            / (1024 if sys.platform != "darwin" else 1024 * 1024),
+        }, report)
+
+
+def benchmark(scale, db_env, args):
+    reset_schema(db_env)
+    api = MockApi(scale, args.latency, args.rate_limited).start()
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".json") as report_file:
+            wall, report = run_datasource(api, db_env, args.rpm, report_file.name)
+        with urllib.request.urlopen(f"{api.url}/__stats") as response:
+            requests_made = json.load(response)["requests"]
+    finally:
+        api.stop()
+    rows = rows_upserted(db_env)
+
+    stages = []
+    for stage in report["stages"]:
+        seconds = stage["seconds"] or float("nan")
+        calls = requests_made.get(STAGE_ENDPOINTS[stage["name"]], 0)
+        written = rows.get(stage["name"], 0)
+        stages.append({**stage, "requests": calls, "requests_per_s": calls / seconds,
+                       "rows": written, "rows_per_s": written / seconds})
+    return {"scale": scale, "wall_seconds": wall,
+            "peak_rss_mb": report["peak_rss_mb"], "stages": stages}
+
+
+def print_result(result):
+    print(f"\n📊 {result['scale']}x: {result['wall_seconds']:.1f}s wall, "
+          f"peak RSS {result['peak_rss_mb']:.0f} MB")
+    print(f"   {'stage':<10} {'status':<8} {'seconds':>8} {'requests':>9} {'req/s':>8} "
+          f"{'rows':>9} {'rows/s':>9}")
+    for stage in result["stages"]:
+        print(f"   {stage['name']:<10} {stage['status']:<8} {stage['seconds']:8.1f} "
+              f"{stage['requests']:9d} {stage['requests_per_s']:8.1f} "
+              f"{stage['rows']:9d} {stage['rows_per_s']:9.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end datasource benchmark.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Seconds the mock API waits per request.")
+    parser.add_argument("--rate-limited", type=float, default=0.0,
+                        help="Fraction of requests answered with a 429.")
+    parser.add_argument("--rpm", type=int, default=60000,
+                        help="API_REQUESTS_PER_MINUTE for the benchmarked run.")
+    parser.add_argument("--use-env-db", action="store_true",
+                        help="Use the DB_* database (its public schema is dropped!).")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    parser.add_argument("--child", metavar="REPORT", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return child(args.child)
+
+    results = []
+    with (env_postgres() if args.use_env_db else throwaway_postgres()) as db_env:
+        for scale in args.scales:
+            print(f"🏁 Running the datasource at {scale}x...")
+            results.append(benchmark(scale, db_env, args))
+            print_result(results[-1])
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+-- Minimal stand-in for the production schema, for benchmark runs against a throwaway
+-- database. It has the tables the stages read (leagues, seasons, coverage and
+-- teams_api_mapping) and upsert_* functions with the production argument lists.
+-- Every upsert lands in the `upserted` table, which counts how often each row was written.
+
+CREATE TABLE upserted (
+    stage text NOT NULL,
+    api_key text NOT NULL,
+    payload jsonb NOT NULL,
+    writes integer NOT NULL DEFAULT 1,
+    PRIMARY KEY (stage, api_key)
+);
+
+CREATE FUNCTION bench_upsert(p_stage text, p_key text, p_payload jsonb) RETURNS void
+LANGUAGE sql AS $$
+    INSERT INTO upserted (stage, api_key, payload) VALUES (p_stage, p_key, p_payload)
+    ON CONFLICT (stage, api_key)
+    DO UPDATE SET payload = EXCLUDED.payload, writes = upserted.writes + 1
+$$;
+
+CREATE TABLE leagues (
+    league_id serial PRIMARY KEY,
+    league_name text
+);
+
+CREATE TABLE leagues_api_mapping (
+    league_id integer PRIMARY KEY REFERENCES leagues,
+    api_league_id integer UNIQUE NOT NULL
+);
+
+CREATE TABLE seasons (
+    season_id serial PRIMARY KEY,
+    league_id integer NOT NULL REFERENCES leagues,
+    season integer NOT NULL,
+    current_season boolean,
+    UNIQUE (league_id, season)
+);
+
+CREATE TABLE coverage (
+    season_id integer PRIMARY KEY REFERENCES seasons,
+    standings boolean
+);
+
+CREATE TABLE teams_api_mapping (
+    api_team_id integer PRIMARY KEY
+);
+
+CREATE FUNCTION upsert_country(text, text, text) RETURNS void
+LANGUAGE sql AS $$
+    SELECT bench_upsert('countries', $1, jsonb_build_array($1, $2, $3))
+$$;
+
+CREATE FUNCTION upsert_league_and_season(
+    integer, text, text, text, text, text, text, integer, date, date, boolean,
+    boolean, boolean, boolean, boolean, boolean, boolean, boolean, boolean, boolean,
+    boolean, boolean, boolean, text
+) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_league_id integer;
+    v_season_id integer;
+BEGIN
+    SELECT league_id INTO v_league_id FROM leagues_api_mapping WHERE api_league_id = $1;
+    IF v_league_id IS NULL THEN
+        INSERT INTO leagues (league_name) VALUES ($2) RETURNING league_id INTO v_league_id;
+        INSERT INTO leagues_api_mapping (league_id, api_league_id) VALUES (v_league_id, $1);
+    END IF;
+
+    INSERT INTO seasons (league_id, season, current_season) VALUES (v_league_id, $8, $11)
+    ON CONFLICT (league_id, season) DO UPDATE SET current_season = EXCLUDED.current_season
+    RETURNING season_id INTO v_season_id;
+
+    INSERT INTO coverage (season_id, standings) VALUES (v_season_id, $16)
+    ON CONFLICT (season_id) DO UPDATE SET standings = EXCLUDED.standings;
+
+    PERFORM bench_upsert('leagues', $1 || ':' || $8, jsonb_build_array(
+        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18,
+        $19, $20, $21, $22, $23, $24));
+END
+$$;
+
+CREATE FUNCTION upsert_teams_and_venues(
+    integer, integer, integer, text, text, text, integer, boolean, text, integer, text,
+    text, text, integer, text, text, text
+) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO teams_api_mapping (api_team_id) VALUES ($3) ON CONFLICT DO NOTHING;
+    PERFORM bench_upsert('teams', $1 || ':' || $2 || ':' || $3, jsonb_build_array(
+        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17));
+END
+$$;
+
+CREATE FUNCTION upsert_players(
+    integer, text, text, text, integer, date, text, text, text, text, text, integer,
+    text, text, text
+) RETURNS void
+LANGUAGE sql AS $$
+    SELECT bench_upsert('players', $1::text, jsonb_build_array(
+        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15))
+$$;
+
+CREATE FUNCTION upsert_squads(integer, integer, text, integer, integer, text, text)
+RETURNS void
+LANGUAGE sql AS $$
+    SELECT bench_upsert('squads', $1 || ':' || $2, jsonb_build_array(
+        $1, $2, $3, $4, $5, $6, $7))
+$$;
+
+CREATE FUNCTION upsert_managers(
+    integer, text, text, text, integer, date, text, text, text, text, text, text,
+    integer, text, date, date, text
+) RETURNS void
+LANGUAGE sql AS $$
+    SELECT bench_upsert('managers', $1 || ':' || $13 || ':' || coalesce($15::text, ''),
+                        jsonb_build_array(
+        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17))
+$$;
+
+CREATE FUNCTION upsert_standings(
+    integer, integer, text, integer, text, integer, text, integer, integer, integer,
+    integer, integer, integer, integer, integer, integer, integer, integer, integer,
+    integer, integer, integer, integer, integer, integer, integer, integer, text, text
+) RETURNS void
+LANGUAGE sql AS $$
+    SELECT bench_upsert('standings', $1 || ':' || $2 || ':' || $5 || ':' || $4, jsonb_build_array(
+        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18,
+        $19, $20, $21, $22, $23, $24, $25, $26, $27, $28, $29))
+$$;
@@ -0,0 +1,265 @@
+import os
+import io
+import json
+import threading
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+
+# Load environment variables
+load_dotenv()
+
+# How each stage writes its rows:
+#   "copy"  - COPY into a staging table, then one set-based statement per stage
+#   "batch" - multi-row VALUES calls to the upsert function, BATCH_SIZE rows per round trip
+#   "row"   - one SELECT upsert_xxx(...) per row, each in its own savepoint
+# A failing copy/batch is bisected down to the bad rows, which go to datasource_rejects.
+# UPSERT_MODE_<STAGE> overrides UPSERT_MODE, which overrides the defaults below.
+UPSERT_MODE = os.getenv("UPSERT_MODE")
+STAGE_MODES = {"players": "copy", "standings": "copy"}
+DEFAULT_MODE = "batch"
+BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "2000"))
+
+_arg_types = {}  # (function name, argument count) -> [postgres type names]
+_rejects_table_ready = False
+_rejects_table_lock = threading.Lock()
+
+
+def function_arg_types(cursor, function_name, arg_count):
+    """Argument types of an upsert_* function, in order, read from the Postgres catalog."""
+    cache_key = (function_name, arg_count)
+    if cache_key not in _arg_types:
+        cursor.execute("""
+            SELECT format_type(arg.type_oid, NULL)
+            FROM pg_proc p
+                CROSS JOIN LATERAL unnest(p.proargtypes) WITH ORDINALITY AS arg(type_oid, position)
+            WHERE p.proname = %s AND p.pronargs = %s
+            ORDER BY arg.position
+        """, (function_name, arg_count))
+        types = [row[0] for row in cursor.fetchall()]
+        if len(types) != arg_count:
+            raise LookupError(
+                f"No function {function_name} taking {arg_count} arguments")
+        _arg_types[cache_key] = types
+    return _arg_types[cache_key]
+
+
+def _copy_value(value):
+    """Render one value in COPY text format."""
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def _copy_buffer(rows):
+    buffer = io.StringIO()
+    for row_no, row in enumerate(rows):
+        buffer.write(str(row_no))
+        for value in row:
+            buffer.write("\t")
+            buffer.write(_copy_value(value))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def copy_upsert(cursor, function_name, columns, rows):
+    """
+    Bulk upsert `rows` (tuples in `columns` order) through `function_name`:
+    COPY them into a temp staging table typed from the function's signature, then
+    apply them with a single set-based statement in their original order.
+    Runs inside a savepoint, so a failure leaves the caller's transaction usable.
+    Returns the number of rows merged.
+    """
+    if not rows:
+        return 0
+    arg_types = function_arg_types(cursor, function_name, len(columns))
+    staging = sql.Identifier(f"staging_{function_name}")
+    column_names = [sql.Identifier(column) for column in columns]
+
+    cursor.execute("SAVEPOINT bulk_load")
+    try:
+        # ON COMMIT DELETE ROWS keeps the table for the session but empties it per transaction.
+        cursor.execute(sql.SQL("""
+            CREATE TEMP TABLE IF NOT EXISTS {staging} (row_no bigint, {columns})
+            ON COMMIT DELETE ROWS
+        """).format(
+            staging=staging,
+            columns=sql.SQL(", ").join(
+                sql.SQL("{} {}").format(name, sql.SQL(arg_type))
+                for name, arg_type in zip(column_names, arg_types))))
+        cursor.execute(sql.SQL("TRUNCATE {}").format(staging))
+        cursor.copy_expert(
+            sql.SQL("COPY {staging} (row_no, {columns}) FROM STDIN").format(
+                staging=staging,
+                columns=sql.SQL(", ").join(column_names)).as_string(cursor),
+            _copy_buffer(rows))
+        # ORDER BY on the outer query: Postgres sorts before calling the (volatile) function.
+        cursor.execute(sql.SQL("""
+            SELECT {function}({columns})
+            FROM {staging}
+            ORDER BY row_no
+        """).format(
+            function=sql.Identifier(function_name),
+            columns=sql.SQL(", ").join(column_names),
+            staging=staging))
+        merged = cursor.rowcount
+        cursor.execute("RELEASE SAVEPOINT bulk_load")
+        return merged
+    except Exception:
+        cursor.execute("ROLLBACK TO SAVEPOINT bulk_load")
+        raise
+
+
+def batch_upsert(cursor, function_name, columns, rows, batch_size=BATCH_SIZE):
+    """
+    Upsert `rows` (tuples in `columns` order) by calling `function_name` over a multi-row
+    VALUES list, one round trip per `batch_size` rows. Values are cast to the function's
+    argument types. Runs inside a savepoint like copy_upsert. Returns the number of rows sent.
+    """
+    if not rows:
+        return 0
+    arg_types = function_arg_types(cursor, function_name, len(columns))
+    column_names = [sql.Identifier(column) for column in columns]
+    query = sql.SQL("SELECT {function}({columns}) FROM (VALUES %s) AS batch({columns})").format(
+        function=sql.Identifier(function_name),
+        columns=sql.SQL(", ").join(column_names)).as_string(cursor)
+    template = "(" + ", ".join(f"%s::{arg_type}" for arg_type in arg_types) + ")"
+
+    cursor.execute("SAVEPOINT bulk_load")
+    try:
+        execute_values(cursor, query, rows, template=template, page_size=batch_size)
+        cursor.execute("RELEASE SAVEPOINT bulk_load")
+        return len(rows)
+    except Exception:
+        cursor.execute("ROLLBACK TO SAVEPOINT bulk_load")
+        raise
+
+
+def upsert_mode(stage):
+    """The write mode configured for a stage: "copy", "batch" or "row"."""
+    return (os.getenv(f"UPSERT_MODE_{stage.upper()}") or UPSERT_MODE
+            or STAGE_MODES.get(stage, DEFAULT_MODE)).lower()
+
+
+def _upsert_rows(cursor, function_name, columns, rows):
+    """Upsert rows one statement each, every row in its own savepoint. Returns failed positions."""
+    query = sql.SQL("SELECT {function}({placeholders})").format(
+        function=sql.Identifier(function_name),
+        placeholders=sql.SQL(", ").join(sql.Placeholder() * len(columns)))
+    failed = {}
+    for position, row in enumerate(rows):
+        cursor.execute("SAVEPOINT upsert_row")
+        try:
+            cursor.execute(query, row)
+            cursor.execute("RELEASE SAVEPOINT upsert_row")
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT upsert_row")
+            failed[position] = e
+    return failed
+
+
+def _bisect(cursor, mode, function_name, columns, rows, offset, failed):
+    """
+    Upsert `rows` in one set-based statement; if it fails, split the batch in half and
+    retry each half, down to single rows, so only the bad rows are left out.
+    Collects {position: error} of the bad rows in `failed`.
+    """
+    try:
+        if mode == "copy":
+            copy_upsert(cursor, function_name, columns, rows)
+        else:
+            batch_upsert(cursor, function_name, columns, rows)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        raise  # The connection is gone; retrying halves cannot help
+    except psycopg2.Error as e:
+        if len(rows) == 1:
+            failed[offset] = e
+            return
+        middle = len(rows) // 2
+        # The halves are small enough that COPY's staging table is not worth it.
+        _bisect(cursor, "batch", function_name, columns, rows[:middle], offset, failed)
+        _bisect(cursor, "batch", function_name, columns, rows[middle:], offset + middle, failed)
+
+
+def _ensure_rejects_table(cursor):
+    global _rejects_table_ready
+    with _rejects_table_lock:
+        if _rejects_table_ready:
+            return
+        cursor.execute("SAVEPOINT rejects_table")
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS datasource_rejects (
+                    reject_id bigserial PRIMARY KEY,
+                    stage text NOT NULL,
+                    function_name text NOT NULL,
+                    row_data jsonb NOT NULL,
+                    error text,
+                    rejected_at timestamptz NOT NULL DEFAULT now()
+                )
+            """)
+            cursor.execute("RELEASE SAVEPOINT rejects_table")
+        except psycopg2.Error:
+            # Another connection may be creating it at the same moment; the insert will tell.
+            cursor.execute("ROLLBACK TO SAVEPOINT rejects_table")
+            return
+        _rejects_table_ready = True
+
+
+def record_rejects(cursor, stage, function_name, columns, rejects):
+    """
+    Store rejected rows ({row: error} pairs) in datasource_rejects for later inspection.
+    Runs in a savepoint: if the rejects cannot be stored (e.g. no CREATE privilege, or two
+    connections creating the table at once), they are only printed and the caller's good
+    rows are still committed.
+    """
+    global _rejects_table_ready
+    cursor.execute("SAVEPOINT record_rejects")
+    try:
+        _ensure_rejects_table(cursor)
+        execute_values(cursor, """
+            INSERT INTO datasource_rejects (stage, function_name, row_data, error) VALUES %s
+        """, [(stage, function_name,
+               Json(dict(zip(columns, row)), dumps=lambda value: json.dumps(value, default=str)),
+               str(error).strip()[:2000]) for row, error in rejects])
+        cursor.execute("RELEASE SAVEPOINT record_rejects")
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        raise
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT record_rejects")
+        # The table may have been created in a transaction that was then rolled back.
+        _rejects_table_ready = False
+        print(f"⚠️ Could not store {len(rejects)} rejected {stage} rows in datasource_rejects: {e}")
+        for row, error in rejects:
+            print(f"   {row}: {str(error).strip()}")
+
+
+def save_rows(cursor, stage, function_name, columns, rows):
+    """
+    Upsert `rows` (tuples in `columns` order) with the stage's write mode, without
+    committing. A failing batch is bisected under savepoints until the bad rows are
+    isolated; those go to datasource_rejects and every other row is still written.
+    Returns the positions (indexes into `rows`) of the rejected rows.
+    """
+    if not rows:
+        return set()
+    mode = upsert_mode(stage)
+    if mode == "row":
+        failed = _upsert_rows(cursor, function_name, columns, rows)
+    else:
+        failed = {}
+        _bisect(cursor, mode, function_name, columns, rows, 0, failed)
+    if failed:
+        print(f"⚠️ {len(failed)} of {len(rows)} {stage} rows were rejected.")
+        record_rejects(cursor, stage, function_name, columns,
+                       [(rows[position], error) for position, error in sorted(failed.items())])
+    return set(failed)
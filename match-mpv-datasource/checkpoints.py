@@ -0,0 +1,193 @@
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from dotenv import load_dotenv
+from state import STATE_DIR
+
+# Load environment variables
+load_dotenv()
+CHECKPOINT_DB = os.getenv(
+    "CHECKPOINT_DB", os.path.join(STATE_DIR, "checkpoints.sqlite3"))
+
+# How much work is written and checkpointed at a time
+CHECKPOINT_PAGES = int(os.getenv("CHECKPOINT_PAGES", "25"))
+CHECKPOINT_TEAMS = int(os.getenv("CHECKPOINT_TEAMS", "50"))
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            started_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS completed_units (
+            run_id TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            completed_at TEXT NOT NULL,
+            PRIMARY KEY (run_id, stage, unit)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS run_meta (
+            run_id TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (run_id, stage, key)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS queued_units (
+            stage TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            queued_at TEXT NOT NULL,
+            PRIMARY KEY (stage, unit)
+        )
+    """)
+    return conn
+
+
+class Run:
+    """
+    Durable record of the units of work (pages, team IDs) each stage has committed in one
+    datasource run, so an interrupted run can pick up where it stopped.
+    """
+
+    def __init__(self, run_id, path=CHECKPOINT_DB, resumed=False):
+        self.run_id = run_id
+        self.path = path
+        self.resumed = resumed
+        self._lock = threading.Lock()
+
+    def _execute(self, query, params=(), many=False):
+        with self._lock:
+            conn = _connect(self.path)
+            try:
+                with conn:
+                    if many:
+                        return conn.executemany(query, params).fetchall()
+                    return conn.execute(query, params).fetchall()
+            finally:
+                conn.close()
+
+    def completed(self, stage):
+        """Units of `stage` already committed in this run, as strings."""
+        return {unit for (unit,) in self._execute("""
+            SELECT unit FROM completed_units WHERE run_id = ? AND stage = ?
+        """, (self.run_id, stage))}
+
+    def mark_done(self, stage, units):
+        """Record units of `stage` whose rows are committed to Postgres."""
+        now = datetime.now().isoformat(timespec="seconds")
+        self._execute("""
+            INSERT OR IGNORE INTO completed_units (run_id, stage, unit, completed_at)
+            VALUES (?, ?, ?, ?)
+        """, [(self.run_id, stage, str(unit), now) for unit in units], many=True)
+
+    def completed_since(self, stage, since):
+        """Units of `stage` committed by any run at or after `since` (a datetime), as strings."""
+        return {unit for (unit,) in self._execute("""
+            SELECT unit FROM completed_units WHERE stage = ? AND completed_at >= ?
+        """, (stage, since.isoformat(timespec="seconds")))}
+
+    def get_meta(self, stage, key):
+        rows = self._execute("""
+            SELECT value FROM run_meta WHERE run_id = ? AND stage = ? AND key = ?
+        """, (self.run_id, stage, key))
+        return rows[0][0] if rows else None
+
+    def set_meta(self, stage, key, value):
+        self._execute("""
+            INSERT OR REPLACE INTO run_meta (run_id, stage, key, value) VALUES (?, ?, ?, ?)
+        """, (self.run_id, stage, key, str(value)))
+
+    def last_meta(self, stage, key):
+        """The most recent value of `key` recorded by any run, e.g. a page count seen before."""
+        rows = self._execute("""
+            SELECT m.value FROM run_meta m JOIN runs r ON r.run_id = m.run_id
+            WHERE m.stage = ? AND m.key = ?
+            ORDER BY r.started_at DESC LIMIT 1
+        """, (stage, key))
+        return rows[0][0] if rows else None
+
+    def queue(self, stage, units):
+        """
+        Ask `stage` to process `units` (e.g. player IDs to refresh). Queued units outlive
+        the run and stay queued until unqueue(), so an interrupted run loses none of them.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        self._execute("""
+            INSERT OR REPLACE INTO queued_units (stage, unit, queued_at) VALUES (?, ?, ?)
+        """, [(stage, str(unit), now) for unit in units], many=True)
+
+    def queued(self, stage):
+        """Units queued for `stage`, oldest first, as strings."""
+        return [unit for (unit,) in self._execute("""
+            SELECT unit FROM queued_units WHERE stage = ? ORDER BY queued_at, unit
+        """, (stage,))]
+
+    def unqueue(self, stage, units=None, before=None):
+        """
+        Drop processed units of `stage`; with no `units`, every unit queued before `before`
+        or in the same second (queue times are kept to the second).
+        """
+        if units is not None:
+            self._execute("DELETE FROM queued_units WHERE stage = ? AND unit = ?",
+                          [(stage, str(unit)) for unit in units], many=True)
+        else:
+            self._execute("DELETE FROM queued_units WHERE stage = ? AND queued_at <= ?",
+                          (stage, before.isoformat(timespec="seconds")))
+
+    def finish(self):
+        """Mark the run complete; --resume will then start a fresh run."""
+        self._execute("UPDATE runs SET finished_at = ? WHERE run_id = ?",
+                      (datetime.now().isoformat(timespec="seconds"), self.run_id))
+
+    def discard(self):
+        """
+        Forget a new run that never did any work (e.g. main.py --plan), so --resume keeps
+        finding the interrupted run before it. Resumed runs are left alone.
+        """
+        if self.resumed:
+            return
+        for table in ("completed_units", "run_meta", "runs"):
+            self._execute(f"DELETE FROM {table} WHERE run_id = ?", (self.run_id,))
+
+
+def start_run(resume=False, path=CHECKPOINT_DB):
+    """
+    Begin a datasource run. With `resume`, continue the most recent unfinished run
+    (if there is one) instead of starting from scratch.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = _connect(path)
+    try:
+        with conn:
+            if resume:
+                row = conn.execute("""
+                    SELECT run_id FROM runs WHERE finished_at IS NULL
+                    ORDER BY started_at DESC LIMIT 1
+                """).fetchone()
+                if row:
+                    print(f"↩️ Resuming run {row[0]}.")
+                    return Run(row[0], path, resumed=True)
+                print("↩️ No unfinished run to resume. Starting a new one.")
+            started_at = datetime.now()
+            run_id = f"{started_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+            conn.execute("INSERT INTO runs (run_id, started_at) VALUES (?, ?)",
+                         (run_id, started_at.isoformat(timespec="seconds")))
+            return Run(run_id, path)
+    finally:
+        conn.close()
+
+
+def chunks(items, size):
+    """Split a list into consecutive lists of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
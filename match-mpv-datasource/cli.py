@@ -0,0 +1,188 @@
+"""
+Refresh single stages, or single leagues, seasons, teams and players, instead of everything.
+
+    python cli.py standings --league 39 --season 2025      # matchday hotfix for one league
+    python cli.py squads --team 33 --team 34
+    python cli.py managers --since 2026-10-01               # teams not refreshed since then
+    python cli.py players --player 276 --player 874
+    python cli.py teams --league 39 --dry-run               # show what would be fetched
+    python cli.py all --resume                              # the full run, as main.py
+
+Stage modules are only imported for the subcommand that needs them.
+"""
+import argparse
+import importlib
+from datetime import datetime
+
+# Subcommand -> (module, function that fetches and stores the stage)
+STAGES = {
+    "countries": ("countries", "fetch_and_store_countries"),
+    "leagues": ("leagues", "fetch_and_store_league_ids"),
+    "teams": ("teams", "fetch_and_store_teams"),
+    "standings": ("standings", "fetch_and_store_league_standings"),
+    "squads": ("squads", "fetch_and_store_squads"),
+    "managers": ("managers", "fetch_and_store_managers"),
+    "players": ("players", "refresh_players"),
+}
+
+
+def league_seasons(args, pool, stage):
+    """
+    The {'league_id', 'season'} units a league-level stage should fetch. --league with
+    --season needs no database; otherwise the stage's own query is filtered.
+    """
+    if args.league and args.season:
+        return [{'league_id': league_id, 'season': args.season} for league_id in args.league]
+    db = importlib.import_module("db")
+    stage_module = importlib.import_module(stage)
+    query = (stage_module.fetch_leagues_for_teams if stage == "teams"
+             else stage_module.fetch_leagues_and_seasons)
+    with db.connection(pool) as conn:
+        with conn.cursor() as cursor:
+            units = query(cursor)
+    return [unit for unit in units
+            if (not args.league or unit['league_id'] in args.league)
+            and (args.season is None or unit['season'] == args.season)]
+
+
+def team_units(args, pool, run, stage):
+    """The {'team_id'} units for squads or managers, minus teams refreshed since --since."""
+    if args.team:
+        units = [{'team_id': team_id} for team_id in args.team]
+    else:
+        units = importlib.import_module("teams").team_ids_for_run(pool, run)
+    if args.since:
+        fresh = run.completed_since(stage, args.since)
+        print(f"⏭️ {len([u for u in units if str(u['team_id']) in fresh])} teams were "
+              f"already refreshed since {args.since:%Y-%m-%d %H:%M}.")
+        units = [unit for unit in units if str(unit['team_id']) not in fresh]
+    return units
+
+
+def stage_call(args, client, pool, run):
+    """The keyword arguments for the stage function, and a description of the units."""
+    if args.command == "countries":
+        return {}, "every country"
+    if args.command == "leagues":
+        league_ids = args.league or importlib.import_module("leagues").LEAGUE_IDS
+        return {"league_ids": league_ids}, f"{len(league_ids)} leagues: {_sample(league_ids)}"
+    if args.command in ("teams", "standings"):
+        units = league_seasons(args, pool, args.command)
+        return {"leagues": units}, (f"{len(units)} league seasons: " + _sample(
+            [f"{unit['league_id']}/{unit['season']}" for unit in units]))
+    if args.command in ("squads", "managers"):
+        units = team_units(args, pool, run, args.command)
+        return ({"run": run, "team_ids": units},
+                f"{len(units)} teams: {_sample([unit['team_id'] for unit in units])}")
+    if args.crawl:
+        return {"run": run}, "every /players/profiles page"
+    if args.player:
+        return ({"run": run, "player_ids": args.player},
+                f"{len(args.player)} players: {_sample(args.player)}")
+    queued = run.queued("players")
+    return {"run": run}, f"{len(queued)} queued players: {_sample(queued)}"
+
+
+def _sample(values, shown=10):
+    values = [str(value) for value in values]
+    return ", ".join(values[:shown]) + (f" and {len(values) - shown} more" if len(values) > shown else "")
+
+
+def run_stage(args):
+    api_client = importlib.import_module("api_client")
+    checkpoints = importlib.import_module("checkpoints")
+    db = importlib.import_module("db")
+    telemetry = importlib.import_module("telemetry")
+    archive = importlib.import_module("response_archive").from_args(args)
+    if args.force_upsert:
+        importlib.import_module("fingerprints").get_store().enabled = False
+
+    module_name, function_name = STAGES[args.command]
+    if args.command == "players" and args.crawl:
+        function_name = "store_players"
+    stage = getattr(importlib.import_module(module_name), function_name)
+
+    run = checkpoints.start_run()
+    pool = db.create_pool()
+    try:
+        with api_client.ApiClient(use_cache=not args.no_cache, archive=archive) as client:
+            kwargs, description = stage_call(args, client, pool, run)
+            if args.dry_run:
+                print(f"🧪 Dry run: {args.command} would fetch {description}.")
+                return
+            print(f"🎯 Refreshing {args.command} for {description}.")
+            try:
+                with telemetry.stage(args.command) as metrics:
+                    stage(client, pool, **kwargs)
+            except Exception as e:
+                raise SystemExit(f"❌ {args.command} did not finish: {e}")
+            counters = metrics.as_dict()
+            print(f"✅ {args.command}: {counters['api_calls']} API calls, "
+                  f"{counters['rows_upserted']} rows upserted, {counters['rows_failed']} failed "
+                  f"in {counters['wall_seconds']:.1f}s.")
+    finally:
+        # A partial refresh is never resumed by main.py --resume.
+        run.finish()
+        pool.closeall()
+
+
+def _since(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO date or datetime: {value!r}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh part of the match MPV datasource.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--dry-run", action="store_true",
+                        help="Show what would be fetched without calling the API or writing.")
+    common.add_argument("--no-cache", action="store_true",
+                        help="Bypass the on-disk API response cache.")
+    common.add_argument("--force-upsert", action="store_true",
+                        help="Upsert every row, even ones unchanged since the last run.")
+    archive = common.add_mutually_exclusive_group()
+    archive.add_argument("--record", metavar="ARCHIVE",
+                         help="Also save every raw API response to this archive file.")
+    archive.add_argument("--replay", metavar="ARCHIVE",
+                         help="Serve API responses from this archive instead of calling the API.")
+
+    commands.add_parser("countries", parents=[common], help="Refresh every country.")
+    for name in ("leagues", "teams", "standings"):
+        command = commands.add_parser(name, parents=[common], help=f"Refresh {name} by league.")
+        command.add_argument("--league", type=int, action="append",
+                             help="API league ID (repeatable). Default: every league.")
+        if name != "leagues":
+            command.add_argument("--season", type=int,
+                                 help="Season year. Default: each league's current season.")
+    for name in ("squads", "managers"):
+        command = commands.add_parser(name, parents=[common], help=f"Refresh {name} by team.")
+        command.add_argument("--team", type=int, action="append",
+                             help="API team ID (repeatable). Default: every stored team.")
+        command.add_argument("--since", type=_since,
+                             help="Skip teams already refreshed at or after this date/time.")
+    command = commands.add_parser("players", parents=[common],
+                                  help="Refresh queued players, given players, or crawl all.")
+    command.add_argument("--player", type=int, action="append",
+                         help="API player ID to refresh (repeatable). Default: the queued players.")
+    command.add_argument("--crawl", action="store_true",
+                         help="Crawl every /players/profiles page instead.")
+    commands.add_parser("all", help="The full run; the remaining options go to main.py.",
+                        add_help=False)
+    return parser.parse_known_args(argv)
+
+
+def main(argv=None):
+    args, rest = parse_args(argv)
+    if args.command == "all":
+        return importlib.import_module("main").main(rest)
+    if rest:
+        raise SystemExit(f"cli.py {args.command}: unrecognized arguments: {' '.join(rest)}")
+    run_stage(args)
+
+
+if __name__ == "__main__":
+    main()
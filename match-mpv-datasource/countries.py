@@ -1,121 +1,88 @@
 import os
+from collections import namedtuple
 from dotenv import load_dotenv
-import requests
-import psycopg2
-from datetime import datetime
-import time
+import api_client
+import bulk_loader
+import db
+import fetcher
+import schemas
+import telemetry
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("RAPIDAPI_KEY")
-host = os.getenv("HOST_URL")
-base_url = os.getenv("API_BASE_URL")
 api_source = os.getenv("API_SOURCE")
-db_host = os.getenv("DB_HOST")
-db_name = os.getenv("DB_NAME")
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
 
-# 0.24 seconds delay will result in 250 requests per minute. 60 seconds/250 requests
-delay_seconds = 0.24
-MAX_RETRIES = 5  # Maximum retries if the request fails
 
-
-def fetch_country_data():
+def fetch_country_data(client):
     """
-    Fetch country data from the API and handle rate limiting.
-    Returns a list of dictionaries containing country data.
+    Fetch country data from the API.
+    Returns a list of CountryRow tuples.
     """
     country_data = []
-    success = False
-    retries = 0  # Initialize retry count
-
-    while not success and retries < MAX_RETRIES:
-        try:
-            response = requests.get(
-                f"{base_url}/countries",
-                headers={
-                    "x-rapidapi-key": api_key,
-                    "x-rapidapi-host": host,
-                }
-            )
-
-            if response.status_code == 200:
-                results = response.json()
-                for result in results.get('response', []):
-                    country_data.append({
-                        'country': result.get('name', ''),
-                        'country_code': result.get('code', ''),
-                        'country_flag_url': result.get('flag', '')
-                    })
-                    # ✅ Prints each country
-                    print(f"✅ {result.get('name', '')} has been added.")
-
-                success = True  # Mark success to exit the loop
-
-            elif response.status_code == 429:
-                print("⏳ Rate limit hit, retrying in 60 seconds...")
-                time.sleep(60)  # Wait and retry
-
-            else:
-                print(
-                    f"❌ Failed to fetch country data. Status code: {response.status_code}")
-                retries += 1  # Increase retry count
-                time.sleep(5)  # Small delay before retrying
-
-            time.sleep(delay_seconds)  # Delay after each successful API call
-
-        except Exception as e:
-            print(f"⚠️ An error occurred: {e}")
-            retries += 1
-            time.sleep(5)  # Small delay before retrying
-
-    if not success:
-        print("❌ Max retries reached. Could not fetch country data.")
+    results = fetcher.fetch_one(client, "countries")
+    if results is None:
+        print("❌ Could not fetch country data.")
+        return country_data
+
+    for result in results.get('response', []):
+        country_data.append(decode_country(result))
+        # ✅ Prints each country
+        print(f"✅ {result.get('name', '')} has been added.")
 
+    telemetry.add("rows_parsed", len(country_data))
     return country_data
 
 
+# Argument order of the upsert_country database function
+COUNTRY_COLUMNS = (
+    'country',
+    'country_code',
+    'country_flag_url',
+)
+# One country, its fields already in upsert_country argument order
+CountryRow = namedtuple("CountryRow", COUNTRY_COLUMNS)
+
+# Where each column comes from in a /countries entry
+decode_country = schemas.compile_decoder(CountryRow, ("result",), {
+    'country': 'result.name',
+    'country_code': 'result.code',
+    'country_flag_url': 'result.flag',
+})
+
+
 def save_country_data_to_db(country_data, cursor):
     """
     Save the fetched country data to the PostgreSQL database.
+    Rows the database rejects are set aside in datasource_rejects; the rest are committed.
     """
     try:
-        for country in country_data:
-            try:
-                cursor.execute("""
-                    SELECT upsert_country(%s, %s, %s)
-                """, (
-                    country['country'],
-                    country['country_code'],
-                    country['country_flag_url']
-                ))
-            except Exception as e:
-                print(
-                    f"⚠️ Failed to upsert country: {country['country']}. Error: {e}")
-                cursor.connection.rollback()  # Rollback only the failed query
-                continue  # Continue to the next country
-
-        cursor.connection.commit()  # Commit successful ones
+        rejected = bulk_loader.save_rows(
+            cursor, "countries", "upsert_country", COUNTRY_COLUMNS, country_data)
+        cursor.connection.commit()
+        telemetry.add("rows_upserted", len(country_data) - len(rejected))
+        telemetry.add("rows_failed", len(rejected))
         print("💪🏾 Country data successfully saved.")
 
     except Exception as e:
         print(f"❌ Failed to save country data to PostgreSQL: {e}")
         cursor.connection.rollback()
+        telemetry.add("rows_failed", len(country_data))
 
 
-def fetch_and_store_countries():
+def fetch_and_store_countries(client=None, pool=None):
     """
     Main function to orchestrate fetching and storing country data.
     """
+    client = client or api_client.ApiClient()
+    pool = pool or db.create_pool()
     try:
-        with psycopg2.connect(host=db_host, database=db_name, user=db_user, password=db_password) as conn:
-            with conn.cursor() as cursor:
-                country_data = fetch_country_data()
-                if country_data:  # Only save if data was fetched
+        country_data = fetch_country_data(client)
+        if country_data:  # Only save if data was fetched
+            with db.connection(pool) as conn:
+                with conn.cursor() as cursor:
                     save_country_data_to_db(country_data, cursor)
-                else:
-                    print("⚠️ No country data fetched. Skipping database update.")
+        else:
+            print("⚠️ No country data fetched. Skipping database update.")
 
     except Exception as e:
         print(f"❌ Failed to fetch and store country data: {e}")
@@ -0,0 +1,115 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from psycopg2.pool import ThreadedConnectionPool
+import telemetry
+
+# Load environment variables
+load_dotenv()
+db_host = os.getenv("DB_HOST")
+db_port = os.getenv("DB_PORT")  # Optional; libpq defaults to 5432
+db_name = os.getenv("DB_NAME")
+db_user = os.getenv("DB_USER")
+db_password = os.getenv("DB_PASSWORD")
+
+WRITER_WORKERS = int(os.getenv("DB_WRITER_WORKERS", "4"))
+# One connection per writer plus one for the stage's own reads.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(WRITER_WORKERS + 2)))
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool that waits for a free connection instead of raising when exhausted."""
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        self._slots.acquire()
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        self._slots.release()
+
+
+def create_pool(maxconn=POOL_SIZE):
+    """Connection pool shared by every datasource stage (thread-safe)."""
+    return BlockingConnectionPool(1, maxconn, host=db_host, port=db_port, database=db_name,
+                                  user=db_user, password=db_password)
+
+
+@contextmanager
+def connection(pool):
+    """
+    Borrow a pooled connection. Like `with psycopg2.connect(...)`, the transaction is
+    committed when the block succeeds and rolled back when it raises.
+    """
+    conn = pool.getconn()
+    try:
+        with telemetry.timed("db_seconds"):
+            with conn:
+                yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def partition(rows, key, partitions=WRITER_WORKERS):
+    """
+    Split rows into at most `partitions` groups so that rows sharing `key(row)` (a league or
+    team) always land in the same group, keeping their original order within it.
+    """
+    groups = {}
+    assigned = {}
+    for row in rows:
+        partition_key = key(row)
+        if partition_key not in assigned:
+            assigned[partition_key] = len(assigned) % partitions
+        groups.setdefault(assigned[partition_key], []).append(row)
+    return list(groups.values())
+
+
+def _write_partition(pool, rows, write):
+    with connection(pool) as conn:
+        with conn.cursor() as cursor:
+            write(rows, cursor)
+
+
+def parallel_write(pool, partitions, write, workers=WRITER_WORKERS):
+    """
+    Call `write(rows, cursor)` for each partition, spreading them over up to `workers`
+    pooled connections so several Postgres backends work at once.
+    Returns True when every partition was written without raising.
+    """
+    return not failed_writes(pool, partitions, write, workers)
+
+
+def failed_writes(pool, partitions, write, workers=WRITER_WORKERS):
+    """Like parallel_write, but returns the partitions whose write raised."""
+    partitions = [rows for rows in partitions if rows]
+    failed = []
+    if len(partitions) <= 1 or workers <= 1:
+        for rows in partitions:
+            try:
+                _write_partition(pool, rows, write)
+            except Exception as e:
+                print(f"❌ A database writer failed: {e}")
+                failed.append(rows)
+        return failed
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(telemetry.propagate(_write_partition), pool, rows, write): rows
+                   for rows in partitions}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ A database writer failed: {e}")
+                failed.append(futures[future])
+    return failed
@@ -0,0 +1,148 @@
+import os
+import asyncio
+from dotenv import load_dotenv
+import api_client
+import rate_limiter
+import retry_policy
+import schemas
+import telemetry
+
+# Load environment variables
+load_dotenv()
+
+# Requests are spread over MAX_CONCURRENCY workers; the shared token bucket in
+# rate_limiter decides how fast they may actually start.
+MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "10"))
+# Requests fetched per window by fetch_stream before its results are handed on.
+STREAM_WINDOW = int(os.getenv("API_STREAM_WINDOW", str(MAX_CONCURRENCY * 2)))
+
+
+async def _fetch(client, endpoint, params, semaphore, bucket):
+    """Fetch a single request, retrying under the endpoint's retry policy."""
+    archive = client.archive
+    if archive is not None and archive.replaying:
+        # No API call, so no token, retry or breaker: replay runs at local speed.
+        results = archive.replay(endpoint, params)
+        if results is None:
+            print(f"❌ /{endpoint} {params} is not in the replay archive.")
+        return results
+
+    cache = client.cache
+    entry = cache.get(endpoint, params) if cache else None
+    if entry is not None and entry.fresh:
+        telemetry.add("cache_hits")
+        if archive is not None:
+            archive.record_served(endpoint, params, entry.body)
+        return entry.json()
+    conditional_headers = entry.validators() if entry is not None else None
+
+    guard = retry_policy.get_guard(endpoint)
+    attempt = 0
+    async with semaphore:
+        trial = False  # Whether the current attempt is the breaker's half-open trial
+        try:
+            while True:
+                if not guard.breaker.allow():
+                    print(f"🚫 Circuit open for /{endpoint}. Skipping {params}...")
+                    return None
+                trial = guard.breaker.is_open
+
+                await bucket.acquire_async()
+                attempt += 1
+                status_code = None
+                retry_after = None
+                try:
+                    telemetry.add("api_calls")
+                    response = await asyncio.to_thread(
+                        client.get, endpoint, params, conditional_headers)
+                    telemetry.add("response_bytes", len(response.content))
+                    bucket.update_from_headers(response.headers)
+                    status_code = response.status_code
+                    if status_code == 304 and entry is not None:
+                        guard.breaker.record_success()
+                        cache.refresh(entry)
+                        telemetry.add("cache_hits")
+                        if archive is not None:
+                            archive.record_served(endpoint, params, entry.body)
+                        return entry.json()
+                    if status_code == 200:
+                        results = schemas.loads(response.content)
+                        guard.breaker.record_success()
+                        # The API reports plan and parameter problems as a 200 with "errors".
+                        if cache is not None and not results.get('errors'):
+                            cache.store(endpoint, params, response.content, response.headers)
+                        return results
+                except (*api_client.TRANSPORT_ERRORS, ValueError) as e:
+                    print(f"⚠️ Request to /{endpoint} {params} failed: {e}")
+                    status_code = None
+
+                if status_code == 429:
+                    telemetry.add("rate_limited")
+                    # Quota, not endpoint health: pause the shared bucket but leave the breaker alone.
+                    retry_after = rate_limiter.retry_after_seconds(response.headers)
+                    print(f"⏳ Rate limit hit, pausing all requests for {retry_after} seconds...")
+                    bucket.penalize(retry_after)
+                elif status_code is not None and status_code < 500:
+                    print(
+                        f"❌ Failed to fetch /{endpoint} {params}. Status code: {status_code}")
+                    guard.breaker.record_success()  # The endpoint answered; the request was bad
+                    return None
+                else:
+                    if status_code is not None:
+                        retry_after = retry_policy.parse_retry_after(response.headers)
+                        print(
+                            f"⚠️ Server error for /{endpoint} {params}. Status code: {status_code}")
+                    guard.breaker.record_failure()
+                if trial and status_code == 429:
+                    guard.breaker.release_trial()  # A 429 says nothing about the endpoint
+                trial = False
+
+                if not guard.policy.should_retry(attempt, status_code):
+                    print(
+                        f"❌ Giving up on /{endpoint} {params} after {attempt} attempts.")
+                    return None
+                if not guard.budget.consume():
+                    print(f"❌ Retry budget for /{endpoint} exhausted. Skipping {params}...")
+                    return None
+                telemetry.add("retries")
+                await asyncio.sleep(guard.policy.delay(attempt - 1, retry_after))
+        except BaseException:
+            # Unexpected errors and cancellation must not leave the breaker waiting on this trial.
+            if trial:
+                guard.breaker.release_trial()
+            raise
+
+
+async def _fetch_all(client, endpoint, params_list, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = rate_limiter.get_bucket()
+    return await asyncio.gather(
+        *(_fetch(client, endpoint, params, semaphore, bucket) for params in params_list))
+
+
+def fetch_many(client, endpoint, params_list, concurrency=MAX_CONCURRENCY):
+    """
+    Fetch an endpoint once per params dict, running up to `concurrency` requests in parallel.
+    Returns the decoded JSON bodies in the same order as `params_list` (None for failures).
+    """
+    params_list = list(params_list)
+    if not params_list:
+        return []
+    return asyncio.run(_fetch_all(client, endpoint, params_list, concurrency))
+
+
+def fetch_one(client, endpoint, params=None):
+    """Fetch a single request through the engine. Returns the decoded JSON body or None."""
+    return fetch_many(client, endpoint, [params or {}], concurrency=1)[0]
+
+
+def fetch_stream(client, endpoint, params_list, window=STREAM_WINDOW):
+    """
+    Like fetch_many, but `window` requests at a time: yields (params, decoded body or None)
+    in input order as each window finishes, so callers can start on the first results
+    without ever holding every response in memory.
+    """
+    params_list = list(params_list)
+    for start in range(0, len(params_list), window):
+        chunk = params_list[start:start + window]
+        yield from zip(chunk, fetch_many(client, endpoint, chunk))
@@ -0,0 +1,142 @@
+import os
+import hashlib
+import json
+import sqlite3
+import threading
+from dotenv import load_dotenv
+from state import STATE_DIR
+import telemetry
+
+# Load environment variables
+load_dotenv()
+FINGERPRINT_DB = os.getenv(
+    "FINGERPRINT_DB", os.path.join(STATE_DIR, "fingerprints.sqlite3"))
+SKIP_UNCHANGED = os.getenv("SKIP_UNCHANGED_UPSERTS", "true").lower() == "true"
+
+
+def fingerprint(row):
+    """Stable hash of a row's normalized payload: key order and value types don't matter."""
+    payload = json.dumps(row, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Remembers the payload hash of every entity last written to Postgres, keyed by
+    (entity, api id, api_source), so unchanged rows can be skipped on the next run.
+    """
+
+    def __init__(self, path=FINGERPRINT_DB, enabled=SKIP_UNCHANGED):
+        self.path = path
+        self.enabled = enabled
+        self._known = {}  # entity -> {(api_id, api_source): hash}, loaded once per entity
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    entity TEXT NOT NULL,
+                    api_id TEXT NOT NULL,
+                    api_source TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    PRIMARY KEY (entity, api_id, api_source)
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _hashes(self, entity):
+        with self._lock:
+            if entity not in self._known:
+                conn = self._connect()
+                try:
+                    self._known[entity] = {
+                        (api_id, api_source): row_hash
+                        for api_id, api_source, row_hash in conn.execute("""
+                            SELECT api_id, api_source, hash FROM fingerprints WHERE entity = ?
+                        """, (entity,))
+                    }
+                finally:
+                    conn.close()
+            return self._known[entity]
+
+    def changed(self, entity, rows, key):
+        """
+        Split `rows` into the ones whose payload differs from the last saved version.
+        `key(row)` returns the row's api id (a value or tuple of values).
+        Returns (changed_rows, pending) where `pending` is passed to record() after commit.
+        """
+        known = self._hashes(entity)
+        changed_rows = []
+        pending = []
+        for row in rows:
+            fingerprint_key = (_api_id(key(row)), str(_api_source(row)))
+            row_hash = fingerprint(row)
+            if self.enabled and known.get(fingerprint_key) == row_hash:
+                continue
+            changed_rows.append(row)
+            pending.append((fingerprint_key, row_hash))
+        telemetry.add("rows_skipped", len(rows) - len(changed_rows))
+        return changed_rows, pending
+
+    def record(self, entity, pending):
+        """Remember the hashes of rows that are now committed in Postgres."""
+        if not pending:
+            return
+        known = self._hashes(entity)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO fingerprints (entity, api_id, api_source, hash)
+                    VALUES (?, ?, ?, ?)
+                """, [(entity, api_id, api_source, row_hash)
+                      for (api_id, api_source), row_hash in pending])
+        finally:
+            conn.close()
+        with self._lock:
+            known.update(pending)
+
+    def forget(self, entity=None):
+        """Drop stored hashes (all of them, or one entity's) so the next run rewrites every row."""
+        conn = self._connect()
+        try:
+            with conn:
+                if entity is None:
+                    conn.execute("DELETE FROM fingerprints")
+                else:
+                    conn.execute("DELETE FROM fingerprints WHERE entity = ?", (entity,))
+        finally:
+            conn.close()
+        with self._lock:
+            if entity is None:
+                self._known.clear()
+            else:
+                self._known.pop(entity, None)
+
+
+def _api_id(value):
+    if isinstance(value, tuple):
+        return ":".join(str(part) for part in value)
+    return str(value)
+
+
+def _api_source(row):
+    return row['api_source'] if isinstance(row, dict) else getattr(row, 'api_source')
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide fingerprint store shared by every datasource stage."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = FingerprintStore()
+        return _shared_store
@@ -1,156 +1,146 @@
 import os
+from collections import namedtuple
 from dotenv import load_dotenv
-import requests
-import psycopg2
-import time
+import api_client
+import bulk_loader
+import db
+import fetcher
+import schemas
+import telemetry
 
 # Load environment variables
 load_dotenv()
 
-api_key = os.getenv("RAPIDAPI_KEY")
-host = os.getenv("HOST_URL")
-base_url = os.getenv("API_BASE_URL")
 api_source = os.getenv("API_SOURCE")
-db_host = os.getenv("DB_HOST")
-db_name = os.getenv("DB_NAME")
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
-
-delay_seconds = 0.24
-MAX_RETRIES = 5  # Prevent infinite loops
-
-
-def fetch_league_data(league_id):
-    retries = 0
-    while retries < MAX_RETRIES:
-        try:
-            response = requests.get(
-                f"{base_url}/leagues",
-                headers={
-                    "x-rapidapi-key": api_key,
-                    "x-rapidapi-host": host,
-                },
-                params={"id": league_id, "type": "league", "current": "true"}
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ Failed to fetch data for league ID {league_id}: {e}")
-            retries += 1
-            time.sleep(5)
-
-    print(f"❌ Max retries reached for league ID {league_id}. Skipping...")
-    return None
+
+# The leagues the datasource covers
+LEAGUE_IDS = ["39", "40", "61", "78", "88", "94", "135",
+              "140", "144", "169", "179", "207", "203", "235", "253"]
+
+
+def fetch_league_data(client, league_ids):
+    """Fetch the current league and season data for every league ID concurrently."""
+    return fetcher.fetch_many(
+        client,
+        "leagues",
+        [{"id": league_id, "type": "league", "current": "true"}
+         for league_id in league_ids]
+    )
 
 
 def extract_league_seasons_data(results):
     league_seasons_data = []
     for result in results.get('response', []):
-        api_league_id = result.get('league', {}).get('id', '')
-        league_name = result.get('league', {}).get('name', '')
-        league_type = result.get('league', {}).get('type', '')
-        league_logo_url = result.get('league', {}).get('logo', '')
-        country = result.get('country', {}).get('name', '')
-        country_code = result.get('country', {}).get('code', '')
-        country_flag_url = result.get('country', {}).get('flag', '')
-        seasons = result.get('seasons', [])
-
-        for season in seasons:
-            season_info = {
-                'api_league_id': api_league_id,
-                'league_name': league_name,
-                'league_type': league_type,
-                'league_logo_url': league_logo_url,
-                'country': country,
-                'country_code': country_code,
-                'country_flag_url': country_flag_url,
-                'season': season.get('year', ''),
-                'season_start': season.get('start', ''),
-                'season_end': season.get('end', ''),
-                'current_season': season.get('current', ''),
-                'events': season.get('coverage', {}).get('fixtures', {}).get('events', ''),
-                'lineups': season.get('coverage', {}).get('fixtures', {}).get('lineups', ''),
-                'statistics_fixtures': season.get('coverage', {}).get('fixtures', {}).get('statistics_fixtures', ''),
-                'statistics_players': season.get('coverage', {}).get('fixtures', {}).get('statistics_players', ''),
-                'standings': season.get('coverage', {}).get('standings', ''),
-                'players': season.get('coverage', {}).get('players', ''),
-                'top_scorers': season.get('coverage', {}).get('top_scorers', ''),
-                'top_assists': season.get('coverage', {}).get('top_assists', ''),
-                'top_cards': season.get('coverage', {}).get('top_cards', ''),
-                'injuries': season.get('coverage', {}).get('injuries', ''),
-                'predictions': season.get('coverage', {}).get('predictions', ''),
-                'odds': season.get('coverage', {}).get('odds', ''),
-                'api_source': api_source,
-            }
+        for season in result.get('seasons', []):
+            season_info = decode_league_season(result, season, api_source=api_source)
             league_seasons_data.append(season_info)
             print(
-                f"✅ {league_name} of {country} has been added for season {season.get('year', 'N/A')}.")
+                f"✅ {season_info.league_name} of {season_info.country} has been added for season {season.get('year', 'N/A')}.")
 
+    telemetry.add("rows_parsed", len(league_seasons_data))
     return league_seasons_data
 
 
-def save_league_seasons_data_to_db(league_seasons_data):
+# Argument order of the upsert_league_and_season database function
+LEAGUE_SEASON_COLUMNS = (
+    'api_league_id',
+    'league_name',
+    'league_type',
+    'league_logo_url',
+    'country',
+    'country_code',
+    'country_flag_url',
+    'season',
+    'season_start',
+    'season_end',
+    'current_season',
+    'events',
+    'lineups',
+    'statistics_fixtures',
+    'statistics_players',
+    'standings',
+    'players',
+    'top_scorers',
+    'top_assists',
+    'top_cards',
+    'injuries',
+    'predictions',
+    'odds',
+    'api_source',
+)
+# One league season and its coverage, in upsert_league_and_season argument order
+LeagueSeasonRow = namedtuple("LeagueSeasonRow", LEAGUE_SEASON_COLUMNS)
+
+# Where each column comes from in a /leagues entry and one of its seasons
+decode_league_season = schemas.compile_decoder(LeagueSeasonRow, ("result", "season"), {
+    'api_league_id': 'result.league.id',
+    'league_name': 'result.league.name',
+    'league_type': 'result.league.type',
+    'league_logo_url': 'result.league.logo',
+    'country': 'result.country.name',
+    'country_code': 'result.country.code',
+    'country_flag_url': 'result.country.flag',
+    'season': 'season.year',
+    'season_start': 'season.start',
+    'season_end': 'season.end',
+    'current_season': 'season.current',
+    'events': 'season.coverage.fixtures.events',
+    'lineups': 'season.coverage.fixtures.lineups',
+    'statistics_fixtures': 'season.coverage.fixtures.statistics_fixtures',
+    'statistics_players': 'season.coverage.fixtures.statistics_players',
+    'standings': 'season.coverage.standings',
+    'players': 'season.coverage.players',
+    'top_scorers': 'season.coverage.top_scorers',
+    'top_assists': 'season.coverage.top_assists',
+    'top_cards': 'season.coverage.top_cards',
+    'injuries': 'season.coverage.injuries',
+    'predictions': 'season.coverage.predictions',
+    'odds': 'season.coverage.odds',
+})
+
+
+def save_league_seasons_data_to_db(league_seasons_data, cursor):
+    """
+    Save the league, season and coverage rows to the PostgreSQL database.
+    Rows the database rejects are set aside in datasource_rejects; the rest are committed.
+    """
     try:
-        with psycopg2.connect(host=db_host, database=db_name, user=db_user, password=db_password) as conn:
-            with conn.cursor() as cursor:
-                for league in league_seasons_data:
-                    try:
-                        cursor.execute("""
-                            SELECT upsert_league_and_season(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (
-                            league['api_league_id'],
-                            league['league_name'],
-                            league['league_type'],
-                            league['league_logo_url'],
-                            league['country'],
-                            league['country_code'],
-                            league['country_flag_url'],
-                            league['season'],
-                            league['season_start'],
-                            league['season_end'],
-                            league['current_season'],
-                            league['events'],
-                            league['lineups'],
-                            league['statistics_fixtures'],
-                            league['statistics_players'],
-                            league['standings'],
-                            league['players'],
-                            league['top_scorers'],
-                            league['top_assists'],
-                            league['top_cards'],
-                            league['injuries'],
-                            league['predictions'],
-                            league['odds'],
-                            league['api_source']
-                        ))
-                    except Exception as e:
-                        print(
-                            f"⚠️ Failed to upsert league ID {league['api_league_id']}: {e}")
-                        conn.rollback()
-                        continue  # ✅ Skip to next
-
-                conn.commit()
-                print("💪🏾 League, Seasons and Coverage data successfully saved.")
+        rejected = bulk_loader.save_rows(
+            cursor, "leagues", "upsert_league_and_season", LEAGUE_SEASON_COLUMNS,
+            league_seasons_data)
+        cursor.connection.commit()
+        telemetry.add("rows_upserted", len(league_seasons_data) - len(rejected))
+        telemetry.add("rows_failed", len(rejected))
+        print("💪🏾 League, Seasons and Coverage data successfully saved.")
 
     except Exception as e:
         print(f"❌ Failed to save league data to PostgreSQL: {e}")
+        cursor.connection.rollback()
+        telemetry.add("rows_failed", len(league_seasons_data))
 
 
-def fetch_and_store_league_ids():
+def fetch_and_store_league_ids(client=None, pool=None, league_ids=None):
+    """Fetch and store the leagues in `league_ids` (default: every league in LEAGUE_IDS)."""
+    client = client or api_client.ApiClient()
+    pool = pool or db.create_pool()
 
-    league_ids = ["39", "40", "61", "78", "88", "94", "135",
-                  "140", "144", "169", "179", "207", "203", "235", "253"]
+    league_ids = league_ids or LEAGUE_IDS
 
     all_league_seasons_data = []
 
-    for league_id in league_ids:
-        league_data = fetch_league_data(league_id)
+    for league_id, league_data in zip(league_ids, fetch_league_data(client, league_ids)):
         if league_data:
             league_seasons_data = extract_league_seasons_data(league_data)
             all_league_seasons_data.extend(league_seasons_data)
-            time.sleep(delay_seconds)
+        else:
+            print(f"❌ Could not fetch league ID {league_id}. Skipping...")
 
-    save_league_seasons_data_to_db(all_league_seasons_data)
+    try:
+        with db.connection(pool) as conn:
+            with conn.cursor() as cursor:
+                save_league_seasons_data_to_db(all_league_seasons_data, cursor)
+    except Exception as e:
+        print(f"❌ Failed to save league data to PostgreSQL: {e}")
 
 
 if __name__ == "__main__":
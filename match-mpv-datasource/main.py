@@ -1,111 +1,192 @@
+import argparse
+import api_client
+import checkpoints
 import countries
+import db
+import fingerprints
 import leagues
 import teams
 import players
+import quota_planner
+import response_archive
+import scheduler
 import squads
 import managers
 import standings
+import telemetry
 
 
-def run_countries():
+def run_countries(client, pool):
     """Runs the countries script and handles any errors."""
     try:
         print("Running countries script...")
-        countries.fetch_and_store_countries()  # Call the main function in countries.py
+        countries.fetch_and_store_countries(client, pool)  # Call the main function in countries.py
     except Exception as e:
         print(f"Error occurred in countries script: {e}")
         raise  # Rethrow the exception to stop further execution
 
 
-def run_leagues():
+def run_leagues(client, pool):
     """Runs the leagues script and handles any errors."""
     try:
         print("Running leagues script...")
-        leagues.fetch_and_store_league_ids()  # Call the main function in leagues.py
+        leagues.fetch_and_store_league_ids(client, pool)  # Call the main function in leagues.py
     except Exception as e:
         print(f"Error occurred in leagues script: {e}")
         raise  # Rethrow the exception to stop further execution
 
 
-def run_teams():
+def run_teams(client, pool):
     """Runs the teams script and handles any errors."""
     try:
         print("Running teams script...")
-        teams.fetch_and_store_teams()  # Call the main function in teams.py
+        teams.fetch_and_store_teams(client, pool)  # Call the main function in teams.py
     except Exception as e:
         print(f"Error occurred in teams script: {e}")
         raise  # Rethrow the exception to stop further execution
 
 
-def run_players():
-    """Runs the players script and handles any errors."""
+def run_players(client, pool, run, limit=None, mode="crawl"):
+    """Runs the players script (full crawl or squad-driven refresh) and handles any errors."""
     try:
-        print("Running players script...")
-        players.store_players()  # Call the main function in players.py
+        print(f"Running players script ({mode})...")
+        if mode == "refresh":
+            players.refresh_players(client, pool, run, limit)
+        else:
+            players.store_players(client, pool, run, limit)  # Call the main function in players.py
     except Exception as e:
         print(f"Error occurred in players script: {e}")
         raise  # Rethrow the exception to stop further execution
 
 
-def run_squads():
+def run_squads(client, pool, run, limit=None):
     """Runs the squads script and handles any errors."""
     try:
         print("Running squads script...")
-        squads.fetch_and_store_squads()  # Call the main function in squads.py
+        squads.fetch_and_store_squads(client, pool, run, limit)  # Call the main function in squads.py
     except Exception as e:
         print(f"Error occurred in squads script: {e}")
         raise  # Rethrow the exception to stop further execution
 
 
-def run_managers():
+def run_managers(client, pool, run, limit=None):
     """Runs the managers script and handles any errors."""
     try:
         print("Running managers script...")
-        managers.fetch_and_store_managers()  # Call the main function in managers.py
+        managers.fetch_and_store_managers(client, pool, run, limit)  # Call the main function in managers.py
     except Exception as e:
         print(f"Error occurred in managers script: {e}")
         raise  # Rethrow the exception to stop further execution
 
 
-def run_standings():
+def run_standings(client, pool):
     """Runs the standings script and handles any errors."""
     try:
         print("Running standings script...")
         # Call the main function in standings.py
-        standings.fetch_and_store_league_standings()
+        standings.fetch_and_store_league_standings(client, pool)
     except Exception as e:
         print(f"Error occurred in standings script: {e}")
         raise  # Rethrow the exception to stop further execution
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the match MPV datasource.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the on-disk API response cache.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last unfinished run from its checkpoints.")
+    parser.add_argument("--force-upsert", action="store_true",
+                        help="Upsert every row, even ones unchanged since the last run.")
+    parser.add_argument("--plan", action="store_true",
+                        help="Print the quota plan for this run and exit without calling the API.")
+    parser.add_argument("--ignore-quota", action="store_true",
+                        help="Run every stage in full, whatever is left of the daily quota.")
+    parser.add_argument("--players", choices=["auto", "refresh", "crawl"], default="auto",
+                        help="Refresh only the players whose squads changed, crawl every "
+                             "profile page, or crawl only when the last crawl is "
+                             "PLAYERS_FULL_CRAWL_DAYS old (auto).")
+    archive = parser.add_mutually_exclusive_group()
+    archive.add_argument("--record", metavar="ARCHIVE",
+                         help="Also save every raw API response to this archive file.")
+    archive.add_argument("--replay", metavar="ARCHIVE",
+                         help="Serve API responses from this archive instead of calling the API.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Refresh every stage. Returns the scheduler stages with their status and timings."""
+    args = parse_args(argv)
+    if args.force_upsert:
+        fingerprints.get_store().enabled = False
+
+    # One pooled keep-alive API client and one Postgres connection pool are shared by every stage.
+    run = checkpoints.start_run(resume=args.resume)
+    pool = None
+    started = False
     try:
-
-        # Run countries script
-        run_countries()
-
-        # Run leagues script only if countries ran successfully
-        run_leagues()
-
-        # Run teams script only if leagues ran successfully
-        run_teams()
-
-        # Run players script only if teams ran successfully
-        run_players()
-
-        # Run squads script only if players ran successfully
-        run_squads()
-
-        # Run managers script only if squads ran successfully
-        run_managers()
-
-        # Run standings script only if managers ran successfully
-        run_standings()
-
+        pool = db.create_pool()
+        players_mode = players.choose_mode(run, args.players)
+        # A replay spends no quota.
+        plan = None if args.ignore_quota or args.replay else quota_planner.build_plan(
+            pool, run, players_mode=players_mode)
+        if args.plan:
+            return []
+        archive = response_archive.from_args(args)
+        with api_client.ApiClient(use_cache=not args.no_cache, archive=archive) as client:
+            started = True
+            stages = run_all(client, pool, run, plan, players_mode)
+            if client.cache is not None:
+                print(client.cache.summary())
+    finally:
+        if not started:
+            run.discard()  # Nothing ran, so there is nothing for --resume to continue
+        if pool is not None:
+            pool.closeall()
+    return stages
+
+
+def build_stages(client, pool, run, plan=None, players_mode="crawl"):
+    """
+    The datasource stages and what each one really needs to have finished first,
+    with the quota plan's deferrals and trims applied.
+    """
+    def limit(name):
+        return plan[name].limit if plan else None
+
+    return quota_planner.apply(plan, [
+        scheduler.Stage("countries", lambda: run_countries(client, pool)),
+        scheduler.Stage("leagues", lambda: run_leagues(client, pool), after=["countries"]),
+        scheduler.Stage("teams", lambda: run_teams(client, pool), after=["leagues"]),
+        # The global players crawl does not read anything the other stages write;
+        # the refresh fetches the players the squads stage queued.
+        scheduler.Stage("players",
+                        lambda: run_players(client, pool, run, limit("players"), players_mode),
+                        after=["squads"] if players_mode == "refresh" else []),
+        scheduler.Stage("squads", lambda: run_squads(client, pool, run, limit("squads")),
+                        after=["teams"]),
+        scheduler.Stage("managers", lambda: run_managers(client, pool, run, limit("managers")),
+                        after=["teams"]),
+        scheduler.Stage("standings", lambda: run_standings(client, pool), after=["leagues"]),
+    ])
+
+
+def run_all(client, pool, run, plan=None, players_mode="crawl"):
+    """Run every stage, independent ones at the same time, under the shared API rate budget."""
+    stages = scheduler.run_stages(build_stages(client, pool, run, plan, players_mode))
+    scheduler.print_report(stages)
+    print(f"📈 Run report written to {telemetry.write_report(run.run_id)}")
+
+    unfinished = [stage.name for stage in stages if stage.status != "done"]
+    if unfinished:
+        print(f"Process terminated due to error in: {', '.join(unfinished)}")
+    elif not quota_planner.is_complete(plan):
+        print("⏸️ Work was deferred to stay inside the daily quota. "
+              "Run again with --resume after the quota resets to finish it.")
+    else:
+        run.finish()
         print("All scripts ran successfully!")
-
-    except Exception as e:
-        print(f"Process terminated due to error: {e}")
+    return stages
 
 
 if __name__ == "__main__":
@@ -1,158 +1,183 @@
 import os
+from collections import namedtuple
 from dotenv import load_dotenv
-import requests
-import psycopg2
-from datetime import datetime
-import time
+import api_client
+import bulk_loader
+import checkpoints
+import db
+import fetcher
+import schemas
+import teams
+import telemetry
 
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("RAPIDAPI_KEY")
-host = os.getenv("HOST_URL")
-base_url = os.getenv("API_BASE_URL")
 api_source = os.getenv("API_SOURCE")
-db_host = os.getenv("DB_HOST")
-db_name = os.getenv("DB_NAME")
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
-# 0.24 seconds delay will result in 250 requests per minute.  60 seconds/ 250 request
-delay_seconds = 0.24
 
 
-def fetch_team_ids(cursor):
-    """Fetch team IDs from the database."""
-    try:
-        cursor.execute("""
-            SELECT tam.api_team_id
-            FROM teams_api_mapping tam
-        """)
-        teams = cursor.fetchall()
-        return [{'team_id': team[0]} for team in teams]
-    except Exception as e:
-        print(f"Failed to fetch team ids: {e}")
-        return []
+def index_career(coach):
+    """Decode every spell of a coach's career once, indexed by the API ID of the spell's team."""
+    spells = {}
+    for career in coach.get('career', []):
+        team_id = (career.get('team') or {}).get('id')
+        # One row per spell at the team, each with its own career fields
+        spells.setdefault(team_id, []).append(
+            decode_manager(coach, career, api_source=api_source))
+    return spells
 
 
-def fetch_managers_details(team_ids):
-    """Fetch managers details from the API for given team IDs."""
+def fetch_managers_details(client, team_ids, coaches=None):
+    """
+    Fetch managers details from the API for given team IDs.
+    `coaches` maps coach ID -> career index for coaches already seen in this run, so a
+    coach who worked at many of our teams is decoded once however often the API returns them.
+    They are still downloaded once per team: /coachs can only list a team's coaches by team,
+    and each team is its own request (and response-cache entry).
+    Returns the manager rows and the IDs of the teams that were fetched successfully.
+    """
+    coaches = {} if coaches is None else coaches
     manager_details = []
-    for team in team_ids:  # Loop through each team dynamically
-        success = False
+    fetched_team_ids = []
+    reused = 0
+    responses = fetcher.fetch_many(
+        client, "coachs", [{"team": team['team_id']} for team in team_ids])
+    for team, results in zip(team_ids, responses):  # Loop through each team dynamically
         # Get the current team ID dynamically
         current_team_id = team['team_id']
-        while not success:
-            try:
-                response = requests.get(
-                    f"{base_url}/coachs",
-                    headers={
-                        "x-rapidapi-key": api_key,
-                        "x-rapidapi-host": host,
-                    },
-                    # Fetch data only for the current team ID
-                    params={"team": current_team_id}
-                )
-                if response.status_code == 200:
-                    results = response.json()
-                    for result in results.get('response', []):
-                        manager_info = {
-                            'api_manager_id': result.get('id'),
-                            'manager_name': result.get('name', ''),
-                            'first_name': result.get('firstname', ''),
-                            'last_name': result.get('lastname', ''),
-                            'age': result.get('age', ''),
-                            'birthday': result.get('birth', {}).get('date', ''),
-                            'birth_place': result.get('birth', {}).get('place', ''),
-                            'birth_country': result.get('birth', {}).get('country', ''),
-                            'nationality': result.get('nationality', ''),
-                            'height': result.get('height', ''),
-                            'weight': result.get('weight', ''),
-                            'photo_url': result.get('photo', ''),
-                            'api_source': api_source,
-                            'api_team_id': current_team_id,  # Assign the current team ID
-                            'team_name': result.get('team', {}).get('name', '')
-                        }
-
-                        # Extract and filter career information dynamically
-                        careers = result.get('career', [])
-                        for career in careers:
-                            # Only store career data if it relates to the current team
-                            if career.get('team', {}).get('id') == current_team_id:
-                                career_info = {
-                                    'api_team_id': career.get('team', {}).get('id', ''),
-                                    'team_name': career.get('team', {}).get('name', ''),
-                                    'start_date': career.get('start', ''),
-                                    'end_date': career.get('end', '')
-                                }
-                                # Add career info to manager info
-                                manager_info.update(career_info)
-                                manager_details.append(manager_info)
-                                print(
-                                    f"Manager: {manager_info['manager_name']} | Team: {manager_info['team_name']}")
-
-                    success = True
-                elif response.status_code == 429:
-                    print("Rate limit hit, waiting...")
-                    time.sleep(60)
-                else:
-                    print(
-                        f"Failed to fetch Manager data for team ID: {current_team_id}. Status: {response.status_code}")
-                    success = True
-                time.sleep(delay_seconds)
-            except Exception as e:
-                print(f"API error for team {current_team_id}: {e}")
-                success = True
-    return manager_details
+        if results is None:
+            print(
+                f"Failed to fetch Manager data for team ID: {current_team_id}.")
+            continue
+        fetched_team_ids.append(current_team_id)
+
+        for result in results.get('response', []):
+            coach_id = result.get('id')
+            if coach_id is not None and coach_id in coaches:
+                spells = coaches[coach_id]
+                reused += 1
+            else:
+                spells = index_career(result)
+                if coach_id is not None:
+                    coaches[coach_id] = spells
+            # Only store career data if it relates to the current team
+            for manager in spells.get(current_team_id, ()):
+                manager_details.append(manager)
+                print(
+                    f"Manager: {manager.manager_name} | Team: {manager.team_name}")
+
+    if reused:
+        print(f"♻️ Reused the decoded careers of {reused} coaches already seen in this run.")
+    telemetry.add("rows_parsed", len(manager_details))
+    return manager_details, fetched_team_ids
+
+
+# Argument order of the upsert_managers database function
+MANAGER_COLUMNS = (
+    'api_manager_id',
+    'manager_name',
+    'first_name',
+    'last_name',
+    'age',
+    'birthday',
+    'birth_place',
+    'birth_country',
+    'nationality',
+    'height',
+    'weight',
+    'photo_url',
+    'api_team_id',
+    'team_name',
+    'start_date',
+    'end_date',
+    'api_source',
+)
+# One manager's spell at a team, in upsert_managers argument order
+ManagerRow = namedtuple("ManagerRow", MANAGER_COLUMNS)
+
+# Where each column comes from in a /coachs entry and one spell of its career
+decode_manager = schemas.compile_decoder(ManagerRow, ("coach", "career"), {
+    'api_manager_id': ('coach.id', None),
+    'manager_name': 'coach.name',
+    'first_name': 'coach.firstname',
+    'last_name': 'coach.lastname',
+    'age': 'coach.age',
+    'birthday': 'coach.birth.date',
+    'birth_place': 'coach.birth.place',
+    'birth_country': 'coach.birth.country',
+    'nationality': 'coach.nationality',
+    'height': 'coach.height',
+    'weight': 'coach.weight',
+    'photo_url': 'coach.photo',
+    'api_team_id': 'career.team.id',
+    'team_name': 'career.team.name',
+    'start_date': 'career.start',
+    'end_date': 'career.end',
+})
 
 
 def save_managers_details(manager_details, cursor):
-    """Save managers details to the database."""
+    """
+    Save managers details to the database.
+    Rows the database rejects are set aside in datasource_rejects; the rest are committed.
+    """
     try:
-        for manager in manager_details:
-            try:
-                cursor.execute("""
-                    SELECT upsert_managers(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    manager['api_manager_id'],
-                    manager['manager_name'],
-                    manager['first_name'],
-                    manager['last_name'],
-                    manager['age'],
-                    manager['birthday'],
-                    manager['birth_place'],
-                    manager['birth_country'],
-                    manager['nationality'],
-                    manager['height'],
-                    manager['weight'],
-                    manager['photo_url'],
-                    manager['api_team_id'],
-                    manager['team_name'],
-                    manager['start_date'],
-                    manager['end_date'],
-                    manager['api_source']
-                ))
-            except Exception as e:
-                print(f"Failed to upsert manager data for Team ID: {
-                      manager['api_team_id']}. Error: {e}")
-                cursor.connection.rollback()
-                break  # Exit the loop on failure
+        rejected = bulk_loader.save_rows(
+            cursor, "managers", "upsert_managers", MANAGER_COLUMNS, manager_details)
         cursor.connection.commit()
+        telemetry.add("rows_upserted", len(manager_details) - len(rejected))
+        telemetry.add("rows_failed", len(rejected))
         print("Data successfully saved")
+
     except Exception as e:
         print(f"Failed to save manager data to PostgreSQL: {e}")
         cursor.connection.rollback()
+        telemetry.add("rows_failed", len(manager_details))
+        raise  # The teams must not be checkpointed
 
 
-def fetch_and_store_managers():
-    """Main function to orchestrate fetching and storing managers."""
+def fetch_and_store_managers(client=None, pool=None, run=None, limit=None, team_ids=None):
+    """
+    Main function to orchestrate fetching and storing managers.
+    Teams are handled CHECKPOINT_TEAMS at a time and checkpointed once their managers are saved.
+    `limit` caps how many teams are fetched this run (the quota plan's trim).
+    `team_ids` ({'team_id'} dicts) defaults to every stored team.
+    """
+    client = client or api_client.ApiClient()
+    pool = pool or db.create_pool()
+    run = run or checkpoints.start_run()
+    coaches = {}  # Coach ID -> career index, shared by every chunk of this run
     try:
-        with psycopg2.connect(host=db_host, database=db_name, user=db_user, password=db_password) as conn:
-            with conn.cursor() as cursor:
-                team_ids = fetch_team_ids(cursor)
-                manager_details = fetch_managers_details(team_ids)
-                save_managers_details(manager_details, cursor)
+        if team_ids is None:
+            team_ids = teams.team_ids_for_run(pool, run)
+
+        done_teams = run.completed("managers")
+        if done_teams:
+            print(f"↩️ Skipping {len(done_teams)} teams whose managers are already saved in this run.")
+        team_ids = [team for team in team_ids if str(team['team_id']) not in done_teams]
+        if limit is not None and limit < len(team_ids):
+            print(f"📒 Fetching {limit} of {len(team_ids)} teams to stay inside the daily quota.")
+            team_ids = team_ids[:limit]
+
+        for teams_chunk in checkpoints.chunks(team_ids, checkpoints.CHECKPOINT_TEAMS):
+            manager_details, fetched_team_ids = fetch_managers_details(client, teams_chunk, coaches)
+            failed = db.failed_writes(
+                pool,
+                db.partition(manager_details, key=lambda manager: manager.api_team_id),
+                save_managers_details)
+            failed_team_ids = {manager.api_team_id for rows in failed for manager in rows}
+            run.mark_done("managers", [team_id for team_id in fetched_team_ids
+                                       if team_id not in failed_team_ids])
+
+        # Fail the stage so the run stays open and --resume picks these teams up.
+        done_teams = run.completed("managers")
+        missing = [team for team in team_ids if str(team['team_id']) not in done_teams]
+        if missing:
+            raise RuntimeError(
+                f"the managers of {len(missing)} of {len(team_ids)} teams were not saved")
     except Exception as e:
         print(f"Failed to fetch and store managers: {e}")
+        raise
 
 
 # Run the main function
@@ -0,0 +1,50 @@
+import os
+import queue
+import threading
+from dotenv import load_dotenv
+import telemetry
+
+# Load environment variables
+load_dotenv()
+# Parsed batches allowed to wait for a writer before the fetching side blocks.
+PIPELINE_DEPTH = int(os.getenv("PIPELINE_DEPTH", "8"))
+
+_DONE = object()
+
+
+def stream(batches, write, workers=1, depth=PIPELINE_DEPTH):
+    """
+    Call `write(batch)` for every batch produced by the `batches` iterable on `workers`
+    writer threads, while the caller's thread keeps producing the next batches.
+    At most `depth` batches are queued in between: a producer that outruns the writers
+    waits, so memory stays flat however many batches there are.
+    Returns True when every batch was written without raising.
+    """
+    pending = queue.Queue(maxsize=depth)
+    failed = []
+
+    def writer():
+        while True:
+            batch = pending.get()
+            if batch is _DONE:
+                return
+            try:
+                write(batch)
+            except Exception as e:
+                print(f"❌ A pipeline writer failed: {e}")
+                failed.append(e)
+
+    threads = [threading.Thread(target=telemetry.propagate(writer), daemon=True)
+               for _ in range(max(workers, 1))]
+    for thread in threads:
+        thread.start()
+    try:
+        for batch in batches:
+            pending.put(batch)
+    finally:
+        # Let the writers finish what is already queued, even if producing failed.
+        for _ in threads:
+            pending.put(_DONE)
+        for thread in threads:
+            thread.join()
+    return not failed
@@ -1,159 +1,302 @@
 import os
-from dotenv import load_dotenv
-import requests
-import psycopg2
-from datetime import datetime
 import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+import api_client
+import bulk_loader
+import checkpoints
+import db
+import fetcher
+import fingerprints
+import pipeline
+import retry_policy
+import schemas
+import telemetry
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("RAPIDAPI_KEY")
-host = os.getenv("HOST_URL")
-base_url = os.getenv("API_BASE_URL")
 api_source = os.getenv("API_SOURCE")
-db_host = os.getenv("DB_HOST")
-db_name = os.getenv("DB_NAME")
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
-# 0.24 seconds delay will result in 250 requests per minute.  60 seconds/ 250 request
-delay_seconds = 0.24
+# The full /players/profiles crawl reconciles what the squad-driven refresh cannot see
+# (players who left our squads, profile edits without a squad change). It runs when the
+# last finished crawl is older than this.
+FULL_CRAWL_DAYS = float(os.getenv("PLAYERS_FULL_CRAWL_DAYS", "7"))
+REFRESH_BATCH = int(os.getenv("PLAYERS_REFRESH_BATCH", "50"))  # Profiles written at a time
+
+
+def extract_players_data(results):
+    """Build the player rows from one /players/profiles page."""
+    players_information = []
+    for player_data in results.get('response', []):
+        players_information.append(decode_player(player_data, api_source=api_source))
+    telemetry.add("rows_parsed", len(players_information))
+    return players_information
 
 
-def fetch_players_data():
+def fetch_players_data(client, skip_pages=(), total_pages=None,
+                       window=checkpoints.CHECKPOINT_PAGES, limit=None):
     """
-    Fetch player data from the API
+    Fetch player data from the API, leaving out pages in `skip_pages`.
+    Page 1 tells us the page total; the remaining pages are then fetched concurrently,
+    `window` pages at a time, through fetcher.fetch_stream (so the shared rate limiter
+    still paces them) and handed back in page order.
+    At most `limit` pages are requested when it is set.
+    Pages that fail are fetched once more at the end, after waiting out the
+    players/profiles circuit breaker if a run of errors opened it.
+    Yields (page, total pages, player rows) for each fetched page.
     """
-    players_information = []
-    page = 1
-
-    while True:
-        try:
-            response = requests.get(
-                f"{base_url}/players/profiles",
-                headers={
-                    "x-rapidapi-key": api_key,
-                    "x-rapidapi-host": host,
-                },
-                params={
-                    "page": page,
-                }
-            )
-
-            if response.status_code == 200:
-                results = response.json()
-                players = results.get('response', [])
-                current_page = results.get('paging', {}).get('current', 1)
-                total_pages = results.get('paging', {}).get('total', 1)
-
-                for player_data in players:
-                    player_info = player_data.get('player', {})
-                    birth_info = player_info.get('birth', {})
-
-                    ply_info = {
-                        'api_player_id': player_info.get('id', ''),
-                        'player_name': player_info.get('name', ''),
-                        'first_name': player_info.get('firstname', ''),
-                        'last_name': player_info.get('lastname', ''),
-                        'age': player_info.get('age', ''),
-                        'birthday': birth_info.get('date', ''),
-                        'birth_place': birth_info.get('place', ''),
-                        'birth_country': birth_info.get('country', ''),
-                        'nationality': player_info.get('nationality', ''),
-                        'height': player_info.get('height', ''),
-                        'weight': player_info.get('weight', ''),
-                        'shirt_number': player_info.get('number', ''),
-                        'position': player_info.get('position', ''),
-                        'photo': player_info.get('photo', ''),
-                        'api_source': api_source,
-                    }
-                    players_information.append(ply_info)
-
-                print(f"Page {current_page} of {total_pages} completed.")
-
-                if current_page >= total_pages:
-                    break  # Exit loop if all pages fetched
-
-                page += 1
-                if page % 2 == 1:
-                    # Delay for odd-numbered pages
-                    time.sleep(delay_seconds)
-
-            elif response.status_code == 429:
-                print("Rate limit hit, waiting...")
-                time.sleep(60)
-
-            else:
-                print(
-                    f"Failed to fetch player data. Status code: {response.status_code}, Response: {response.text}")
-                break
-
-            # Delay after each successful API call
-            time.sleep(delay_seconds)
-
-        except Exception as e:
-            print(f"An error occurred while fetching player data: {e}")
-            break
+    requested = 0
+    if limit == 0:
+        return
+    if total_pages is None or "1" not in skip_pages:
+        requested += 1
+        results = fetcher.fetch_one(client, "players/profiles", {"page": 1})
+        if results is None:
+            print("Failed to fetch player data for page 1.")
+            return
+        total_pages = results.get('paging', {}).get('total', 1)
+        if "1" not in skip_pages:
+            print(f"Page 1 of {total_pages} completed.")
+            yield 1, total_pages, extract_players_data(results)
+
+    remaining = [page for page in range(2, total_pages + 1) if str(page) not in skip_pages]
+    if limit is not None and len(remaining) > limit - requested:
+        print(f"📒 Fetching {limit - requested} of {len(remaining)} remaining player pages "
+              "to stay inside the daily quota.")
+        remaining = remaining[:limit - requested]
+    failed = []
+    for params, results in fetcher.fetch_stream(
+            client, "players/profiles", [{"page": page} for page in remaining], window):
+        page = params["page"]
+        if results is None:
+            print(f"Failed to fetch player data for page {page}.")
+            failed.append(page)
+            continue
+        print(f"Page {page} of {total_pages} completed.")
+        yield page, total_pages, extract_players_data(results)
+    if not failed:
+        return
+
+    # An open breaker fails every page at once; wait until it lets requests through again.
+    wait = retry_policy.get_guard("players/profiles").breaker.cooldown_left()
+    print(f"🔁 Retrying {len(failed)} failed player pages"
+          + (f" in {wait:.0f} seconds..." if wait >= 1 else "..."))
+    time.sleep(wait)
+    for params, results in fetcher.fetch_stream(
+            client, "players/profiles", [{"page": page} for page in failed], window):
+        page = params["page"]
+        if results is None:
+            # Not checkpointed: store_players fails the stage and --resume fetches it again.
+            print(f"Failed to fetch player data for page {page} again.")
+            continue
+        print(f"Page {page} of {total_pages} completed.")
+        yield page, total_pages, extract_players_data(results)
 
-    return players_information
+
+# Argument order of the upsert_players database function
+PLAYER_COLUMNS = (
+    'api_player_id',
+    'player_name',
+    'first_name',
+    'last_name',
+    'age',
+    'birthday',
+    'birth_place',
+    'birth_country',
+    'nationality',
+    'height',
+    'weight',
+    'shirt_number',
+    'position',
+    'photo',
+    'api_source',
+)
+# One player profile, in upsert_players argument order
+PlayerRow = namedtuple("PlayerRow", PLAYER_COLUMNS)
+
+# Where each column comes from in a /players/profiles entry
+decode_player = schemas.compile_decoder(PlayerRow, ("player_data",), {
+    'api_player_id': 'player_data.player.id',
+    'player_name': 'player_data.player.name',
+    'first_name': 'player_data.player.firstname',
+    'last_name': 'player_data.player.lastname',
+    'age': 'player_data.player.age',
+    'birthday': 'player_data.player.birth.date',
+    'birth_place': 'player_data.player.birth.place',
+    'birth_country': 'player_data.player.birth.country',
+    'nationality': 'player_data.player.nationality',
+    'height': 'player_data.player.height',
+    'weight': 'player_data.player.weight',
+    'shirt_number': 'player_data.player.number',
+    'position': 'player_data.player.position',
+    'photo': 'player_data.player.photo',
+})
 
 
 def save_player_data_to_db(players_information, cursor):
     """
     Save the fetched player data to the PostgreSQL database.
+    Rows the database rejects are set aside in datasource_rejects; the rest are committed.
     """
-    try:
-        for ply in players_information:
-            try:
-                cursor.execute("""
-                    SELECT upsert_players(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    ply['api_player_id'],
-                    ply['player_name'],
-                    ply['first_name'],
-                    ply['last_name'],
-                    ply['age'],
-                    ply['birthday'],
-                    ply['birth_place'],
-                    ply['birth_country'],
-                    ply['nationality'],
-                    ply['height'],
-                    ply['weight'],
-                    ply['shirt_number'],
-                    ply['position'],
-                    ply['photo'],
-                    ply['api_source']
-                ))
-
-            except Exception as e:
-                print(
-                    f"Failed to upsert player data for Player ID {ply['api_player_id']}. Error: {e}")
-                cursor.connection.rollback()
-                raise  # Re-raise the exception to ensure the commit does not happen
+    store = fingerprints.get_store()
+    players_information, pending = store.changed(
+        "players", players_information, key=lambda ply: ply.api_player_id)
+    if not players_information:
+        print("⏭️ Player data unchanged. Nothing to save.")
+        return
 
+    try:
+        rejected = bulk_loader.save_rows(
+            cursor, "players", "upsert_players", PLAYER_COLUMNS, players_information)
         cursor.connection.commit()
+        store.record("players", [fingerprint for position, fingerprint in enumerate(pending)
+                                 if position not in rejected])
+        telemetry.add("rows_upserted", len(players_information) - len(rejected))
+        telemetry.add("rows_failed", len(rejected))
         print("Player Data successfully saved to database.")
 
     except Exception as e:
         print(f"Failed to save player data to the PostgreSQL database: {e}")
+        cursor.connection.rollback()
+        telemetry.add("rows_failed", len(players_information))
+        raise  # The page must not be checkpointed
+
 
+def write_players_page(pool, run, page, players_information):
+    """Save the players from one page on its own connection, then checkpoint the page."""
+    with db.connection(pool) as conn:
+        with conn.cursor() as cursor:
+            save_player_data_to_db(players_information, cursor)
+    run.mark_done("players", [page])
 
-def store_players():
+
+def choose_mode(run, mode="auto"):
     """
-    Main function that stores players.
+    "crawl" (every /players/profiles page) or "refresh" (only the players squads queued).
+    In "auto" mode a crawl runs when none has finished within FULL_CRAWL_DAYS, or when
+    this run already started one.
     """
-    try:
-        # Establish connection and cursor using the 'with' statement
-        with psycopg2.connect(host=db_host, database=db_name, user=db_user, password=db_password) as conn:
-            with conn.cursor() as cursor:
+    if mode != "auto":
+        return mode
+    if run.get_meta("players", "crawl_started") and not run.get_meta("players", "crawl_finished"):
+        return "crawl"
+    last_crawl = run.last_meta("players", "crawl_finished")
+    if last_crawl is None or (datetime.now() - datetime.fromisoformat(last_crawl)
+                              >= timedelta(days=FULL_CRAWL_DAYS)):
+        return "crawl"
+    return "refresh"
+
+
+def fetch_player_profiles(client, player_ids, batch=REFRESH_BATCH):
+    """
+    Fetch /players/profiles by player ID, `batch` IDs at a time.
+    Yields (IDs the API answered, player rows) per batch. IDs whose request failed are left
+    out so they stay queued for the next run.
+    """
+    for ids in checkpoints.chunks(player_ids, batch):
+        answered = []
+        players_information = []
+        responses = fetcher.fetch_many(client, "players/profiles", [{"player": pid} for pid in ids])
+        for player_id, results in zip(ids, responses):
+            if results is None:
+                print(f"Failed to fetch the profile of player ID {player_id}.")
+                continue
+            answered.append(player_id)
+            players_information.extend(extract_players_data(results))
+        print(f"Profiles refreshed for {len(answered)} of {len(ids)} players.")
+        yield answered, players_information
 
-                # Fetch players data
-                players_information = fetch_players_data()
 
-                # Save the fetched data to the database
+def write_refreshed_players(pool, run, player_ids, players_information):
+    """Save one batch of refreshed profiles, then take the players off the refresh queue."""
+    if players_information:
+        with db.connection(pool) as conn:
+            with conn.cursor() as cursor:
                 save_player_data_to_db(players_information, cursor)
+    run.unqueue("players", player_ids)
+
+
+def refresh_players(client=None, pool=None, run=None, limit=None, player_ids=None):
+    """
+    Fetch only the profiles of players queued by the squads stage (new or changed squad
+    members) by player ID, instead of crawling every page. `limit` caps the players
+    requested this run; the rest stay queued. `player_ids` refreshes those players instead.
+    """
+    client = client or api_client.ApiClient()
+    pool = pool or db.create_pool()
+    run = run or checkpoints.start_run()
+    try:
+        if player_ids is None:
+            player_ids = run.queued("players")
+        if not player_ids:
+            print("⏭️ No squad changes since the last refresh. No player profiles to fetch.")
+            return
+        if limit is not None and limit < len(player_ids):
+            print(f"📒 Refreshing {limit} of {len(player_ids)} queued players "
+                  "to stay inside the daily quota.")
+            player_ids = player_ids[:limit]
+        print(f"🎯 Refreshing the profiles of {len(player_ids)} squad players.")
+
+        pipeline.stream(fetch_player_profiles(client, player_ids),
+                        lambda batch: write_refreshed_players(pool, run, *batch),
+                        workers=db.WRITER_WORKERS)
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+def store_players(client=None, pool=None, run=None, limit=None):
+    """
+    Main function that stores players by crawling every /players/profiles page.
+    Each page is written, committed and checkpointed as soon as it is parsed, on writer
+    threads that overlap with fetching the next pages. A resumed run only fetches the
+    pages that were not committed yet. `limit` caps the pages requested this run.
+    """
+    client = client or api_client.ApiClient()
+    pool = pool or db.create_pool()
+    run = run or checkpoints.start_run()
+    try:
+        if run.get_meta("players", "crawl_started") is None:
+            run.set_meta("players", "crawl_started", datetime.now().isoformat(timespec="seconds"))
+        done_pages = run.completed("players")
+        known_total = run.get_meta("players", "total_pages")
+        if done_pages:
+            print(f"↩️ Skipping {len(done_pages)} player pages already saved in this run.")
+
+        def parsed_pages():
+            nonlocal known_total
+            for page, total_pages, rows in fetch_players_data(
+                    client, done_pages, int(known_total) if known_total else None,
+                    limit=limit):
+                if str(total_pages) != known_total:
+                    run.set_meta("players", "total_pages", total_pages)
+                    known_total = str(total_pages)
+                yield page, rows
+
+        written = pipeline.stream(parsed_pages(),
+                                  lambda page: write_players_page(pool, run, *page),
+                                  workers=db.WRITER_WORKERS)
+
+        if not known_total:
+            raise RuntimeError("the page total is unknown: page 1 could not be fetched")
+        done = len(run.completed("players"))
+        # Pages this run was allowed to reach; the quota plan reports the ones it trimmed.
+        expected = int(known_total) if limit is None else min(int(known_total),
+                                                              len(done_pages) + limit)
+        if not written or done < expected:
+            # Fail the stage so the run stays open and --resume fetches the missing pages.
+            raise RuntimeError(f"{expected - done} player pages were not saved")
+        if done >= int(known_total):
+            crawl_finished = datetime.now()
+            run.set_meta("players", "crawl_finished", crawl_finished.isoformat(timespec="seconds"))
+            # Every profile was just rewritten, so nothing queued before the crawl finished is
+            # pending, including the squad players queued by the squads stage running alongside.
+            run.unqueue("players", before=crawl_finished)
+            print("✅ Full players crawl finished.")
 
     except Exception as e:
         print(f"An error occurred: {e}")
+        raise
 
 
 # Run the main function
@@ -0,0 +1,149 @@
+import os
+import math
+import time
+from dotenv import load_dotenv
+import db
+import leagues
+import rate_limiter
+import standings
+import teams
+
+# Load environment variables
+load_dotenv()
+
+# Used until the API has reported the plan's daily limit through x-ratelimit-requests-*.
+DAILY_QUOTA = os.getenv("API_DAILY_QUOTA")
+RESERVE = int(os.getenv("QUOTA_RESERVE", "50"))  # Calls always kept back for ad-hoc use
+RETRY_MARGIN = float(os.getenv("QUOTA_RETRY_MARGIN", "0.05"))  # Extra calls retries may cost
+# When the players page count has never been seen, plan for this many pages.
+PLAYERS_PAGES_GUESS = int(os.getenv("QUOTA_PLAYERS_PAGES_GUESS", "1000"))
+
+# Stages in the order they get budget. The stages everything else hangs off come first;
+# the global players crawl is the most expensive and the least time-sensitive.
+PRIORITY = os.getenv(
+    "QUOTA_STAGE_PRIORITY",
+    "countries,leagues,teams,standings,squads,managers,players").split(",")
+# Stages made of independent units (teams, pages) that can be cut short and resumed.
+# The rest make one call per league and only make sense complete.
+TRIMMABLE = {"squads", "managers", "players"}
+
+
+class StagePlan:
+    """How many calls a stage is expected to make and how many it may make this run."""
+
+    def __init__(self, name, units, calls):
+        self.name = name
+        self.units = units  # Leagues, teams, pages or players left to fetch
+        self.calls = calls  # Estimated calls, including the retry margin
+        self.allowed_units = units
+        self.status = "full"  # full | trimmed | deferred
+
+    @property
+    def allowed_calls(self):
+        return _with_margin(self.allowed_units)
+
+    @property
+    def limit(self):
+        """Unit cap to hand to a trimmable stage, None when it may do everything."""
+        return self.allowed_units if self.status == "trimmed" else None
+
+
+def _with_margin(units):
+    return math.ceil(units * (1 + RETRY_MARGIN))
+
+
+def daily_budget(bucket=None):
+    """Calls still available today (minus the reserve), or None when the quota is unknown."""
+    bucket = bucket or rate_limiter.get_bucket()
+    limit, remaining, reset_at = bucket.daily_quota() or (None, None, None)
+    if remaining is not None and reset_at is not None and time.time() >= reset_at:
+        remaining = limit  # The daily window rolled over since the API last told us
+    if remaining is None and DAILY_QUOTA:
+        remaining = int(DAILY_QUOTA)
+    if remaining is None:
+        return None
+    return max(remaining - RESERVE, 0)
+
+
+def estimate_units(pool, run, players_mode="crawl"):
+    """
+    Calls each stage needs this run, from what is already in the database and checkpoints.
+    A players refresh is estimated from the players queued so far; the squads stage of
+    this run may still add some.
+    """
+    with db.connection(pool) as conn:
+        with conn.cursor() as cursor:
+            current_seasons = len(teams.fetch_leagues_for_teams(cursor))
+            standings_leagues = len(standings.fetch_leagues_and_seasons(cursor))
+            team_count = len(teams.fetch_team_ids(cursor))
+
+    total_pages = run.get_meta("players", "total_pages") or run.last_meta("players", "total_pages")
+    total_pages = int(total_pages) if total_pages else PLAYERS_PAGES_GUESS
+    return {
+        "countries": 1,
+        "leagues": len(leagues.LEAGUE_IDS),
+        "teams": current_seasons,
+        "standings": standings_leagues,
+        "squads": max(team_count - len(run.completed("squads")), 0),
+        "managers": max(team_count - len(run.completed("managers")), 0),
+        "players": (len(run.queued("players")) if players_mode == "refresh"
+                    else max(total_pages - len(run.completed("players")), 0)),
+    }
+
+
+def allocate(units, budget):
+    """
+    Hand out `budget` calls in PRIORITY order. A stage that does not fit is trimmed to what
+    is left if it is TRIMMABLE, and deferred to a later run otherwise.
+    Returns {stage: StagePlan}.
+    """
+    plans = {name: StagePlan(name, count, _with_margin(count)) for name, count in units.items()}
+    left = budget
+    for name in sorted(plans, key=lambda name: PRIORITY.index(name)
+                       if name in PRIORITY else len(PRIORITY)):
+        plan = plans[name]
+        if plan.calls <= left:
+            left -= plan.calls
+        elif name in TRIMMABLE:
+            plan.allowed_units = min(int(left / (1 + RETRY_MARGIN)), plan.units)
+            plan.status = "trimmed" if plan.allowed_units else "deferred"
+            left -= plan.allowed_calls
+        else:
+            plan.allowed_units = 0
+            plan.status = "deferred"
+    return plans
+
+
+def build_plan(pool, run, bucket=None, players_mode="crawl"):
+    """Estimate every stage and fit the run into today's quota. None when the quota is unknown."""
+    budget = daily_budget(bucket)
+    if budget is None:
+        print("📒 Daily API quota unknown (set API_DAILY_QUOTA). Running without a quota plan.")
+        return None
+    plans = allocate(estimate_units(pool, run, players_mode), budget)
+    print_plan(plans, budget)
+    return plans
+
+
+def print_plan(plans, budget):
+    needed = sum(plan.calls for plan in plans.values())
+    print(f"📒 Quota plan: about {needed} calls needed, {budget} available today.")
+    for plan in plans.values():
+        note = "" if plan.status == "full" else f"  {plan.status}"
+        if plan.status == "trimmed":
+            note += f" to {plan.allowed_units} of {plan.units}"
+        print(f"   {plan.name:<10} {plan.calls:>6} calls{note}")
+
+
+def is_complete(plans):
+    return plans is None or all(plan.status == "full" for plan in plans.values())
+
+
+def apply(plans, stages):
+    """Drop deferred stages from the run; stages that depended on them use the data already stored."""
+    if plans is None:
+        return stages
+    deferred = {name for name, plan in plans.items() if plan.status == "deferred"}
+    for stage in stages:
+        stage.after = tuple(name for name in stage.after if name not in deferred)
+    return [stage for stage in stages if stage.name not in deferred]
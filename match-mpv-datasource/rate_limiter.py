@@ -0,0 +1,197 @@
+import os
+import asyncio
+import hashlib
+import sqlite3
+import time
+from dotenv import load_dotenv
+from state import STATE_DIR
+
+# Load environment variables
+load_dotenv()
+api_key = os.getenv("RAPIDAPI_KEY")
+host = os.getenv("HOST_URL")
+
+# The bucket lives in a small SQLite file so every stage, and every process on
+# this host using the same API key, draws from the same quota.
+RATE_LIMIT_DB = os.getenv(
+    "RATE_LIMIT_DB", os.path.join(STATE_DIR, "rate_limit.sqlite3"))
+
+# 250 requests per minute is the RapidAPI plan ceiling until the headers say otherwise.
+REQUESTS_PER_MINUTE = int(os.getenv("API_REQUESTS_PER_MINUTE", "250"))
+BURST = int(os.getenv("API_BURST", "10"))  # Tokens that can be spent back to back
+
+
+class TokenBucket:
+    """
+    Token bucket persisted in SQLite and tuned live from RapidAPI's x-ratelimit-* headers.
+    """
+
+    def __init__(self, name=None, path=RATE_LIMIT_DB,
+                 requests_per_minute=REQUESTS_PER_MINUTE, burst=BURST):
+        self.name = name or _default_bucket_name()
+        self.path = path
+        self.default_rate = requests_per_minute / 60
+        self.burst = burst
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    capacity REAL NOT NULL,
+                    refill_rate REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    blocked_until REAL NOT NULL DEFAULT 0,
+                    daily_limit INTEGER,
+                    daily_remaining INTEGER,
+                    daily_reset_at REAL
+                )
+            """)
+            conn.execute("""
+                INSERT OR IGNORE INTO buckets (name, tokens, capacity, refill_rate, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (self.name, self.burst, self.burst, self.default_rate, time.time()))
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # isolation_level=None lets us issue BEGIN IMMEDIATE ourselves, which takes the
+        # write lock up front so two processes can never spend the same token.
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _transaction(self, update):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT tokens, capacity, refill_rate, updated_at, blocked_until
+                FROM buckets WHERE name = ?
+            """, (self.name,)).fetchone()
+            now = time.time()
+            tokens, capacity, refill_rate, updated_at, blocked_until = row
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            result, changes = update(now, tokens, capacity, refill_rate, blocked_until)
+            changes.setdefault("tokens", tokens)
+            changes["updated_at"] = now
+            columns = ", ".join(f"{column} = ?" for column in changes)
+            conn.execute(f"UPDATE buckets SET {columns} WHERE name = ?",
+                         (*changes.values(), self.name))
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def try_acquire(self):
+        """Take one token. Returns 0 when granted, otherwise the seconds to wait before asking again."""
+        def update(now, tokens, capacity, refill_rate, blocked_until):
+            if blocked_until > now:
+                return blocked_until - now, {}
+            if tokens >= 1:
+                return 0, {"tokens": tokens - 1}
+            return (1 - tokens) / refill_rate, {}
+        return self._transaction(update)
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait on the event loop until a token is available."""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """
+        Align the bucket with the quota the API reports.
+        x-ratelimit-limit/remaining/reset describe the per-minute window and
+        x-ratelimit-requests-* the daily plan quota.
+        """
+        limit = _header_int(headers, "x-ratelimit-limit")
+        remaining = _header_int(headers, "x-ratelimit-remaining")
+        reset = _header_int(headers, "x-ratelimit-reset") or 60
+        daily_limit = _header_int(headers, "x-ratelimit-requests-limit")
+        daily_remaining = _header_int(headers, "x-ratelimit-requests-remaining")
+        daily_reset = _header_int(headers, "x-ratelimit-requests-reset")
+
+        def update(now, tokens, capacity, refill_rate, blocked_until):
+            changes = {}
+            if limit or remaining is not None:
+                rate = limit / 60 if limit else self.default_rate
+                if remaining:
+                    # Spread what is left of the window evenly until it resets.
+                    rate = min(rate, remaining / reset)
+                changes["refill_rate"] = rate
+            if remaining is not None:
+                # The server's count already includes requests from every other client.
+                changes["tokens"] = min(tokens, remaining)
+                if remaining <= 0:
+                    changes["blocked_until"] = max(blocked_until, now + reset)
+            if daily_remaining is not None:
+                changes["daily_limit"] = daily_limit
+                changes["daily_remaining"] = daily_remaining
+                if daily_reset is not None:
+                    changes["daily_reset_at"] = now + daily_reset
+            return None, changes
+        self._transaction(update)
+
+    def penalize(self, retry_after):
+        """Stop every client sharing the bucket for `retry_after` seconds (after a 429)."""
+        def update(now, tokens, capacity, refill_rate, blocked_until):
+            return None, {"tokens": 0, "blocked_until": max(blocked_until, now + retry_after)}
+        self._transaction(update)
+
+    def daily_quota(self):
+        """Returns (daily_limit, daily_remaining, daily_reset_at) as last reported by the API."""
+        conn = self._connect()
+        try:
+            return conn.execute("""
+                SELECT daily_limit, daily_remaining, daily_reset_at
+                FROM buckets WHERE name = ?
+            """, (self.name,)).fetchone()
+        finally:
+            conn.close()
+
+
+def _default_bucket_name():
+    """One bucket per API key and host; the key itself is never written to disk."""
+    key_hash = hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+    return f"{host}:{key_hash}"
+
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after_seconds(headers, default=60):
+    """How long a 429 asks us to back off: Retry-After, then the window reset, then `default`."""
+    for name in ("retry-after", "x-ratelimit-reset"):
+        seconds = _header_int(headers, name)
+        if seconds is not None:
+            return max(seconds, 1)
+    return default
+
+
+_shared_bucket = None
+
+
+def get_bucket():
+    """The process-wide bucket shared by every datasource stage."""
+    global _shared_bucket
+    if _shared_bucket is None:
+        _shared_bucket = TokenBucket()
+    return _shared_bucket
@@ -0,0 +1,172 @@
+"""
+Record raw API responses to an archive and replay them later without spending quota.
+
+    python main.py --record .state/archive.sqlite3          # a normal run that also archives
+    python main.py --replay .state/archive.sqlite3 --force-upsert
+    python cli.py standings --league 39 --season 2025 --replay .state/archive.sqlite3
+    python response_archive.py .state/archive.sqlite3       # what the archive holds
+
+API_RECORD_ARCHIVE / API_REPLAY_ARCHIVE do the same for every ApiClient in the process.
+"""
+import os
+import argparse
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from dotenv import load_dotenv
+import response_cache
+import schemas
+
+# Load environment variables
+load_dotenv()
+RECORD_ARCHIVE = os.getenv("API_RECORD_ARCHIVE")
+REPLAY_ARCHIVE = os.getenv("API_REPLAY_ARCHIVE")
+COMPRESSION_LEVEL = int(os.getenv("API_ARCHIVE_COMPRESSION", "6"))  # zlib level, 1-9
+
+
+class ResponseArchive:
+    """
+    Every HTTP exchange (endpoint, params, status, headers, zlib-compressed body) in one
+    SQLite file, indexed by request. In replay mode the latest 200 of each request is
+    served instead of calling the API.
+    """
+
+    def __init__(self, path, replaying=False):
+        self.path = path
+        self.replaying = replaying
+        self.recorded = 0
+        self.replayed = 0
+        self.missing = 0
+        self._lock = threading.Lock()
+        if replaying:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No response archive at {path}")
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True,
+                                         check_same_thread=False)
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    response_id INTEGER PRIMARY KEY,
+                    request_key TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    recorded_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS responses_request
+                ON responses (request_key, status, recorded_at)
+            """)
+
+    def record(self, endpoint, params, response):
+        """Archive one response as the API sent it (errors, 304s and 429s included)."""
+        self._insert(endpoint, params, response.status_code, dict(response.headers),
+                     response.content)
+
+    def record_served(self, endpoint, params, body):
+        """
+        Archive a body the response cache served (a fresh hit or a 304) as the 200 it stands
+        for, so a run with a warm cache records everything it used.
+        """
+        self._insert(endpoint, params, 200, {"x-served-from": "cache"}, body)
+
+    def _insert(self, endpoint, params, status, headers, body):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO responses
+                    (request_key, endpoint, params, status, headers, body, size, recorded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (response_cache.request_key(endpoint, params), endpoint,
+                  json.dumps({k: str(v) for k, v in (params or {}).items()}, sort_keys=True),
+                  status, json.dumps(headers), zlib.compress(body, COMPRESSION_LEVEL),
+                  len(body), time.time()))
+            self.recorded += 1
+
+    def replay(self, endpoint, params):
+        """The decoded body of the request's latest 200 response, or None if never recorded."""
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT body FROM responses
+                WHERE request_key = ? AND status = 200
+                ORDER BY recorded_at DESC LIMIT 1
+            """, (response_cache.request_key(endpoint, params),)).fetchone()
+            if row is None:
+                self.missing += 1
+                return None
+            self.replayed += 1
+        return schemas.loads(zlib.decompress(row[0]))
+
+    def bodies(self, endpoint):
+        """Raw bodies of the latest 200 response of every recorded request to `endpoint`."""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT body FROM responses r
+                WHERE endpoint = ? AND status = 200 AND recorded_at = (
+                    SELECT MAX(recorded_at) FROM responses
+                    WHERE request_key = r.request_key AND status = 200)
+                ORDER BY response_id
+            """, (endpoint,)).fetchall()
+        return [zlib.decompress(body) for (body,) in rows]
+
+    def stats(self):
+        """(endpoint, responses, distinct requests, raw bytes, stored bytes) per endpoint."""
+        with self._lock:
+            return self._conn.execute("""
+                SELECT endpoint, COUNT(*), COUNT(DISTINCT request_key), SUM(size), SUM(length(body))
+                FROM responses GROUP BY endpoint ORDER BY endpoint
+            """).fetchall()
+
+    def summary(self):
+        if self.replaying:
+            return (f"📼 Replayed {self.replayed} responses from {self.path} "
+                    f"({self.missing} requests were not in the archive).")
+        return f"📼 Recorded {self.recorded} responses to {self.path}."
+
+    def close(self):
+        self._conn.close()
+
+
+def from_args(args):
+    """The archive --record or --replay asks for, or None (API_*_ARCHIVE then apply)."""
+    if args.replay:
+        return ResponseArchive(args.replay, replaying=True)
+    if args.record:
+        return ResponseArchive(args.record)
+    return None
+
+
+def from_env():
+    """The archive API_REPLAY_ARCHIVE or API_RECORD_ARCHIVE asks for, or None."""
+    if REPLAY_ARCHIVE:
+        return ResponseArchive(REPLAY_ARCHIVE, replaying=True)
+    if RECORD_ARCHIVE:
+        return ResponseArchive(RECORD_ARCHIVE)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show what a response archive holds.")
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    archive = ResponseArchive(args.path, replaying=True)
+    print(f"📼 {args.path}")
+    print(f"   {'endpoint':<18} {'responses':>9} {'requests':>9} {'raw MB':>8} {'stored MB':>9}")
+    for endpoint, responses, requests, raw, stored in archive.stats():
+        print(f"   {endpoint:<18} {responses:9d} {requests:9d} "
+              f"{raw / 1e6:8.1f} {stored / 1e6:9.1f}")
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import os
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from state import STATE_DIR
+import schemas
+
+# Load environment variables
+load_dotenv()
+CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(STATE_DIR, "http_cache"))
+CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# How long a response is served without asking the API again. Endpoints that are
+# not listed are never cached.
+ENDPOINT_TTLS = {
+    "countries": 30 * DAY,
+    "leagues": DAY,
+    "teams": DAY,
+    "players/profiles": DAY,
+    "players/squads": 6 * HOUR,
+    "coachs": DAY,
+    "standings": 10 * MINUTE,
+}
+
+
+class CacheEntry:
+    """A cached response body plus the validators needed to revalidate it."""
+
+    def __init__(self, key, body, etag, last_modified, fresh):
+        self.key = key
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+    def validators(self):
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def json(self):
+        return schemas.loads(self.body)
+
+
+class ResponseCache:
+    """
+    On-disk HTTP response cache. Bodies are stored once per content hash under `blobs/`
+    and an SQLite index maps (endpoint, params) to a body, its validators and fetch time.
+    """
+
+    def __init__(self, path=CACHE_DIR, ttls=None, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttls = ENDPOINT_TTLS if ttls is None else ttls
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.path, "blobs"), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    body_hash TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(os.path.join(self.path, "index.sqlite3"), timeout=30,
+                               isolation_level=None)
+
+    def _blob_path(self, body_hash):
+        return os.path.join(self.path, "blobs", body_hash[:2], body_hash)
+
+    def is_cacheable(self, endpoint):
+        return self.ttls.get(endpoint, 0) > 0
+
+    def get(self, endpoint, params):
+        """
+        The cached entry for a request, or None. A fresh entry counts as a hit; a missing
+        or stale one as a miss (stale misses that end in a 304 are also counted as revalidated).
+        """
+        if not self.is_cacheable(endpoint):
+            return None
+        key = request_key(endpoint, params)
+        conn = self._connect()
+        try:
+            row = conn.execute("""
+                SELECT body_hash, etag, last_modified, fetched_at FROM responses WHERE key = ?
+            """, (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            body_hash, etag, last_modified, fetched_at = row
+            try:
+                with open(self._blob_path(body_hash), "rb") as blob:
+                    body = blob.read()
+            except FileNotFoundError:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("misses")
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                         (time.time(), key))
+        finally:
+            conn.close()
+
+        fresh = time.time() - fetched_at < self.ttls[endpoint]
+        self._count("hits" if fresh else "misses")
+        return CacheEntry(key, body, etag, last_modified, fresh)
+
+    def store(self, endpoint, params, body, headers):
+        """Save a 200 response body. Stale entries for the same request are replaced."""
+        if not self.is_cacheable(endpoint):
+            return
+        body_hash = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(body_hash)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as blob:
+                blob.write(body)
+            os.replace(tmp_path, blob_path)  # Atomic, so readers never see half a body
+
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO responses
+                    (key, endpoint, params, body_hash, size, etag, last_modified, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (request_key(endpoint, params), endpoint, _canonical_params(params), body_hash,
+                  len(body), headers.get("etag"), headers.get("last-modified"), now, now))
+        finally:
+            conn.close()
+        self.evict()
+
+    def refresh(self, entry):
+        """The API answered 304 Not Modified: the entry is fresh again."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                         (now, now, entry.key))
+        finally:
+            conn.close()
+        self._count("revalidated")
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        conn = self._connect()
+        try:
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, body_hash, size in conn.execute("""
+                SELECT key, body_hash, size FROM responses ORDER BY accessed_at
+            """).fetchall():
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                still_used = conn.execute("SELECT 1 FROM responses WHERE body_hash = ?",
+                                          (body_hash,)).fetchone()
+                if not still_used:
+                    try:
+                        os.remove(self._blob_path(body_hash))
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        finally:
+            conn.close()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def summary(self):
+        return (f"🗄️ Response cache: {self.hits} hits, {self.misses} misses "
+                f"({self.revalidated} revalidated with 304).")
+
+
+def _canonical_params(params):
+    return json.dumps({k: str(v) for k, v in (params or {}).items()}, sort_keys=True)
+
+
+def request_key(endpoint, params):
+    """Stable key for a request, independent of parameter order and value types."""
+    return hashlib.sha256(f"{endpoint}?{_canonical_params(params)}".encode()).hexdigest()
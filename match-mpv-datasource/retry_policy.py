@@ -0,0 +1,172 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+MAX_ATTEMPTS = int(os.getenv("API_MAX_ATTEMPTS", "5"))  # First try plus retries
+BASE_DELAY = float(os.getenv("API_RETRY_BASE_DELAY", "1"))
+MAX_DELAY = float(os.getenv("API_RETRY_MAX_DELAY", "60"))
+RETRY_BUDGET = int(os.getenv("API_RETRY_BUDGET", "100"))  # Retries per endpoint per run
+BREAKER_THRESHOLD = int(os.getenv("API_BREAKER_THRESHOLD", "5"))  # Consecutive failures
+BREAKER_COOLDOWN = float(os.getenv("API_BREAKER_COOLDOWN", "120"))  # Seconds to stay open
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, never shorter than a server-supplied Retry-After."""
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, attempt, status_code=None):
+        """`attempt` is the number of attempts already made; status_code None means a network error."""
+        if attempt >= self.max_attempts:
+            return False
+        return status_code is None or status_code in RETRYABLE_STATUS_CODES
+
+    def delay(self, attempt, retry_after=None):
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return max(backoff, retry_after)
+        return backoff
+
+
+class RetryBudget:
+    """Caps the number of retries one endpoint may spend in a run."""
+
+    def __init__(self, retries=RETRY_BUDGET):
+        self.remaining = retries
+        self._lock = threading.Lock()
+
+    def consume(self):
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures so callers fail fast for `cooldown` seconds,
+    then lets a single trial request through (half-open) before closing again.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True  # Half-open: let one request test the endpoint
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+    def cooldown_left(self):
+        """Seconds until the breaker lets a trial through (0 while it is closed)."""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(self.cooldown - (time.monotonic() - self.opened_at), 0.0)
+
+    def release_trial(self):
+        """Let another trial through when this one ended without saying anything about the endpoint."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+# Per-endpoint overrides. Anything not listed uses the defaults above.
+ENDPOINT_POLICIES = {
+    # Everything downstream depends on these two, so try harder.
+    "countries": {"max_attempts": 8},
+    "leagues": {"max_attempts": 8},
+    "players/profiles": {"max_attempts": 8},  # A lost page means a gap in the crawl
+    "standings": {"max_attempts": 3, "max_delay": 30},
+}
+
+
+class EndpointGuard:
+    """The retry policy, retry budget and circuit breaker for one endpoint."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.policy = RetryPolicy(**ENDPOINT_POLICIES.get(endpoint, {}))
+        self.budget = RetryBudget()
+        self.breaker = CircuitBreaker()
+
+
+def parse_retry_after(headers):
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(endpoint):
+    """The shared guard for an endpoint, created on first use."""
+    with _guards_lock:
+        if endpoint not in _guards:
+            _guards[endpoint] = EndpointGuard(endpoint)
+        return _guards[endpoint]
+
+
+def refill_budgets():
+    """
+    Give every endpoint a fresh retry budget, e.g. per cycle of a long-running process.
+    Breakers keep their state; they close again by themselves once a trial succeeds.
+    """
+    with _guards_lock:
+        for guard in _guards.values():
+            guard.budget = RetryBudget()
+
+
+def reset():
+    """Forget budgets and breaker state, e.g. at the start of a new run."""
+    with _guards_lock:
+        _guards.clear()
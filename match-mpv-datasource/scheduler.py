@@ -0,0 +1,136 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+import telemetry
+
+# Load environment variables
+load_dotenv()
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "4"))  # Stages allowed to run at once
+
+
+class Stage:
+    """One step of a datasource run and the stages it has to wait for."""
+
+    def __init__(self, name, run, after=()):
+        self.name = name
+        self.run = run
+        self.after = tuple(after)
+        self.status = "pending"  # pending -> running -> done | failed | skipped
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+def _validate(stages):
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+    for stage in stages:
+        for dependency in stage.after:
+            if dependency not in by_name:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage {dependency}")
+
+    # Depth-first search for cycles
+    visiting, visited = set(), set()
+
+    def visit(name):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle through stage {name}")
+        visiting.add(name)
+        for dependency in by_name[name].after:
+            visit(dependency)
+        visiting.remove(name)
+        visited.add(name)
+
+    for stage in stages:
+        visit(stage.name)
+    return by_name
+
+
+def _run(stage):
+    with telemetry.stage(stage.name):
+        stage.run()
+
+
+def run_stages(stages, max_workers=STAGE_WORKERS):
+    """
+    Run every stage as soon as all of its dependencies are done, up to `max_workers` at a
+    time. A failed stage skips everything that depends on it; independent stages carry on.
+    Returns the stages with their status and timings filled in.
+    """
+    by_name = _validate(stages)
+    pending = list(stages)
+    running = {}
+
+    def start_ready(executor):
+        for stage in list(pending):
+            statuses = [by_name[dependency].status for dependency in stage.after]
+            if any(status in ("failed", "skipped") for status in statuses):
+                stage.status = "skipped"
+                pending.remove(stage)
+                print(f"⏭️ Skipping {stage.name}: a stage it depends on did not finish.")
+            elif all(status == "done" for status in statuses):
+                stage.status = "running"
+                stage.started_at = time.monotonic()
+                pending.remove(stage)
+                running[executor.submit(_run, stage)] = stage
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        start_ready(executor)
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                stage.finished_at = time.monotonic()
+                try:
+                    future.result()
+                    stage.status = "done"
+                except Exception as e:
+                    stage.status = "failed"
+                    stage.error = e
+            start_ready(executor)
+
+    return stages
+
+
+def critical_path(stages):
+    """The dependency chain with the largest total duration, as a list of stages."""
+    by_name = {stage.name: stage for stage in stages}
+    longest = {}  # name -> (total seconds, path)
+
+    def path_to(name):
+        if name not in longest:
+            stage = by_name[name]
+            before = max((path_to(dependency) for dependency in stage.after),
+                         key=lambda entry: entry[0], default=(0.0, []))
+            longest[name] = (before[0] + stage.duration, before[1] + [stage])
+        return longest[name]
+
+    return max((path_to(stage.name) for stage in stages),
+               key=lambda entry: entry[0], default=(0.0, []))[1]
+
+
+def print_report(stages):
+    """Print how long each stage took and the run's critical path."""
+    run_started = min((stage.started_at for stage in stages if stage.started_at is not None),
+                      default=None)
+    print("⏱️ Stage timings:")
+    for stage in stages:
+        if stage.started_at is None:
+            print(f"   {stage.name:<10} {stage.status}")
+            continue
+        offset = stage.started_at - run_started
+        print(f"   {stage.name:<10} {stage.status:<8} started +{offset:7.1f}s  took {stage.duration:7.1f}s")
+
+    path = critical_path(stages)
+    total = sum(stage.duration for stage in path)
+    print(f"🧭 Critical path ({total:.1f}s): {' → '.join(stage.name for stage in path)}")
@@ -0,0 +1,70 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_EMPTY = {}
+
+
+def loads(body):
+    """Decode a JSON response body, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def compile_decoder(row_type, sources, fields):
+    """
+    Build a function that turns raw API objects into `row_type` rows in one pass.
+
+    `sources` names the API objects the decoder takes, in order (e.g. "league", "standing").
+    `fields` maps each column to a dotted path into one of them, such as
+    "standing.all.goals.for", or to a (path, default) pair; the default is '' otherwise.
+    Columns missing from `fields` (api_source, ids known from the request) become
+    keyword arguments of the decoder.
+
+    The generated code looks every nested object up once and reads every value with a
+    single .get, instead of re-walking the same chain of .get(..., {}) calls per column.
+    """
+    lines = []
+    nested = {}  # path of a nested object -> local variable holding it
+
+    def lookup(path):
+        if len(path) == 1:
+            if path[0] not in sources:
+                raise ValueError(f"{row_type.__name__}: unknown source {path[0]!r}")
+            return path[0]
+        if path not in nested:
+            parent = lookup(path[:-1])
+            nested[path] = f"_{len(nested)}"
+            lines.append(f"    {nested[path]} = {parent}.get({path[-1]!r}) or _EMPTY")
+        return nested[path]
+
+    values = []
+    for column in row_type._fields:
+        spec = fields.get(column)
+        if spec is None:
+            values.append(column)
+            continue
+        path, default = spec if isinstance(spec, tuple) else (spec, '')
+        path = tuple(path.split("."))
+        values.append(f"{lookup(path[:-1])}.get({path[-1]!r}, {default!r})")
+
+    unknown = set(fields) - set(row_type._fields)
+    if unknown:
+        raise ValueError(f"{row_type.__name__} has no columns {sorted(unknown)}")
+
+    extras = [column for column in row_type._fields if column not in fields]
+    signature = ", ".join(list(sources) + (["*"] + extras if extras else []))
+    source = "\n".join(
+        [f"def decode({signature}):"] + lines
+        + [f"    return _new(_row, ({', '.join(values)},))"])
+
+    namespace = {"_EMPTY": _EMPTY, "_new": tuple.__new__, "_row": row_type}
+    exec(compile(source, f"<decoder {row_type.__name__}>", "exec"), namespace)
+    decode = namespace["decode"]
+    decode.__doc__ = f"Decode {', '.join(sources)} into a {row_type.__name__}."
+    decode.source = source
+    return decode
@@ -1,122 +1,151 @@
 import os
+from collections import namedtuple
 from dotenv import load_dotenv
-import requests
-import psycopg2
-from datetime import datetime
-import time
+import api_client
+import bulk_loader
+import checkpoints
+import db
+import fetcher
+import fingerprints
+import schemas
+import teams
+import telemetry
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("RAPIDAPI_KEY")
-host = os.getenv("HOST_URL")
-base_url = os.getenv("API_BASE_URL")
 api_source = os.getenv("API_SOURCE")
-db_host = os.getenv("DB_HOST")
-db_name = os.getenv("DB_NAME")
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
-# 0.24 seconds delay will result in 250 requests per minute.  60 seconds/ 250 request
-delay_seconds = 0.24
 
 
-def fetch_team_ids(cursor):
-    """Fetch team IDs from the database."""
-    try:
-        cursor.execute("""
-            SELECT tam.api_team_id
-            FROM teams_api_mapping tam
-        """)
-        teams = cursor.fetchall()
-        return [{'team_id': team[0]} for team in teams]
-    except Exception as e:
-        print(f"Failed to fetch team ids: {e}")
-        return []
+def fetch_squad_details(client, team_ids):
+    """
+    Fetch squad details from the API for given team IDs.
+    Returns the squad rows and the IDs of the teams that were fetched successfully.
+    """
+    squad_details = []
+    fetched_team_ids = []
+    responses = fetcher.fetch_many(
+        client, "players/squads", [{"team": team['team_id']} for team in team_ids])
+    for team, results in zip(team_ids, responses):
+        if results is None:
+            print(f"Failed to fetch data for Team ID: {team['team_id']}.")
+            continue
+        fetched_team_ids.append(team['team_id'])
 
+        players = []
+        for result in results.get('response', []):
+            players = result.get('players', [])
+            for player in players:
+                squad_details.append(decode_squad_player(
+                    player, api_team_id=team['team_id'], api_source=api_source))
+
+        print(
+            f"Squad pulled for Team ID:{team['team_id']} with {len(players)} players")
+    telemetry.add("rows_parsed", len(squad_details))
+    return squad_details, fetched_team_ids
+
+
+# Argument order of the upsert_squads database function
+SQUAD_COLUMNS = (
+    'api_team_id',
+    'api_player_id',
+    'player_name',
+    'age',
+    'shirt_number',
+    'position',
+    'api_source',
+)
+# One squad member, in upsert_squads argument order
+SquadRow = namedtuple("SquadRow", SQUAD_COLUMNS)
+
+# Where each column comes from in a /players/squads player entry
+decode_squad_player = schemas.compile_decoder(SquadRow, ("player",), {
+    'api_player_id': 'player.id',
+    'player_name': 'player.name',
+    'age': 'player.age',
+    'shirt_number': 'player.number',
+    'position': 'player.position',
+})
+
+
+def queue_player_refresh(run, squad_details):
+    """Have the players stage refresh the profiles of these (new or changed) squad members."""
+    if run is not None and squad_details:
+        run.queue("players", {squad.api_player_id for squad in squad_details})
+
+
+def save_squad_details(squad_details, cursor, run=None):
+    """
+    Save squad details to the database.
+    Rows the database rejects are set aside in datasource_rejects; the rest are committed.
+    With a `run`, the players of new or changed squad rows are queued for a profile refresh.
+    """
+    store = fingerprints.get_store()
+    squad_details, pending = store.changed(
+        "squads", squad_details,
+        key=lambda squad: (squad.api_team_id, squad.api_player_id))
+    if not squad_details:
+        print("⏭️ Squad data unchanged. Nothing to save.")
+        return
 
-def fetch_squad_details(team_ids):
-    """Fetch squad details from the API for given team IDs."""
-    squad_details = []
-    for team in team_ids:
-        success = False
-        while not success:
-            try:
-                response = requests.get(
-                    f"{base_url}/players/squads",
-                    headers={
-                        "x-rapidapi-key": api_key,
-                        "x-rapidapi-host": host,
-                    },
-                    params={"team": team['team_id']}
-                )
-                if response.status_code == 200:
-                    results = response.json()
-                    for result in results.get('response', []):
-                        players = result.get('players', [])
-                        for player in players:
-                            squad_details.append({
-                                'api_team_id': team['team_id'],
-                                'api_player_id': player.get('id', ''),
-                                'player_name': player.get('name', ''),
-                                'age': player.get('age', ''),
-                                'shirt_number': player.get('number', ''),
-                                'position': player.get('position', ''),
-                                'api_source': api_source,
-                            })
-
-                    print(
-                        f"Squad pulled for Team ID:{team['team_id']} with {len(players)} players")
-                    success = True
-                elif response.status_code == 429:
-                    print("Rate limit hit, waiting...")
-                    time.sleep(60)
-                else:
-                    print(
-                        f"Failed to fetch data for Team ID: {team['team_id']}. Status code: {response.status_code}")
-                    success = True
-                time.sleep(delay_seconds)
-            except Exception as e:
-                print(f"An error occurred: {e}")
-                success = True
-    return squad_details
-
-
-def save_squad_details(squad_details, cursor):
-    """Save squad details to the database."""
     try:
-        for squad in squad_details:
-            try:
-                cursor.execute("""
-                    SELECT upsert_squads(%s, %s, %s, %s, %s, %s, %s)
-                """, (squad['api_team_id'],
-                      squad['api_player_id'],
-                      squad['player_name'],
-                      squad['age'],
-                      squad['shirt_number'],
-                      squad['position'],
-                      squad['api_source']
-                      ))
-            except Exception as e:
-                print(f"Failed to upsert squad data for Team ID: {
-                      squad['api_team_id']}. Error: {e}")
-                cursor.connection.rollback()
-                break  # Exit the loop on failure
+        rejected = bulk_loader.save_rows(
+            cursor, "squads", "upsert_squads", SQUAD_COLUMNS, squad_details)
         cursor.connection.commit()
+        store.record("squads", [fingerprint for position, fingerprint in enumerate(pending)
+                                if position not in rejected])
+        queue_player_refresh(run, [squad for position, squad in enumerate(squad_details)
+                                   if position not in rejected])
+        telemetry.add("rows_upserted", len(squad_details) - len(rejected))
+        telemetry.add("rows_failed", len(rejected))
         print("Data successfully saved")
+
     except Exception as e:
         print(f"Failed to save squad data to PostgreSQL: {e}")
         cursor.connection.rollback()
+        telemetry.add("rows_failed", len(squad_details))
+        raise  # The teams must not be checkpointed
 
 
-def fetch_and_store_squads():
-    """Main function to orchestrate fetching and storing squads."""
+def fetch_and_store_squads(client=None, pool=None, run=None, limit=None, team_ids=None):
+    """
+    Main function to orchestrate fetching and storing squads.
+    Teams are handled CHECKPOINT_TEAMS at a time and checkpointed once their squads are saved.
+    `limit` caps how many teams are fetched this run (the quota plan's trim).
+    `team_ids` ({'team_id'} dicts) defaults to every stored team.
+    """
+    client = client or api_client.ApiClient()
+    pool = pool or db.create_pool()
+    run = run or checkpoints.start_run()
     try:
-        with psycopg2.connect(host=db_host, database=db_name, user=db_user, password=db_password) as conn:
-            with conn.cursor() as cursor:
-                team_ids = fetch_team_ids(cursor)
-                squad_details = fetch_squad_details(team_ids)
-                save_squad_details(squad_details, cursor)
+        if team_ids is None:
+            team_ids = teams.team_ids_for_run(pool, run)
+
+        done_teams = run.completed("squads")
+        if done_teams:
+            print(f"↩️ Skipping {len(done_teams)} teams whose squads are already saved in this run.")
+        team_ids = [team for team in team_ids if str(team['team_id']) not in done_teams]
+        if limit is not None and limit < len(team_ids):
+            print(f"📒 Fetching {limit} of {len(team_ids)} teams to stay inside the daily quota.")
+            team_ids = team_ids[:limit]
+
+        for teams_chunk in checkpoints.chunks(team_ids, checkpoints.CHECKPOINT_TEAMS):
+            squad_details, fetched_team_ids = fetch_squad_details(client, teams_chunk)
+            failed = db.failed_writes(
+                pool,
+                db.partition(squad_details, key=lambda squad: squad.api_team_id),
+                lambda rows, cursor: save_squad_details(rows, cursor, run))
+            failed_team_ids = {squad.api_team_id for rows in failed for squad in rows}
+            run.mark_done("squads", [team_id for team_id in fetched_team_ids
+                                     if team_id not in failed_team_ids])
+
+        # Fail the stage so the run stays open and --resume picks these teams up.
+        done_teams = run.completed("squads")
+        missing = [team for team in team_ids if str(team['team_id']) not in done_teams]
+        if missing:
+            raise RuntimeError(f"the squads of {len(missing)} of {len(team_ids)} teams were not saved")
     except Exception as e:
         print(f"Failed to fetch and store squads: {e}")
+        raise
 
 
 # Run the main function
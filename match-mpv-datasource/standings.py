@@ -1,22 +1,18 @@
 import os
+from collections import namedtuple
 from dotenv import load_dotenv
-import requests
-import psycopg2
-from datetime import datetime
-import time
+import api_client
+import bulk_loader
+import db
+import fetcher
+import fingerprints
+import schemas
+import telemetry
+import pipeline
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("RAPIDAPI_KEY")
-host = os.getenv("HOST_URL")
-base_url = os.getenv("API_BASE_URL")
 api_source = os.getenv("API_SOURCE")
-db_host = os.getenv("DB_HOST")
-db_name = os.getenv("DB_NAME")
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
-# 0.24 seconds delay will result in 250 requests per minute.  60 seconds/ 250 request
-delay_seconds = 0.24
 
 
 def fetch_leagues_and_seasons(cursor):
@@ -44,34 +40,21 @@ def fetch_leagues_and_seasons(cursor):
         return []
 
 
-def fetch_standings(api_league_id, season):
-    """Fetch standings data from the API for a given league and season."""
-    try:
-        response = requests.get(
-            f"{base_url}/standings",
-            headers={
-                "x-rapidapi-key": api_key,
-                "x-rapidapi-host": host,
-            },
-            params={
-                "league": api_league_id,
-                "season": season
-            }
-        )
-
-        if response.status_code == 200:
-            return response.json().get('response', [])
-        elif response.status_code == 429:
-            print("Rate limit hit, waiting...")
-            time.sleep(60)
-            return fetch_standings(api_league_id, season)
+def fetch_standings(client, leagues):
+    """
+    Fetch standings data from the API for every league and season, a window of leagues
+    at a time. Yields (league, standings response or None on failure) in league order.
+    """
+    params_list = [{"league": league['league_id'], "season": league['season']}
+                   for league in leagues]
+    for league, (_, results) in zip(
+            leagues, fetcher.fetch_stream(client, "standings", params_list)):
+        if results is None:
+            print(
+                f"Failed to fetch data for league ID {league['league_id']} for season {league['season']}.")
+            yield league, None
         else:
-            print(f"Failed to fetch data for league ID {api_league_id} for season {
-                  season}. Status code: {response.status_code}")
-            return None
-    except Exception as e:
-        print(f"An error occurred while fetching standings: {e}")
-        return None
+            yield league, results.get('response', [])
 
 
 def parse_standings_data(api_response):
@@ -83,106 +66,149 @@ def parse_standings_data(api_response):
 
         for standings in standings_groups:
             for standing in standings:
-                standings_info = {
-                    'api_league_id': league.get('id', ''),
-                    'season': league.get('season', ''),
-                    'country': league.get('country', ''),
-                    'api_team_id': standing.get('team', {}).get('id', ''),
-                    'position': standing.get('rank', ''),
-                    'points': standing.get('points', ''),
-                    'goals_difference': standing.get('goalsDiff', ''),
-                    'group_name': standing.get('group', ''),
-                    'form': standing.get('form', ''),
-                    'description': standing.get('description', ''),
-                    'matches_played': standing.get('all', {}).get('played', ''),
-                    'matches_won': standing.get('all', {}).get('win', ''),
-                    'matches_drawn': standing.get('all', {}).get('draw', ''),
-                    'matches_lost': standing.get('all', {}).get('lose', ''),
-                    'goals_scored': standing.get('all', {}).get('goals', {}).get('for', ''),
-                    'goals_conceded': standing.get('all', {}).get('goals', {}).get('against', ''),
-                    'home_matches_played': standing.get('home', {}).get('played', ''),
-                    'home_matches_won': standing.get('home', {}).get('win', ''),
-                    'home_matches_drawn': standing.get('home', {}).get('draw', ''),
-                    'home_matches_lost': standing.get('home', {}).get('lose', ''),
-                    'home_goals_scored': standing.get('home', {}).get('goals', {}).get('for', ''),
-                    'home_goals_conceded': standing.get('home', {}).get('goals', {}).get('against', ''),
-                    'away_matches_played': standing.get('away', {}).get('played', ''),
-                    'away_matches_won': standing.get('away', {}).get('win', ''),
-                    'away_matches_drawn': standing.get('away', {}).get('draw', ''),
-                    'away_matches_lost': standing.get('away', {}).get('lose', ''),
-                    'away_goals_scored': standing.get('away', {}).get('goals', {}).get('for', ''),
-                    'away_goals_conceded': standing.get('away', {}).get('goals', {}).get('against', ''),
-                    'api_source': api_source,
-                }
-                standings_informations.append(standings_info)
+                standings_informations.append(
+                    decode_standing(league, standing, api_source=api_source))
+    telemetry.add("rows_parsed", len(standings_informations))
     return standings_informations
 
 
+# Argument order of the upsert_standings database function
+STANDINGS_COLUMNS = (
+    'api_league_id',
+    'season',
+    'country',
+    'api_team_id',
+    'group_name',
+    'position',
+    'description',
+    'points',
+    'matches_played',
+    'matches_won',
+    'matches_drawn',
+    'matches_lost',
+    'goals_scored',
+    'goals_conceded',
+    'goals_difference',
+    'home_matches_played',
+    'home_matches_won',
+    'home_matches_drawn',
+    'home_matches_lost',
+    'home_goals_scored',
+    'home_goals_conceded',
+    'away_matches_played',
+    'away_matches_won',
+    'away_matches_drawn',
+    'away_matches_lost',
+    'away_goals_scored',
+    'away_goals_conceded',
+    'form',
+    'api_source',
+)
+# One team's standing in a league group, in upsert_standings argument order
+StandingsRow = namedtuple("StandingsRow", STANDINGS_COLUMNS)
+
+# Where each column comes from in a /standings league and one of its table entries
+decode_standing = schemas.compile_decoder(StandingsRow, ("league", "standing"), {
+    'api_league_id': 'league.id',
+    'season': 'league.season',
+    'country': 'league.country',
+    'api_team_id': 'standing.team.id',
+    'position': 'standing.rank',
+    'points': 'standing.points',
+    'goals_difference': 'standing.goalsDiff',
+    'group_name': 'standing.group',
+    'form': 'standing.form',
+    'description': 'standing.description',
+    'matches_played': 'standing.all.played',
+    'matches_won': 'standing.all.win',
+    'matches_drawn': 'standing.all.draw',
+    'matches_lost': 'standing.all.lose',
+    'goals_scored': 'standing.all.goals.for',
+    'goals_conceded': 'standing.all.goals.against',
+    'home_matches_played': 'standing.home.played',
+    'home_matches_won': 'standing.home.win',
+    'home_matches_drawn': 'standing.home.draw',
+    'home_matches_lost': 'standing.home.lose',
+    'home_goals_scored': 'standing.home.goals.for',
+    'home_goals_conceded': 'standing.home.goals.against',
+    'away_matches_played': 'standing.away.played',
+    'away_matches_won': 'standing.away.win',
+    'away_matches_drawn': 'standing.away.draw',
+    'away_matches_lost': 'standing.away.lose',
+    'away_goals_scored': 'standing.away.goals.for',
+    'away_goals_conceded': 'standing.away.goals.against',
+})
+
+
 def upsert_standings_data(cursor, standings_informations):
-    """Upsert the standings data into the database."""
+    """
+    Upsert the changed standings rows into the database. Rows the database rejects are
+    set aside in datasource_rejects.
+    Returns the fingerprints of the written rows, to record once the transaction is committed.
+    """
+    standings_informations, pending = fingerprints.get_store().changed(
+        "standings", standings_informations,
+        key=lambda rank: (rank.api_league_id, rank.season,
+                          rank.group_name, rank.api_team_id))
+    if not standings_informations:
+        print("⏭️ Standings unchanged. Nothing to save.")
+        return pending
+
+    rejected = bulk_loader.save_rows(
+        cursor, "standings", "upsert_standings", STANDINGS_COLUMNS, standings_informations)
+    telemetry.add("rows_failed", len(rejected))
+    return [fingerprint for position, fingerprint in enumerate(pending)
+            if position not in rejected]
+
+
+def save_standings_data(standings_informations, cursor):
+    """Upsert and commit one partition of standings rows."""
     try:
-        for rank in standings_informations:
-            cursor.execute("""
-                SELECT upsert_standings(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                rank['api_league_id'],
-                rank['season'],
-                rank['country'],
-                rank['api_team_id'],
-                rank['group_name'],
-                rank['position'],
-                rank['description'],
-                rank['points'],
-                rank['matches_played'],
-                rank['matches_won'],
-                rank['matches_drawn'],
-                rank['matches_lost'],
-                rank['goals_scored'],
-                rank['goals_conceded'],
-                rank['goals_difference'],
-                rank['home_matches_played'],
-                rank['home_matches_won'],
-                rank['home_matches_drawn'],
-                rank['home_matches_lost'],
-                rank['home_goals_scored'],
-                rank['home_goals_conceded'],
-                rank['away_matches_played'],
-                rank['away_matches_won'],
-                rank['away_matches_drawn'],
-                rank['away_matches_lost'],
-                rank['away_goals_scored'],
-                rank['away_goals_conceded'],
-                rank['form'],
-                rank['api_source'],
-            ))
-    except Exception as e:
-        print(f"Failed to upsert standings data: {e}")
+        pending = upsert_standings_data(cursor, standings_informations)
+        cursor.connection.commit()
+    except Exception:
+        telemetry.add("rows_failed", len(standings_informations))
         raise
-
-
-def fetch_and_store_league_standings():
-    """Main function to fetch and store league standings."""
+    fingerprints.get_store().record("standings", pending)
+    telemetry.add("rows_upserted", len(pending))
+    print("Data successfully saved")
+
+
+def write_league_standings(pool, standings_informations):
+    """Save one league's standings on its own pooled connection."""
+    with db.connection(pool) as conn:
+        with conn.cursor() as cursor:
+            save_standings_data(standings_informations, cursor)
+
+
+def fetch_and_store_league_standings(client=None, pool=None, leagues=None):
+    """
+    Main function to fetch and store league standings.
+    Each league is written and committed as soon as it is parsed, while later leagues
+    are still being fetched. `leagues` ({'league_id', 'season'} dicts) defaults to every
+    current season with standings coverage.
+    """
+    client = client or api_client.ApiClient()
+    pool = pool or db.create_pool()
     try:
-        with psycopg2.connect(host=db_host, database=db_name, user=db_user, password=db_password) as conn:
-            with conn.cursor() as cursor:
-
-                standings_for_leagues = fetch_leagues_and_seasons(
-                    cursor)
-
-                all_standings_data = []
-                for league in standings_for_leagues:
-                    api_response = fetch_standings(
-                        league['league_id'], league['season'])
-                    if api_response:
-                        standings_data = parse_standings_data(api_response)
-                        all_standings_data.extend(standings_data)
-                    time.sleep(delay_seconds)
-
-                if all_standings_data:
-                    upsert_standings_data(cursor, all_standings_data)
-
-                conn.commit()
-                print("Data successfully saved")
+        if leagues is not None:
+            standings_for_leagues = leagues
+        else:
+            with db.connection(pool) as conn:
+                with conn.cursor() as cursor:
+                    standings_for_leagues = fetch_leagues_and_seasons(
+                        cursor)
+
+        def parsed_leagues():
+            for league, api_response in fetch_standings(client, standings_for_leagues):
+                if api_response:
+                    standings_data = parse_standings_data(api_response)
+                    if standings_data:
+                        yield standings_data
+
+        pipeline.stream(parsed_leagues(),
+                        lambda standings_data: write_league_standings(pool, standings_data),
+                        workers=db.WRITER_WORKERS)
 
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -0,0 +1,252 @@
+"""
+Keep league standings fresh with a long-running poller instead of the one-shot batch.
+
+Each league's next /standings poll is derived from today's fixtures (one /fixtures?date=
+call per day, not per league):
+    match in progress       -> every STANDINGS_LIVE_INTERVAL (also a match still marked
+                               not started after its kick-off, until the schedule catches up)
+    match just finished     -> every STANDINGS_RECENT_INTERVAL for STANDINGS_RECENT_WINDOW
+    kick-off later today    -> first poll once the match is under way
+    no match                -> STANDINGS_IDLE_INTERVAL, doubling while the table does not
+                               change (0 = never poll idle leagues)
+When the fixture schedule cannot be fetched, the interval follows how often the league's
+table was seen to change. Every call goes through the shared token bucket, and idle
+leagues are left alone once the daily quota is down to its reserve.
+
+    python standings_daemon.py
+    python standings_daemon.py --once      # one poll of whatever is due, then exit
+"""
+import os
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+import api_client
+import db
+import fetcher
+import fingerprints
+import quota_planner
+import retry_policy
+import standings
+
+# Load environment variables
+load_dotenv()
+MINUTE = 60
+HOUR = 60 * MINUTE
+LIVE_INTERVAL = float(os.getenv("STANDINGS_LIVE_INTERVAL", str(5 * MINUTE)))
+RECENT_INTERVAL = float(os.getenv("STANDINGS_RECENT_INTERVAL", str(15 * MINUTE)))
+RECENT_WINDOW = float(os.getenv("STANDINGS_RECENT_WINDOW", str(3 * HOUR)))  # After full time
+IDLE_INTERVAL = float(os.getenv("STANDINGS_IDLE_INTERVAL", str(12 * HOUR)))
+IDLE_MAX_INTERVAL = float(os.getenv("STANDINGS_IDLE_MAX_INTERVAL", str(7 * 24 * HOUR)))
+SCHEDULE_INTERVAL = float(os.getenv("STANDINGS_SCHEDULE_INTERVAL", str(HOUR)))
+LEAGUES_INTERVAL = float(os.getenv("STANDINGS_LEAGUES_INTERVAL", str(6 * HOUR)))
+MAX_SLEEP = 60  # Seconds; also how quickly a stop request is noticed
+
+# API-Football fixture status codes
+LIVE_STATUSES = {"1H", "HT", "2H", "ET", "BT", "P", "LIVE", "INT", "SUSP"}
+FINISHED_STATUSES = {"FT", "AET", "PEN"}
+SCHEDULED_STATUSES = {"TBD", "NS"}
+MATCH_LENGTH = 2 * HOUR  # Kick-off to full time, stoppages and half time included
+
+
+class LeagueState:
+    """Polling state of one league season."""
+
+    def __init__(self, league):
+        self.league = league  # {'league_id', 'season'}
+        self.last_polled_at = None
+        self.next_poll_at = float("inf")  # Set by schedule_poll()
+        self.interval = IDLE_INTERVAL
+        self.last_hash = None
+        self.unchanged_polls = 0
+        self.mode = "idle"  # live | recent | upcoming | idle | observed
+
+
+def fetch_fixture_schedule(client, now):
+    """
+    Today's and yesterday's fixtures (UTC), for every league, in two calls.
+    Returns {league_id: [(kick-off timestamp, status)]}, or None when unavailable.
+    """
+    today = datetime.fromtimestamp(now, timezone.utc).date()
+    dates = [today - timedelta(days=1), today]
+    responses = fetcher.fetch_many(client, "fixtures", [{"date": day.isoformat()} for day in dates])
+    if any(results is None for results in responses):
+        print("⚠️ Could not fetch the fixture schedule. Polling by observed changes instead.")
+        return None
+
+    schedule = {}
+    for results in responses:
+        for fixture in results.get('response', []):
+            league_id = fixture.get('league', {}).get('id')
+            details = fixture.get('fixture', {})
+            kickoff = details.get('timestamp')
+            if league_id is None or kickoff is None:
+                continue
+            schedule.setdefault(league_id, []).append(
+                (kickoff, details.get('status', {}).get('short')))
+    return schedule
+
+
+def schedule_poll(state, fixtures, now):
+    """
+    Set the league's mode, poll interval and next poll time from its fixtures (None when
+    the schedule is unknown) and how long its table has gone unchanged. A league that was
+    never polled keeps its earliest planned poll, so schedule reloads cannot postpone it.
+    """
+    polled = state.last_polled_at is not None
+    since = state.last_polled_at if polled else now
+    if fixtures is None:
+        # No schedule: poll often while the table moves, back off while it does not.
+        state.mode = "observed"
+        state.interval = min(RECENT_INTERVAL * 2 ** min(state.unchanged_polls, 10),
+                             IDLE_MAX_INTERVAL)
+        next_poll_at = since + state.interval if polled else now
+    else:
+        # A schedule loaded before kick-off still says NS: assume the match went ahead on time.
+        overdue = [kickoff for kickoff, status in fixtures
+                   if status in SCHEDULED_STATUSES and kickoff <= now]
+        live = (any(status in LIVE_STATUSES for _, status in fixtures)
+                or any(now - kickoff < MATCH_LENGTH for kickoff in overdue))
+        recent = (any(status in FINISHED_STATUSES
+                      and now - (kickoff + MATCH_LENGTH) < RECENT_WINDOW
+                      for kickoff, status in fixtures)
+                  or any(now - (kickoff + MATCH_LENGTH) < RECENT_WINDOW for kickoff in overdue))
+        upcoming = [kickoff for kickoff, status in fixtures
+                    if status not in LIVE_STATUSES | FINISHED_STATUSES and kickoff > now]
+        if live or recent:
+            state.mode = "live" if live else "recent"
+            state.interval = LIVE_INTERVAL if live else RECENT_INTERVAL
+            next_poll_at = since + state.interval if polled else now
+        elif upcoming:
+            # Nothing can change before the first kick-off.
+            state.mode = "upcoming"
+            next_poll_at = min(upcoming) + LIVE_INTERVAL
+            state.interval = next_poll_at - now
+        elif IDLE_INTERVAL <= 0:
+            state.mode, state.interval, next_poll_at = "idle", float("inf"), float("inf")
+        else:
+            state.mode = "idle"
+            state.interval = min(IDLE_INTERVAL * 2 ** min(state.unchanged_polls, 10),
+                                 IDLE_MAX_INTERVAL)
+            next_poll_at = since + state.interval
+    state.next_poll_at = next_poll_at if polled else min(state.next_poll_at, next_poll_at)
+
+
+def within_budget(due, bucket=None):
+    """
+    The due leagues the daily quota allows: all of them while calls above the reserve
+    remain (or the quota is unknown), otherwise only live and just-finished ones.
+    """
+    budget = quota_planner.daily_budget(bucket)
+    if budget is None or budget >= len(due):
+        return due
+    urgent = [state for state in due if state.mode in ("live", "recent")][:budget]
+    print(f"📒 {budget} calls left above the reserve today. Polling {len(urgent)} of "
+          f"{len(due)} due leagues.")
+    return urgent
+
+
+def poll(client, pool, due, schedule, now):
+    """Fetch the due leagues' standings, store the ones that changed and plan their next poll."""
+    by_league = {(state.league['league_id'], state.league['season']): state for state in due}
+    for league, api_response in standings.fetch_standings(client, [state.league for state in due]):
+        state = by_league[(league['league_id'], league['season'])]
+        if api_response is None:
+            state.next_poll_at = now + min(state.interval, RECENT_INTERVAL)  # Try again soon
+            continue
+        standings_data = standings.parse_standings_data(api_response)
+        table_hash = fingerprints.fingerprint(standings_data)
+        changed = table_hash != state.last_hash
+        if changed and standings_data:
+            try:
+                standings.write_league_standings(pool, standings_data)
+            except Exception as e:
+                # Keep the old hash so the table is written again on the next poll.
+                print(f"❌ Could not save the standings of league {league['league_id']}: {e}")
+                state.next_poll_at = now + min(state.interval, RECENT_INTERVAL)
+                continue
+        state.last_hash = table_hash
+        state.unchanged_polls = 0 if changed else state.unchanged_polls + 1
+        state.last_polled_at = now
+        schedule_poll(state, None if schedule is None else schedule.get(league['league_id'], []),
+                      now)
+        print(f"{'🔄' if changed else '⏸️'} League {league['league_id']} ({state.mode}): "
+              f"next poll in {_duration(state.interval)}.")
+
+
+def _duration(seconds):
+    if seconds == float("inf"):
+        return "never"
+    return f"{seconds / HOUR:.1f}h" if seconds >= HOUR else f"{seconds / MINUTE:.0f}m"
+
+
+def run(client, pool, once=False):
+    """Poll standings until interrupted (or once, with `once`)."""
+    states = {}
+    schedule = None
+    leagues_loaded_at = schedule_loaded_at = float("-inf")
+    while True:
+        now = time.time()
+        # RETRY_BUDGET is meant per run; here a run is one poll cycle.
+        retry_policy.refill_budgets()
+        if now - schedule_loaded_at >= SCHEDULE_INTERVAL:
+            schedule = fetch_fixture_schedule(client, now)
+            schedule_loaded_at = now
+            # A new schedule can bring a league's next poll forward or push it back.
+            for state in states.values():
+                schedule_poll(state, None if schedule is None
+                              else schedule.get(state.league['league_id'], []), now)
+
+        if now - leagues_loaded_at >= LEAGUES_INTERVAL:
+            try:
+                with db.connection(pool) as conn:
+                    with conn.cursor() as cursor:
+                        leagues = standings.fetch_leagues_and_seasons(cursor)
+            except Exception as e:
+                # Keep watching the leagues already known; the load is retried next cycle.
+                print(f"❌ Could not load the leagues to watch: {e}")
+            else:
+                previous = states
+                states = {}
+                for league in leagues:
+                    key = (league['league_id'], league['season'])
+                    states[key] = previous.get(key)
+                    if states[key] is None:
+                        states[key] = LeagueState(league)
+                        schedule_poll(states[key], None if schedule is None
+                                      else schedule.get(league['league_id'], []), now)
+                leagues_loaded_at = now
+                print(f"📋 Watching standings of {len(states)} league seasons.")
+
+        due = [state for state in states.values() if state.next_poll_at <= now]
+        if due:
+            poll(client, pool, within_budget(due), schedule, now)
+            for state in due:
+                if state.next_poll_at <= now:
+                    state.next_poll_at = now + state.interval  # Held back by the quota
+        if once:
+            return
+
+        next_poll_at = min((state.next_poll_at for state in states.values()), default=now + MAX_SLEEP)
+        time.sleep(min(max(next_poll_at - time.time(), 1), MAX_SLEEP))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poll league standings adaptively.")
+    parser.add_argument("--once", action="store_true",
+                        help="Poll whatever is due once and exit.")
+    args = parser.parse_args(argv)
+
+    pool = db.create_pool()
+    try:
+        # Standings are cached for minutes; live tables must come from the API.
+        with api_client.ApiClient(use_cache=False) as client:
+            run(client, pool, once=args.once)
+    except KeyboardInterrupt:
+        print("👋 Standings daemon stopped.")
+    finally:
+        pool.closeall()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+# Where the rate limiter, response cache, fingerprints, checkpoints and telemetry keep
+# their files. Each can be moved on its own with its own variable.
+STATE_DIR = os.getenv("DATASOURCE_STATE_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".state"))
@@ -1,23 +1,23 @@
 
 import os
+import threading
+from collections import namedtuple
 from dotenv import load_dotenv
-import requests
-import psycopg2
-import time
+import api_client
+import bulk_loader
+import db
+import fetcher
+import fingerprints
+import schemas
+import telemetry
 
 # Load environment variables
 load_dotenv()
 
-api_key = os.getenv("RAPIDAPI_KEY")
-host = os.getenv("HOST_URL")
-base_url = os.getenv("API_BASE_URL")
 api_source = os.getenv("API_SOURCE")
-db_host = os.getenv("DB_HOST")
-db_name = os.getenv("DB_NAME")
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
 
-delay_seconds = 0.24
+_run_team_ids = {}  # run_id -> team IDs loaded for that run
+_run_team_ids_lock = threading.Lock()
 
 
 def fetch_leagues_for_teams(cursor):
@@ -43,108 +43,162 @@ def fetch_leagues_for_teams(cursor):
     return leagues_for_teams
 
 
-def fetch_team_data_for_league(league):
-    """Fetch team data from the API for a given league and season."""
+def fetch_team_ids(cursor):
+    """Fetch the API IDs of every stored team from the database."""
+    try:
+        cursor.execute("""
+            SELECT tam.api_team_id
+            FROM teams_api_mapping tam
+        """)
+        teams = cursor.fetchall()
+        return [{'team_id': team[0]} for team in teams]
+    except Exception as e:
+        print(f"Failed to fetch team ids: {e}")
+        return []
+
+
+def team_ids_for_run(pool, run):
+    """
+    The stored team IDs, loaded once per run and shared by the squads and managers stages.
+    Both only start once the teams stage is done, so the list no longer changes.
+    """
+    with _run_team_ids_lock:
+        if run.run_id not in _run_team_ids:
+            with db.connection(pool) as conn:
+                with conn.cursor() as cursor:
+                    team_ids = fetch_team_ids(cursor)
+            if not team_ids:
+                return team_ids  # Nothing stored or the query failed; let the next caller retry
+            _run_team_ids[run.run_id] = team_ids
+        return _run_team_ids[run.run_id]
+
+
+def extract_team_data(league, results):
+    """Build the team and venue rows for a league from its /teams response."""
     teams_informations = []
-    success = False
-
-    while not success:
-        try:
-            response = requests.get(
-                f"{base_url}/teams",
-                headers={
-                    "x-rapidapi-key": api_key,
-                    "x-rapidapi-host": host,
-                },
-                params={
-                    "league": league['league_id'],
-                    "season": league['season']
-                }
-            )
-
-            if response.status_code == 200:
-                results = response.json()
-                for result in results.get('response', []):
-                    team = result.get('team', {})
-                    venue = result.get('venue', {})
-                    teams_informations.append({
-                        'api_league_id': league['league_id'],
-                        'season': league['season'],
-                        'api_team_id': team.get('id', ''),
-                        'team_name': team.get('name', ''),
-                        'team_code': team.get('code', ''),
-                        'country': team.get('country', ''),
-                        'founded': team.get('founded', ''),
-                        'national': team.get('national', ''),
-                        'team_logo': team.get('logo', ''),
-                        'api_venue_id': venue.get('id', ''),
-                        'venue_name': venue.get('name', ''),
-                        'address': venue.get('address', ''),
-                        'city': venue.get('city', ''),
-                        'capacity': venue.get('capacity', ''),
-                        'surface': venue.get('surface', ''),
-                        'image': venue.get('image', ''),
-                        'api_source': api_source,
-                    })
-                success = True
-
-                print(
-                    f"✅ {result.get('team', {})} with venue {venue.get('name', '')} has been added.")
-
-            elif response.status_code == 429:
-                print("Rate limit hit, waiting...")
-                time.sleep(60)
-
-            else:
-                print(f"Failed to fetch data for league ID: {league['league_id']}, season: {
-                      league['season']}. Status code: {response.status_code}")
-                success = True  # Exit the loop on failure
-
-            time.sleep(delay_seconds)
-
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            success = True  # Exit the loop on exception
+    for result in results.get('response', []):
+        team = decode_team(result, api_league_id=league['league_id'],
+                           season=league['season'], api_source=api_source)
+        teams_informations.append(team)
+
+        print(
+            f"✅ {team.team_name} with venue {team.venue_name} has been added.")
 
+    telemetry.add("rows_parsed", len(teams_informations))
     return teams_informations
 
 
+def fetch_team_data_for_leagues(client, leagues):
+    """
+    Fetch team data from the API for every league and season concurrently.
+    Yields (league, team rows) pairs in the order of `leagues`.
+    """
+    responses = fetcher.fetch_many(
+        client,
+        "teams",
+        [{"league": league['league_id'], "season": league['season']}
+         for league in leagues]
+    )
+    for league, results in zip(leagues, responses):
+        if results is None:
+            print(
+                f"Failed to fetch data for league ID: {league['league_id']}, season: {league['season']}.")
+            continue
+        yield league, extract_team_data(league, results)
+
+
+# Argument order of the upsert_teams_and_venues database function
+TEAM_COLUMNS = (
+    'api_league_id',
+    'season',
+    'api_team_id',
+    'team_name',
+    'team_code',
+    'country',
+    'founded',
+    'national',
+    'team_logo',
+    'api_venue_id',
+    'venue_name',
+    'address',
+    'city',
+    'capacity',
+    'surface',
+    'image',
+    'api_source',
+)
+# One team and its venue, in upsert_teams_and_venues argument order
+TeamRow = namedtuple("TeamRow", TEAM_COLUMNS)
+
+# Where each column comes from in a /teams entry
+decode_team = schemas.compile_decoder(TeamRow, ("result",), {
+    'api_team_id': 'result.team.id',
+    'team_name': 'result.team.name',
+    'team_code': 'result.team.code',
+    'country': 'result.team.country',
+    'founded': 'result.team.founded',
+    'national': 'result.team.national',
+    'team_logo': 'result.team.logo',
+    'api_venue_id': 'result.venue.id',
+    'venue_name': 'result.venue.name',
+    'address': 'result.venue.address',
+    'city': 'result.venue.city',
+    'capacity': 'result.venue.capacity',
+    'surface': 'result.venue.surface',
+    'image': 'result.venue.image',
+})
+
+
 def save_team_data_to_db(team_data, cursor):
-    """Save the fetched team data to the PostgreSQL database."""
-    try:
-        for team in team_data:
-            try:
-                cursor.execute("""
-                    SELECT upsert_teams_and_venues(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (team['api_league_id'], team['season'], team['api_team_id'], team['team_name'],
-                      team['team_code'], team['country'], team['founded'], team['national'], team['team_logo'],
-                      team['api_venue_id'], team['venue_name'], team['address'], team['city'], team['capacity'],
-                      team['surface'], team['image'], team['api_source']))
-
-            except Exception as e:
-                print(
-                    f"⚠️ Failed to upsert team ID {team['api_team_id']} for league ID {team['api_league_id']}. Error: {e}")
-                cursor.connection.rollback()
-                continue  # ✅ Skip instead of stopping everything
+    """
+    Save the fetched team data to the PostgreSQL database.
+    Rows the database rejects are set aside in datasource_rejects; the rest are committed.
+    """
+    store = fingerprints.get_store()
+    team_data, pending = store.changed(
+        "teams", team_data,
+        key=lambda team: (team.api_league_id, team.season, team.api_team_id))
+    if not team_data:
+        print("⏭️ Teams and venue data unchanged. Nothing to save.")
+        return
 
+    try:
+        rejected = bulk_loader.save_rows(
+            cursor, "teams", "upsert_teams_and_venues", TEAM_COLUMNS, team_data)
         cursor.connection.commit()
+        store.record("teams", [fingerprint for position, fingerprint in enumerate(pending)
+                               if position not in rejected])
+        telemetry.add("rows_upserted", len(team_data) - len(rejected))
+        telemetry.add("rows_failed", len(rejected))
         print("✅ Teams and venue data successfully saved.")
 
     except Exception as e:
         print(f"❌ Failed to save team data to PostgreSQL: {e}")
         cursor.connection.rollback()
+        telemetry.add("rows_failed", len(team_data))
+        raise  # The league must not be reported as written
 
 
-def fetch_and_store_teams():
-    """Main function to fetch and store team data."""
+def fetch_and_store_teams(client=None, pool=None, leagues=None):
+    """
+    Main function to fetch and store team data.
+    `leagues` ({'league_id', 'season'} dicts) defaults to every current season in the database.
+    """
+    client = client or api_client.ApiClient()
+    pool = pool or db.create_pool()
     try:
-        with psycopg2.connect(host=db_host, database=db_name, user=db_user, password=db_password) as conn:
-            with conn.cursor() as cursor:
-                leagues_for_teams = fetch_leagues_for_teams(cursor)
-                for league in leagues_for_teams:
-                    team_data = fetch_team_data_for_league(league)
-                    if team_data:  # ✅ Prevent saving empty data
-                        save_team_data_to_db(team_data, cursor)
+        if leagues is not None:
+            leagues_for_teams = leagues
+        else:
+            with db.connection(pool) as conn:
+                with conn.cursor() as cursor:
+                    leagues_for_teams = fetch_leagues_for_teams(cursor)
+
+        # One partition per league, written on parallel pooled connections
+        league_team_data = [team_data for league, team_data
+                            in fetch_team_data_for_leagues(client, leagues_for_teams)
+                            if team_data]  # ✅ Prevent saving empty data
+        db.parallel_write(pool, league_team_data, save_team_data_to_db)
 
     except Exception as e:
         print(f"❌ Failed to fetch and store teams: {e}")
@@ -0,0 +1,169 @@
+import os
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from state import STATE_DIR
+
+# Load environment variables
+load_dotenv()
+# run_report.json lands here; point TELEMETRY_TEXTFILE_DIR at node_exporter's
+# --collector.textfile.directory to have the .prom file scraped.
+REPORT_DIR = os.getenv("TELEMETRY_DIR", os.path.join(STATE_DIR, "telemetry"))
+TEXTFILE_DIR = os.getenv("TELEMETRY_TEXTFILE_DIR", REPORT_DIR)
+
+# Counter name -> help text, in report order
+METRICS = {
+    "api_calls": "HTTP requests sent to the API",
+    "cache_hits": "Requests answered from the response cache without a call",
+    "rate_limited": "Responses with status 429",
+    "retries": "Requests retried after a failure or 429",
+    "response_bytes": "Response body bytes received",
+    "rows_parsed": "Rows built from API responses",
+    "rows_upserted": "Rows committed to Postgres",
+    "rows_skipped": "Rows left out because they were unchanged since the last run",
+    "rows_failed": "Rows that could not be saved",
+    "db_seconds": "Seconds spent holding a Postgres connection, summed over connections",
+}
+
+
+class StageMetrics:
+    """Counters for one stage of a run. Safe to update from the stage's worker threads."""
+
+    def __init__(self, name):
+        self.name = name
+        self.status = "running"
+        self.started_at = time.monotonic()
+        self.wall_seconds = 0.0
+        self.counters = dict.fromkeys(METRICS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, metric, amount=1):
+        with self._lock:
+            self.counters[metric] += amount
+
+    def as_dict(self):
+        with self._lock:
+            return {"stage": self.name, "status": self.status,
+                    "wall_seconds": round(self.wall_seconds, 3),
+                    **{metric: round(value, 3) if isinstance(value, float) else value
+                       for metric, value in self.counters.items()}}
+
+
+_current = contextvars.ContextVar("telemetry_stage", default=None)
+_stages = {}  # stage name -> StageMetrics for this process's run
+_stages_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name):
+    """Attribute everything recorded inside the block (and threads it starts) to `name`."""
+    metrics = StageMetrics(name)
+    with _stages_lock:
+        _stages[name] = metrics
+    token = _current.set(metrics)
+    try:
+        yield metrics
+        metrics.status = "done"
+    except BaseException:
+        metrics.status = "failed"
+        raise
+    finally:
+        metrics.wall_seconds = time.monotonic() - metrics.started_at
+        _current.reset(token)
+
+
+def add(metric, amount=1):
+    """Add to a counter of the current stage. Does nothing outside a stage."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(metric, amount)
+
+
+@contextmanager
+def timed(metric):
+    """Add the block's duration in seconds to `metric`."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        add(metric, time.monotonic() - started)
+
+
+def propagate(fn):
+    """
+    Wrap `fn` to run in a copy of the caller's context, so work handed to another thread
+    is still counted against the stage that handed it over.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def snapshot():
+    with _stages_lock:
+        return [metrics.as_dict() for metrics in _stages.values()]
+
+
+def reset():
+    with _stages_lock:
+        _stages.clear()
+
+
+def _write_atomically(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as output:
+        output.write(text)
+    os.replace(temporary, path)  # Readers never see a half-written file
+
+
+def prometheus_text(stages, run_id=None):
+    """The stage metrics in Prometheus text exposition format."""
+    lines = [
+        "# HELP datasource_run_info The run these metrics belong to",
+        "# TYPE datasource_run_info gauge",
+        f'datasource_run_info{{run_id="{run_id or ""}"}} 1',
+        "# HELP datasource_stage_wall_seconds Wall time of the stage",
+        "# TYPE datasource_stage_wall_seconds gauge",
+    ]
+    lines += [f'datasource_stage_wall_seconds{{stage="{entry["stage"]}"}} '
+              f'{entry["wall_seconds"]}' for entry in stages]
+    lines += [
+        "# HELP datasource_stage_success Whether the stage finished without an error",
+        "# TYPE datasource_stage_success gauge",
+    ]
+    lines += [f'datasource_stage_success{{stage="{entry["stage"]}"}} '
+              f'{int(entry["status"] == "done")}' for entry in stages]
+    for metric, help_text in METRICS.items():
+        lines += [f"# HELP datasource_stage_{metric} {help_text}",
+                  f"# TYPE datasource_stage_{metric} gauge"]
+        lines += [f'datasource_stage_{metric}{{stage="{entry["stage"]}"}} '
+                  f'{entry[metric]}' for entry in stages]
+    lines += [
+        "# HELP datasource_last_run_timestamp_seconds When the last run report was written",
+        "# TYPE datasource_last_run_timestamp_seconds gauge",
+        f"datasource_last_run_timestamp_seconds {time.time():.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write_report(run_id=None, report_dir=REPORT_DIR, textfile_dir=TEXTFILE_DIR):
+    """
+    Write this run's stage metrics as run_report.json and as a Prometheus textfile
+    (datasource.prom). Returns the path of the JSON report.
+    """
+    stages = snapshot()
+    report = {
+        "run_id": run_id,
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "stages": stages,
+        "totals": {metric: sum(entry[metric] for entry in stages) for metric in METRICS},
+    }
+    report_path = os.path.join(report_dir, "run_report.json")
+    _write_atomically(report_path, json.dumps(report, indent=2) + "\n")
+    _write_atomically(os.path.join(textfile_dir, "datasource.prom"),
+                      prometheus_text(stages, run_id))
+    return report_path
@@ -0,0 +1,71 @@
+import psycopg2
+import pytest
+import bulk_loader
+
+COLUMNS = ("api_team_id", "team_name")
+ROWS = [(team_id, f"Team {team_id}") for team_id in range(1, 11)]
+BAD = {3, 8}  # api_team_ids the database rejects
+
+
+@pytest.fixture
+def upserts(monkeypatch):
+    """Fake set-based upserts: a batch fails as a whole when it holds a bad row."""
+    calls = []
+
+    def upsert(mode):
+        def run(cursor, function_name, columns, rows):
+            calls.append((mode, [row[0] for row in rows]))
+            if any(row[0] in BAD for row in rows):
+                raise psycopg2.DataError(f"bad row in {[row[0] for row in rows]}")
+            cursor.written.extend(rows)
+        return run
+
+    monkeypatch.setattr(bulk_loader, "copy_upsert", upsert("copy"))
+    monkeypatch.setattr(bulk_loader, "batch_upsert", upsert("batch"))
+    return calls
+
+
+class Cursor:
+    def __init__(self):
+        self.written = []
+
+
+def test_bisect_isolates_the_bad_rows(upserts):
+    cursor = Cursor()
+    failed = {}
+    bulk_loader._bisect(cursor, "copy", "upsert_teams", COLUMNS, ROWS, 0, failed)
+    assert sorted(failed) == [2, 7]  # Positions of teams 3 and 8
+    assert sorted(row[0] for row in cursor.written) == [1, 2, 4, 5, 6, 7, 9, 10]
+    # Only the first attempt uses COPY; the halves go through batch upserts.
+    assert upserts[0] == ("copy", list(range(1, 11)))
+    assert all(mode == "batch" for mode, _ in upserts[1:])
+
+
+def test_bisect_of_a_clean_batch_is_one_statement(upserts):
+    failed = {}
+    bulk_loader._bisect(Cursor(), "batch", "upsert_teams", COLUMNS, ROWS[3:7], 0, failed)
+    assert failed == {} and len(upserts) == 1
+
+
+def test_lost_connection_is_not_bisected(monkeypatch):
+    def gone(cursor, function_name, columns, rows):
+        raise psycopg2.OperationalError("server closed the connection")
+    monkeypatch.setattr(bulk_loader, "batch_upsert", gone)
+    with pytest.raises(psycopg2.OperationalError):
+        bulk_loader._bisect(Cursor(), "batch", "upsert_teams", COLUMNS, ROWS, 0, {})
+
+
+def test_save_rows_keeps_good_rows_when_rejects_cannot_be_stored(upserts, monkeypatch):
+    def no_rejects_table(cursor):
+        raise psycopg2.errors.InsufficientPrivilege("permission denied for schema public")
+
+    executed = []
+    cursor = Cursor()
+    cursor.execute = lambda query, params=None: executed.append(query)
+    monkeypatch.setattr(bulk_loader, "upsert_mode", lambda stage: "copy")
+    monkeypatch.setattr(bulk_loader, "_ensure_rejects_table", no_rejects_table)
+
+    rejected = bulk_loader.save_rows(cursor, "teams", "upsert_teams", COLUMNS, ROWS)
+    assert rejected == {2, 7}
+    assert len(cursor.written) == 8
+    assert executed == ["SAVEPOINT record_rejects", "ROLLBACK TO SAVEPOINT record_rejects"]
@@ -0,0 +1,58 @@
+import pytest
+import quota_planner
+from scheduler import Stage
+
+UNITS = {"countries": 1, "leagues": 1, "teams": 20, "standings": 20,
+         "squads": 500, "managers": 500, "players": 1000}
+
+
+@pytest.fixture(autouse=True)
+def no_retry_margin(monkeypatch):
+    monkeypatch.setattr(quota_planner, "RETRY_MARGIN", 0)
+
+
+def test_everything_fits():
+    plans = quota_planner.allocate(UNITS, 10_000)
+    assert all(plan.status == "full" and plan.limit is None for plan in plans.values())
+    assert quota_planner.is_complete(plans)
+
+
+def test_trimmable_stages_are_cut_in_priority_order():
+    plans = quota_planner.allocate(UNITS, 42 + 500 + 100)
+    assert plans["squads"].status == "full"
+    assert plans["managers"].status == "trimmed" and plans["managers"].limit == 100
+    assert plans["players"].status == "deferred" and plans["players"].allowed_units == 0
+    assert not quota_planner.is_complete(plans)
+
+
+def test_per_league_stages_are_deferred_rather_than_trimmed():
+    plans = quota_planner.allocate(UNITS, 30)
+    assert plans["teams"].status == "full"
+    assert plans["standings"].status == "deferred"
+    # What standings could not use still goes to the trimmable stages after it.
+    assert plans["squads"].status == "trimmed" and plans["squads"].limit == 8
+
+
+def test_retry_margin_is_budgeted(monkeypatch):
+    monkeypatch.setattr(quota_planner, "RETRY_MARGIN", 0.25)
+    plans = quota_planner.allocate({"squads": 100}, 50)
+    assert plans["squads"].calls == 125
+    assert plans["squads"].limit == 40 and plans["squads"].allowed_calls == 50
+
+
+def test_apply_drops_deferred_stages_and_their_edges():
+    plans = quota_planner.allocate({"teams": 20, "standings": 20, "squads": 500}, 30)
+    stages = quota_planner.apply(plans, [
+        Stage("teams", None),
+        Stage("standings", None),
+        Stage("squads", None, after=["teams", "standings"]),
+    ])
+    assert [stage.name for stage in stages] == ["teams", "squads"]
+    assert stages[1].after == ("teams",)
+    assert plans["squads"].limit == 10
+
+
+def test_no_plan_leaves_the_stages_alone():
+    stages = [Stage("teams", None), Stage("squads", None, after=["teams"])]
+    assert quota_planner.apply(None, stages) == stages
+    assert quota_planner.is_complete(None)
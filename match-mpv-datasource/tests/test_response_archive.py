@@ -0,0 +1,74 @@
+import json
+import pytest
+from requests.structures import CaseInsensitiveDict
+import api_client
+import fetcher
+import rate_limiter
+import response_archive
+import response_cache
+
+BODIES = {
+    1: json.dumps({"response": [{"team": {"id": 1}}], "errors": []}).encode(),
+    2: json.dumps({"response": [{"team": {"id": 2}}], "errors": []}).encode(),
+}
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = CaseInsensitiveDict({"etag": '"v1"'})
+
+
+class FakeSession:
+    """Answers every /teams request with a 200, or a 304 when it is revalidated."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.calls += 1
+        if headers and headers.get("If-None-Match"):
+            return FakeResponse(304)
+        return FakeResponse(200, BODIES[params["league"]])
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_shared_bucket",
+                        rate_limiter.TokenBucket(path=str(tmp_path / "rate_limit.sqlite3")))
+
+
+def make_client(tmp_path, archive, ttls):
+    # use_cache=False keeps the default cache out of the repo's .state; attach a tmp one.
+    client = api_client.ApiClient(base_url="http://api.test", api_key="key", host="api.test",
+                                  use_cache=False, archive=archive)
+    client._session = FakeSession()
+    if not archive.replaying:
+        client.cache = response_cache.ResponseCache(path=str(tmp_path / "cache"), ttls=ttls)
+    return client
+
+
+# A tiny TTL keeps the entry cacheable but stale, so it is revalidated with a 304.
+@pytest.mark.parametrize("ttl", [3600, 1e-9], ids=["fresh hit", "304"])
+def test_record_with_warm_cache_then_replay(tmp_path, ttl):
+    params_list = [{"league": 1}, {"league": 2}]
+    archive_path = str(tmp_path / "archive.sqlite3")
+
+    with make_client(tmp_path, response_archive.ResponseArchive(str(tmp_path / "warm.sqlite3")),
+                     {"teams": ttl}) as client:
+        fetcher.fetch_many(client, "teams", params_list)  # Warm the cache
+
+    with make_client(tmp_path, response_archive.ResponseArchive(archive_path),
+                     {"teams": ttl}) as client:
+        recorded = fetcher.fetch_many(client, "teams", params_list)
+        assert client.archive.recorded >= len(params_list)
+
+    replay = response_archive.ResponseArchive(archive_path, replaying=True)
+    with make_client(tmp_path, replay, {"teams": ttl}) as client:
+        replayed = fetcher.fetch_many(client, "teams", params_list)
+        assert client._session.calls == 0
+    assert replayed == recorded == [json.loads(BODIES[1]), json.loads(BODIES[2])]
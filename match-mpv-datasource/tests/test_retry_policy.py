@@ -0,0 +1,74 @@
+import retry_policy
+from retry_policy import CircuitBreaker, RetryBudget, RetryPolicy
+
+
+def open_breaker(breaker, monkeypatch, now):
+    monkeypatch.setattr(retry_policy.time, "monotonic", lambda: now)
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_threshold_consecutive_failures(monkeypatch):
+    breaker = CircuitBreaker(threshold=3, cooldown=60)
+    monkeypatch.setattr(retry_policy.time, "monotonic", lambda: 1000.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # Resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open and not breaker.allow()
+    assert breaker.cooldown_left() == 60
+
+
+def test_half_open_lets_one_trial_through(monkeypatch):
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    open_breaker(breaker, monkeypatch, 1000.0)
+    monkeypatch.setattr(retry_policy.time, "monotonic", lambda: 1061.0)
+    assert breaker.cooldown_left() == 0
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one trial at a time
+    breaker.record_success()
+    assert not breaker.is_open and breaker.allow()
+
+
+def test_failed_trial_reopens_for_a_new_cooldown(monkeypatch):
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    open_breaker(breaker, monkeypatch, 1000.0)
+    monkeypatch.setattr(retry_policy.time, "monotonic", lambda: 1061.0)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open and not breaker.allow()
+    assert breaker.cooldown_left() == 60
+
+
+def test_released_trial_lets_the_next_request_try(monkeypatch):
+    # A trial that hit a 429 says nothing about the endpoint.
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    open_breaker(breaker, monkeypatch, 1000.0)
+    monkeypatch.setattr(retry_policy.time, "monotonic", lambda: 1061.0)
+    assert breaker.allow()
+    breaker.release_trial()
+    assert breaker.is_open and breaker.allow()
+
+
+def test_retry_budget_and_policy():
+    budget = RetryBudget(retries=2)
+    assert [budget.consume() for _ in range(3)] == [True, True, False]
+
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=4)
+    assert policy.should_retry(1, 503) and policy.should_retry(1, None)
+    assert not policy.should_retry(1, 404) and not policy.should_retry(3, 503)
+    assert policy.delay(10) <= 4
+    assert policy.delay(0, retry_after=30) == 30
+
+
+def test_refill_budgets_keeps_breaker_state(monkeypatch):
+    monkeypatch.setattr(retry_policy, "_guards", {})
+    guard = retry_policy.get_guard("standings")
+    guard.budget.remaining = 0
+    guard.breaker.opened_at = 1.0
+    retry_policy.refill_budgets()
+    assert retry_policy.get_guard("standings") is guard
+    assert guard.budget.consume() and guard.breaker.is_open
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from scheduler import Stage, critical_path, run_stages
+
+
+def test_stages_start_after_their_dependencies():
+    finished = []
+    lock = threading.Lock()
+
+    def step(name):
+        def run():
+            with lock:
+                finished.append(name)
+        return run
+
+    stages = run_stages([
+        Stage("squads", step("squads"), after=["teams"]),
+        Stage("countries", step("countries")),
+        Stage("teams", step("teams"), after=["leagues"]),
+        Stage("leagues", step("leagues"), after=["countries"]),
+    ])
+    assert all(stage.status == "done" for stage in stages)
+    assert finished.index("countries") < finished.index("leagues") < finished.index("teams") \
+        < finished.index("squads")
+
+
+def test_failure_skips_dependents_but_not_independent_stages():
+    def fail():
+        raise RuntimeError("API down")
+
+    stages = {stage.name: stage for stage in run_stages([
+        Stage("teams", fail),
+        Stage("squads", lambda: None, after=["teams"]),
+        Stage("players", lambda: None, after=["squads"]),
+        Stage("standings", lambda: None),
+    ])}
+    assert stages["teams"].status == "failed"
+    assert str(stages["teams"].error) == "API down"
+    assert stages["squads"].status == stages["players"].status == "skipped"
+    assert stages["standings"].status == "done"
+
+
+@pytest.mark.parametrize("stages, message", [
+    ([Stage("a", None), Stage("a", None)], "unique"),
+    ([Stage("a", None, after=["b"])], "unknown stage b"),
+    ([Stage("a", None, after=["b"]), Stage("b", None, after=["a"])], "cycle"),
+])
+def test_invalid_graphs_are_rejected(stages, message):
+    with pytest.raises(ValueError, match=message):
+        run_stages(stages)
+
+
+def timed(name, seconds, after=()):
+    stage = Stage(name, None, after)
+    stage.started_at, stage.finished_at = 0.0, seconds
+    return stage
+
+
+def test_critical_path_is_the_longest_chain():
+    stages = [
+        timed("countries", 1),
+        timed("leagues", 2, ["countries"]),
+        timed("teams", 3, ["leagues"]),
+        timed("squads", 10, ["teams"]),
+        timed("standings", 5, ["leagues"]),
+        timed("players", 12),
+    ]
+    assert [stage.name for stage in critical_path(stages)] == \
+        ["countries", "leagues", "teams", "squads"]
+    assert critical_path([]) == []
@@ -0,0 +1,40 @@
+from collections import namedtuple
+import pytest
+import schemas
+
+Row = namedtuple("Row", ("league_id", "team_name", "goals_for", "points", "api_source"))
+
+decode = schemas.compile_decoder(Row, ("league", "standing"), {
+    'league_id': 'league.id',
+    'team_name': 'standing.team.name',
+    'goals_for': ('standing.all.goals.for', 0),
+    'points': 'standing.points',
+})
+
+
+def test_decoder_reads_nested_paths_into_the_row():
+    league = {"id": 39}
+    standing = {"team": {"name": "Arsenal"}, "all": {"goals": {"for": 61}}, "points": 70}
+    assert decode(league, standing, api_source="api-football") == \
+        Row(39, "Arsenal", 61, 70, "api-football")
+
+
+def test_missing_values_and_null_objects_fall_back_to_defaults():
+    row = decode({}, {"team": None, "all": {}}, api_source=None)
+    assert row == Row('', '', 0, '', None)
+
+
+def test_columns_not_in_fields_are_keyword_only():
+    with pytest.raises(TypeError):
+        decode({}, {}, "api-football")
+
+
+def test_unknown_sources_and_columns_are_rejected():
+    with pytest.raises(ValueError, match="unknown source"):
+        schemas.compile_decoder(Row, ("league",), {'team_name': 'team.name'})
+    with pytest.raises(ValueError, match="no columns"):
+        schemas.compile_decoder(Row, ("league",), {'rank': 'league.rank'})
+
+
+def test_loads_decodes_bytes():
+    assert schemas.loads(b'{"response": [1, 2]}') == {"response": [1, 2]}
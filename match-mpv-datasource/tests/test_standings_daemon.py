@@ -0,0 +1,88 @@
+import pytest
+import standings_daemon
+from standings_daemon import HOUR, LeagueState, schedule_poll
+
+NOW = 1_800_000_000
+
+
+def league():
+    return LeagueState({'league_id': 39, 'season': 2025})
+
+
+def test_never_polled_idle_league_is_not_postponed_by_schedule_reloads():
+    state = league()
+    schedule_poll(state, [], NOW)
+    first_poll = state.next_poll_at
+    assert first_poll == NOW + standings_daemon.IDLE_INTERVAL
+
+    # The schedule is reloaded hourly; none of the reloads may push the first poll back.
+    for hour in range(1, 30):
+        schedule_poll(state, [], NOW + hour * HOUR)
+    assert state.next_poll_at == first_poll
+
+
+def test_idle_league_backs_off_from_its_last_poll():
+    state = league()
+    state.last_polled_at = NOW
+    state.unchanged_polls = 2
+    schedule_poll(state, [], NOW + HOUR)
+    assert state.mode == "idle"
+    assert state.next_poll_at == NOW + min(standings_daemon.IDLE_INTERVAL * 4,
+                                           standings_daemon.IDLE_MAX_INTERVAL)
+
+
+@pytest.mark.parametrize("status", ["1H", "HT", "NS"])
+def test_match_under_way_is_polled_live(status):
+    # NS after kick-off: the schedule was loaded before the match started.
+    state = league()
+    state.last_polled_at = NOW - 60
+    schedule_poll(state, [(NOW - 10 * 60, status)], NOW)
+    assert state.mode == "live"
+    assert state.next_poll_at == NOW - 60 + standings_daemon.LIVE_INTERVAL
+
+
+def test_finished_match_is_polled_as_recent():
+    state = league()
+    schedule_poll(state, [(NOW - 2.5 * HOUR, "FT")], NOW)
+    assert state.mode == "recent"
+    assert state.next_poll_at == NOW  # Never polled: right away
+
+
+def test_upcoming_match_waits_for_kick_off():
+    state = league()
+    state.last_polled_at = NOW - HOUR
+    schedule_poll(state, [(NOW + 3 * HOUR, "NS")], NOW)
+    assert state.mode == "upcoming"
+    assert state.next_poll_at == NOW + 3 * HOUR + standings_daemon.LIVE_INTERVAL
+
+
+def test_unknown_schedule_follows_observed_changes():
+    state = league()
+    state.last_polled_at = NOW
+    state.unchanged_polls = 3
+    schedule_poll(state, None, NOW)
+    assert state.mode == "observed"
+    assert state.interval == standings_daemon.RECENT_INTERVAL * 8
+
+
+def test_failed_write_is_retried_on_the_next_poll(monkeypatch):
+    table = {"response": [{"league": {"standings": [[{"rank": 1, "team": {"id": 33}}]]}}]}
+    monkeypatch.setattr(standings_daemon.standings, "fetch_standings",
+                        lambda client, leagues: [(league, table) for league in leagues])
+    monkeypatch.setattr(standings_daemon.standings, "parse_standings_data",
+                        lambda response: [("row",)])
+
+    def broken_write(pool, rows):
+        raise RuntimeError("connection reset")
+    monkeypatch.setattr(standings_daemon.standings, "write_league_standings", broken_write)
+
+    state = league()
+    standings_daemon.poll(None, None, [state], None, NOW)
+    assert state.last_hash is None and state.last_polled_at is None
+    assert NOW < state.next_poll_at <= NOW + standings_daemon.RECENT_INTERVAL
+
+    written = []
+    monkeypatch.setattr(standings_daemon.standings, "write_league_standings",
+                        lambda pool, rows: written.append(rows))
+    standings_daemon.poll(None, None, [state], None, state.next_poll_at)
+    assert written == [[("row",)]] and state.last_hash is not None
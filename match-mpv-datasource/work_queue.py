@@ -0,0 +1,211 @@
+import os
+import uuid
+from collections import namedtuple
+from datetime import datetime
+from dotenv import load_dotenv
+from psycopg2.extras import Json, execute_values
+
+# Load environment variables
+load_dotenv()
+LEASE_SECONDS = int(os.getenv("WORK_QUEUE_LEASE_SECONDS", "300"))  # A claim expires after this
+MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "5"))
+RETRY_DELAY = int(os.getenv("WORK_QUEUE_RETRY_DELAY", "30"))  # Seconds, doubled per attempt
+
+# One queued unit of work: a league (teams, standings) or a team (squads, managers)
+WorkItem = namedtuple("WorkItem", ("item_id", "stage", "unit", "attempts"))
+
+
+def ensure_schema(cursor):
+    """Create the work-queue tables if they do not exist yet."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS datasource_work_runs (
+            run_id text PRIMARY KEY,
+            stages text[] NOT NULL,
+            seeded text[] NOT NULL DEFAULT '{}',
+            created_at timestamptz NOT NULL DEFAULT now()
+        );
+        CREATE TABLE IF NOT EXISTS datasource_work_queue (
+            item_id bigserial PRIMARY KEY,
+            run_id text NOT NULL REFERENCES datasource_work_runs ON DELETE CASCADE,
+            stage text NOT NULL,
+            unit jsonb NOT NULL,
+            status text NOT NULL DEFAULT 'queued',  -- queued | leased | done | failed
+            attempts integer NOT NULL DEFAULT 0,
+            available_at timestamptz NOT NULL DEFAULT now(),
+            leased_by text,
+            lease_expires_at timestamptz,
+            last_error text,
+            finished_at timestamptz,
+            UNIQUE (run_id, stage, unit)
+        );
+        CREATE INDEX IF NOT EXISTS datasource_work_queue_claim
+            ON datasource_work_queue (run_id, available_at) WHERE status IN ('queued', 'leased');
+    """)
+
+
+def create_run(cursor, stages):
+    """Register a distributed run of `stages`. Returns its run ID."""
+    run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    cursor.execute("INSERT INTO datasource_work_runs (run_id, stages) VALUES (%s, %s)",
+                   (run_id, list(stages)))
+    return run_id
+
+
+def latest_run(cursor):
+    """The most recent run that still has unfinished items or unseeded stages, or None."""
+    cursor.execute("""
+        SELECT r.run_id FROM datasource_work_runs r
+        WHERE EXISTS (SELECT 1 FROM datasource_work_queue q
+                      WHERE q.run_id = r.run_id AND q.status IN ('queued', 'leased'))
+           OR NOT r.stages <@ r.seeded
+        ORDER BY r.created_at DESC LIMIT 1
+    """)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def run_stages(cursor, run_id):
+    """(stages of the run, stages already seeded)."""
+    cursor.execute("SELECT stages, seeded FROM datasource_work_runs WHERE run_id = %s",
+                   (run_id,))
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else ([], [])
+
+
+def claim_seeding(cursor, run_id, stage):
+    """
+    Atomically take the job of seeding `stage` for the run. True for exactly one caller;
+    the items must be enqueued in the same transaction so a failure hands the job back.
+    """
+    cursor.execute("""
+        UPDATE datasource_work_runs SET seeded = array_append(seeded, %s)
+        WHERE run_id = %s AND NOT (%s = ANY(seeded))
+        RETURNING run_id
+    """, (stage, run_id, stage))
+    return cursor.fetchone() is not None
+
+
+def enqueue(cursor, run_id, stage, units):
+    """Queue one item per unit (a JSON-able dict). Units already queued for the run are ignored."""
+    if not units:
+        return 0
+    execute_values(cursor, """
+        INSERT INTO datasource_work_queue (run_id, stage, unit) VALUES %s
+        ON CONFLICT (run_id, stage, unit) DO NOTHING
+    """, [(run_id, stage, Json(unit)) for unit in units], page_size=len(units))
+    return cursor.rowcount
+
+
+def claim(cursor, run_id, worker_id, limit=1, stages=None):
+    """
+    Lease up to `limit` items for `worker_id`: queued ones, and leased ones whose lease ran
+    out (their worker died). SKIP LOCKED lets any number of workers claim at once without
+    waiting on each other or getting the same item. Commit right after to publish the lease.
+    Expired leases of items that already used MAX_ATTEMPTS are marked failed instead: their
+    worker keeps dying on them.
+    """
+    cursor.execute("""
+        UPDATE datasource_work_queue
+        SET status = 'failed', lease_expires_at = NULL,
+            last_error = 'Lease expired after ' || attempts || ' attempts'
+        WHERE run_id = %s AND status = 'leased' AND lease_expires_at < now()
+          AND attempts >= %s
+    """, (run_id, MAX_ATTEMPTS))
+    cursor.execute("""
+        UPDATE datasource_work_queue q
+        SET status = 'leased', leased_by = %(worker)s, attempts = q.attempts + 1,
+            lease_expires_at = now() + %(lease)s * interval '1 second'
+        WHERE q.item_id IN (
+            SELECT item_id FROM datasource_work_queue
+            WHERE run_id = %(run_id)s
+              AND (status = 'queued' OR (status = 'leased' AND lease_expires_at < now()))
+              AND available_at <= now()
+              AND (%(stages)s::text[] IS NULL OR stage = ANY(%(stages)s::text[]))
+            ORDER BY available_at, item_id
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING q.item_id, q.stage, q.unit, q.attempts
+    """, {"worker": worker_id, "lease": LEASE_SECONDS, "run_id": run_id,
+          "stages": list(stages) if stages else None, "limit": limit})
+    return [WorkItem(*row) for row in cursor.fetchall()]
+
+
+def extend(cursor, item_ids, worker_id):
+    """Renew the lease on items still being worked on. Returns how many were still held."""
+    if not item_ids:
+        return 0
+    cursor.execute("""
+        UPDATE datasource_work_queue
+        SET lease_expires_at = now() + %s * interval '1 second'
+        WHERE item_id = ANY(%s) AND leased_by = %s AND status = 'leased'
+    """, (LEASE_SECONDS, list(item_ids), worker_id))
+    return cursor.rowcount
+
+
+def complete(cursor, item_ids, worker_id):
+    """Mark items done. Items whose lease was lost to another worker are left to that worker."""
+    if item_ids:
+        cursor.execute("""
+            UPDATE datasource_work_queue
+            SET status = 'done', finished_at = now(), lease_expires_at = NULL, last_error = NULL
+            WHERE item_id = ANY(%s) AND leased_by = %s AND status = 'leased'
+        """, (list(item_ids), worker_id))
+
+
+def fail(cursor, item_ids, worker_id, error):
+    """
+    Put failed items back in the queue after an exponential delay, or mark them failed
+    once they have used up MAX_ATTEMPTS.
+    """
+    if item_ids:
+        cursor.execute("""
+            UPDATE datasource_work_queue
+            SET status = CASE WHEN attempts >= %(max_attempts)s THEN 'failed' ELSE 'queued' END,
+                available_at = now() + %(delay)s * power(2, attempts - 1) * interval '1 second',
+                lease_expires_at = NULL, last_error = %(error)s
+            WHERE item_id = ANY(%(ids)s) AND leased_by = %(worker)s AND status = 'leased'
+        """, {"max_attempts": MAX_ATTEMPTS, "delay": RETRY_DELAY, "error": str(error)[:1000],
+              "ids": list(item_ids), "worker": worker_id})
+
+
+def release(cursor, item_ids, worker_id):
+    """Hand claimed items back untouched, e.g. when a worker is stopped."""
+    if item_ids:
+        cursor.execute("""
+            UPDATE datasource_work_queue
+            SET status = 'queued', attempts = attempts - 1, lease_expires_at = NULL
+            WHERE item_id = ANY(%s) AND leased_by = %s AND status = 'leased'
+        """, (list(item_ids), worker_id))
+
+
+def requeue_failed(cursor, run_id):
+    """Give permanently failed items of the run a fresh set of attempts."""
+    cursor.execute("""
+        UPDATE datasource_work_queue
+        SET status = 'queued', attempts = 0, available_at = now()
+        WHERE run_id = %s AND status = 'failed'
+    """, (run_id,))
+    return cursor.rowcount
+
+
+def pending(cursor, run_id, stages=None):
+    """Items of the run (optionally of `stages`) still queued or leased."""
+    cursor.execute("""
+        SELECT count(*) FROM datasource_work_queue
+        WHERE run_id = %s AND status IN ('queued', 'leased')
+          AND (%s::text[] IS NULL OR stage = ANY(%s::text[]))
+    """, (run_id, list(stages) if stages else None, list(stages) if stages else None))
+    return cursor.fetchone()[0]
+
+
+def counts(cursor, run_id):
+    """{stage: {status: items}} for the run."""
+    cursor.execute("""
+        SELECT stage, status, count(*) FROM datasource_work_queue
+        WHERE run_id = %s GROUP BY stage, status ORDER BY stage, status
+    """, (run_id,))
+    result = {}
+    for stage, status, count in cursor.fetchall():
+        result.setdefault(stage, {})[status] = count
+    return result
@@ -0,0 +1,268 @@
+"""
+Spread the per-league and per-team crawls over several hosts through a Postgres work queue.
+
+    python worker.py seed                     # queue a run of teams, standings, squads, managers
+    python worker.py work --until-empty       # on every worker host, each with its own RAPIDAPI_KEY
+    python worker.py status
+    python worker.py requeue-failed
+
+Squads and managers items are queued by whichever worker first sees every teams item done.
+"""
+import os
+import argparse
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import api_client
+import db
+import managers
+import retry_policy
+import squads
+import standings
+import teams
+import work_queue
+
+# Load environment variables
+load_dotenv()
+BATCH = int(os.getenv("WORKER_BATCH", "10"))  # Items claimed (and fetched concurrently) at a time
+IDLE_SECONDS = float(os.getenv("WORKER_IDLE_SECONDS", "10"))
+
+STAGES = ["teams", "standings", "squads", "managers"]
+# Where each stage's units come from
+SEEDS = {
+    "teams": teams.fetch_leagues_for_teams,
+    "standings": standings.fetch_leagues_and_seasons,
+    "squads": teams.fetch_team_ids,
+    "managers": teams.fetch_team_ids,
+}
+# Stages whose units only exist once another stage's items are done
+SEED_AFTER = {"squads": "teams", "managers": "teams"}
+
+
+def work_teams(client, pool, units, coaches):
+    """Fetch and store the teams of each league. Returns the units that were fetched."""
+    fetched = []
+    team_data = []
+    for league, rows in teams.fetch_team_data_for_leagues(client, units):
+        fetched.append(league)
+        if rows:
+            team_data.append(rows)
+    failed = db.failed_writes(pool, team_data, teams.save_team_data_to_db)
+    failed_leagues = {(team.api_league_id, team.season) for rows in failed for team in rows}
+    return [league for league in fetched
+            if (league['league_id'], league['season']) not in failed_leagues]
+
+
+def work_standings(client, pool, units, coaches):
+    """Fetch and store the standings of each league. Returns the units that were fetched."""
+    fetched = []
+    for league, api_response in standings.fetch_standings(client, units):
+        if api_response is None:
+            continue
+        standings_data = standings.parse_standings_data(api_response)
+        if standings_data:
+            standings.write_league_standings(pool, standings_data)
+        fetched.append(league)
+    return fetched
+
+
+def work_squads(client, pool, units, coaches):
+    """Fetch and store each team's squad. Returns the units that were fetched."""
+    squad_details, fetched_team_ids = squads.fetch_squad_details(client, units)
+    failed = db.failed_writes(
+        pool, db.partition(squad_details, key=lambda squad: squad.api_team_id),
+        squads.save_squad_details)
+    failed_team_ids = {squad.api_team_id for rows in failed for squad in rows}
+    return [unit for unit in units
+            if unit['team_id'] in fetched_team_ids and unit['team_id'] not in failed_team_ids]
+
+
+def work_managers(client, pool, units, coaches):
+    """Fetch and store each team's managers. Returns the units that were fetched."""
+    manager_details, fetched_team_ids = managers.fetch_managers_details(client, units, coaches)
+    failed = db.failed_writes(
+        pool, db.partition(manager_details, key=lambda manager: manager.api_team_id),
+        managers.save_managers_details)
+    failed_team_ids = {manager.api_team_id for rows in failed for manager in rows}
+    return [unit for unit in units
+            if unit['team_id'] in fetched_team_ids and unit['team_id'] not in failed_team_ids]
+
+
+HANDLERS = {
+    "teams": work_teams,
+    "standings": work_standings,
+    "squads": work_squads,
+    "managers": work_managers,
+}
+
+
+def seed_ready(pool, run_id):
+    """
+    Queue the items of every stage of the run that can be seeded now: stages without a
+    prerequisite, and stages whose prerequisite has no items left to process.
+    Returns the number of items queued.
+    """
+    queued = 0
+    with db.connection(pool) as conn:
+        with conn.cursor() as cursor:
+            stages, seeded = work_queue.run_stages(cursor, run_id)
+    for stage in stages:
+        prerequisite = SEED_AFTER.get(stage)
+        if stage in seeded:
+            continue
+        if prerequisite in stages and prerequisite not in seeded:
+            continue
+        with db.connection(pool) as conn:
+            with conn.cursor() as cursor:
+                if prerequisite in stages and work_queue.pending(cursor, run_id, [prerequisite]):
+                    continue
+                if not work_queue.claim_seeding(cursor, run_id, stage):
+                    continue  # Another worker got there first
+                count = work_queue.enqueue(cursor, run_id, stage, SEEDS[stage](cursor))
+        print(f"🌱 Queued {count} {stage} items for run {run_id}.")
+        queued += count
+    return queued
+
+
+@contextmanager
+def leases_kept(pool, items, worker_id):
+    """Renew the lease on `items` every third of LEASE_SECONDS while the block runs."""
+    stop = threading.Event()
+    item_ids = [item.item_id for item in items]
+
+    def renew():
+        while not stop.wait(work_queue.LEASE_SECONDS / 3):
+            try:
+                with db.connection(pool) as conn:
+                    with conn.cursor() as cursor:
+                        held = work_queue.extend(cursor, item_ids, worker_id)
+                if held < len(item_ids):
+                    print(f"⚠️ Lost the lease on {len(item_ids) - held} items to another worker.")
+            except Exception as e:
+                print(f"⚠️ Could not renew the lease on {len(item_ids)} items: {e}")
+
+    renewer = threading.Thread(target=renew, daemon=True)
+    renewer.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        renewer.join()
+
+
+def process(client, pool, items, worker_id, coaches):
+    """Run the claimed items stage by stage and record each item as done or failed."""
+    by_stage = {}
+    for item in items:
+        by_stage.setdefault(item.stage, []).append(item)
+
+    for stage, stage_items in by_stage.items():
+        error = "Fetch or save failed"
+        try:
+            fetched = HANDLERS[stage](client, pool, [item.unit for item in stage_items], coaches)
+        except Exception as e:
+            print(f"❌ {stage} items failed: {e}")
+            fetched, error = [], e
+        done = [item.item_id for item in stage_items if item.unit in fetched]
+        failed = [item.item_id for item in stage_items if item.unit not in fetched]
+        with db.connection(pool) as conn:
+            with conn.cursor() as cursor:
+                work_queue.complete(cursor, done, worker_id)
+                work_queue.fail(cursor, failed, worker_id, error)
+        print(f"✅ {stage}: {len(done)} items done, {len(failed)} requeued.")
+
+
+def work(pool, run_id, worker_id, batch=BATCH, stages=None, until_empty=False):
+    """Claim, fetch, upsert and complete items of the run until stopped (or it is empty)."""
+    coaches = {}  # Coach ID -> career index, shared by every managers item of this worker
+    with api_client.ApiClient() as client:
+        while True:
+            with db.connection(pool) as conn:
+                with conn.cursor() as cursor:
+                    items = work_queue.claim(cursor, run_id, worker_id, batch, stages)
+            if not items:
+                if seed_ready(pool, run_id):
+                    continue
+                with db.connection(pool) as conn:
+                    with conn.cursor() as cursor:
+                        left = work_queue.pending(cursor, run_id, stages)
+                        run_stages, seeded = work_queue.run_stages(cursor, run_id)
+                unseeded = (set(run_stages) - set(seeded)) & set(stages or run_stages)
+                if until_empty and not left and not unseeded:
+                    print(f"🏁 Nothing left to do in run {run_id}.")
+                    return
+                time.sleep(IDLE_SECONDS)
+                continue
+
+            retry_policy.refill_budgets()  # RETRY_BUDGET is per claimed batch, not per process
+            try:
+                with leases_kept(pool, items, worker_id):
+                    process(client, pool, items, worker_id, coaches)
+            except KeyboardInterrupt:
+                with db.connection(pool) as conn:
+                    with conn.cursor() as cursor:
+                        work_queue.release(cursor, [item.item_id for item in items], worker_id)
+                raise
+
+
+def print_status(pool, run_id):
+    with db.connection(pool) as conn:
+        with conn.cursor() as cursor:
+            stages, seeded = work_queue.run_stages(cursor, run_id)
+            counts = work_queue.counts(cursor, run_id)
+    print(f"📋 Run {run_id}")
+    for stage in stages:
+        statuses = counts.get(stage, {})
+        summary = ", ".join(f"{count} {status}" for status, count in statuses.items())
+        print(f"   {stage:<10} {summary or ('not seeded yet' if stage not in seeded else 'no items')}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed datasource crawl workers.")
+    parser.add_argument("command", choices=["seed", "work", "status", "requeue-failed"])
+    parser.add_argument("--run-id", help="Queue run to use (default: the latest unfinished one).")
+    parser.add_argument("--stages", nargs="+", choices=STAGES,
+                        help="seed: stages to queue. work: only claim items of these stages.")
+    parser.add_argument("--batch", type=int, default=BATCH, help="Items claimed at a time.")
+    parser.add_argument("--until-empty", action="store_true",
+                        help="Exit once the run has nothing left to claim.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    pool = db.create_pool()
+    try:
+        with db.connection(pool) as conn:
+            with conn.cursor() as cursor:
+                work_queue.ensure_schema(cursor)
+                if args.command == "seed":
+                    run_id = work_queue.create_run(cursor, args.stages or STAGES)
+                else:
+                    run_id = args.run_id or work_queue.latest_run(cursor)
+        if run_id is None:
+            print("No unfinished run in the work queue. Start one with: python worker.py seed")
+            return
+
+        if args.command == "seed":
+            seed_ready(pool, run_id)
+            print(f"🌱 Run {run_id} is ready. Start workers with: python worker.py work")
+        elif args.command == "work":
+            print(f"👷 Worker {worker_id} working on run {run_id}.")
+            work(pool, run_id, worker_id, args.batch, args.stages, args.until_empty)
+        elif args.command == "requeue-failed":
+            with db.connection(pool) as conn:
+                with conn.cursor() as cursor:
+                    count = work_queue.requeue_failed(cursor, run_id)
+            print(f"🔁 Requeued {count} failed items of run {run_id}.")
+        else:
+            print_status(pool, run_id)
+    finally:
+        pool.closeall()
+
+
+if __name__ == "__main__":
+    main()